@@ -1,6 +1,8 @@
 """
 DKR Agent - 基于 LangGraph 的自主 Agent 实现
 """
+import sys
+from pathlib import Path
 from typing import Dict, Any, Optional
 from datetime import datetime
 from loguru import logger
@@ -14,6 +16,10 @@ from app.core.library_manager import LibraryManager
 from app.core.llm_client import DeepSeekLLMClient
 from app.config import get_settings
 
+# Add project root to path (to import visual_memvid)
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
+from visual_memvid.prefetch import prefetch_session
+
 
 # 全局实例（用于工具函数访问）
 _library_manager: Optional[LibraryManager] = None
@@ -33,74 +39,120 @@ def _init_globals():
 @tool
 def get_library_catalog(query: str = "") -> str:
     """
-    获取文档库的完整目录（所有分类 + 所有文档）。
+    获取文档库目录。
 
-    这个工具会一次性返回：
+    文档库较小时一次性返回：
     1. 所有分类列表
     2. 每个分类下的所有文档（文件名、页数、文档摘要）
 
+    文档库较大时返回分层目录：
+    1. 分类概览（每个分类的文档数和关键词）
+    2. 每个分类中与问题最相关的前几份文档
+    其余文档可用 browse_category 按分类查看。
+
     适用于：快速浏览整个文档库，判断要查看哪些文档。
 
     Args:
-        query: 用户的查询问题（可选，用于日志记录）
+        query: 用户的查询问题（用于对文档排序，建议传入）
 
     Returns:
-        完整的文档库目录（所有分类和文档）
+        文档库目录
     """
     _init_globals()
     logger.info(f"[Tool] get_library_catalog: {query}")
 
-    # 获取所有分类
-    categories = _library_manager.get_categories()
+    from app.core.library_catalog import get_catalog_service
 
-    if not categories:
-        return "文档库为空，没有任何分类和文档"
+    # 目录按文档库版本缓存；完整目录超出预算时切换为分层目录
+    settings = get_settings()
+    return get_catalog_service().render(
+        query=query,
+        max_tokens=settings.agent_catalog_max_tokens,
+        mode=settings.agent_catalog_mode,
+        top_n=settings.agent_catalog_top_n
+    )
 
-    result = "【文档库完整目录】\n\n"
-    result += f"共 {len(categories)} 个分类\n\n"
-    result += "=" * 80 + "\n\n"
 
-    total_docs = 0
+@tool
+def browse_category(category: str, query: str = "", offset: int = 0, limit: int = 20) -> str:
+    """
+    查看某个分类下的文档（分层目录的下钻）。
 
-    for category in categories:
-        category_name = category.get('name', '未命名分类')
-        doc_count = category.get('document_count', 0)
-        total_docs += doc_count
+    文档按与问题的相关性排序，支持分页（offset）。
 
-        result += f"📁 分类：{category_name}（{doc_count} 份文档）\n"
-        result += f"{'-' * 80}\n"
+    适用于：get_library_catalog 返回分层目录时，查看某个分类中未列出的文档。
 
-        # 获取该分类下的所有文档
-        documents = _library_manager.list_documents(category=category_name)
+    Args:
+        category: 分类名称（与目录中的分类名一致）
+        query: 用户的查询问题（用于排序）
+        offset: 从第几份文档开始（默认 0）
+        limit: 最多返回的文档数（默认 20）
 
-        if documents:
-            for i, doc in enumerate(documents, 1):
-                metadata = doc.get('metadata', {})
+    Returns:
+        分类下的文档列表（文件名、文档 ID、页数、摘要）
+    """
+    logger.info(f"[Tool] browse_category: category={category}, query={query}, offset={offset}, limit={limit}")
+
+    try:
+        from app.core.library_catalog import get_catalog_service
+
+        return get_catalog_service().render_category(
+            category,
+            query=query,
+            offset=int(offset),
+            limit=int(limit),
+            max_tokens=get_settings().agent_catalog_max_tokens
+        )
+    except Exception as e:
+        logger.error(f"browse_category error: {e}", exc_info=True)
+        return f"查看分类文档出错：{str(e)}"
 
-                # 文件名
-                filename = metadata.get('filename', doc.get('title', doc['doc_id']))
 
-                # 页数
-                page_count = metadata.get('page_count', '未知')
+@tool
+def search_library_pages(query: str, top_k: int = 10, category: str = "") -> str:
+    """
+    在整个文档库中检索与问题相关的页面（BM25 稀疏检索）。
 
-                # 文档摘要
-                doc_summary = metadata.get('doc_summary', '无摘要')
+    检索范围覆盖所有文档的页面摘要、实体、关键数据和 PDF 文本，
+    一次调用即可得到候选页面列表（文档 ID + 页码 + 摘要片段）。
 
-                result += f"  {i}. {filename}\n"
-                result += f"     - 文档 ID: {doc['doc_id']}\n"
-                result += f"     - 页数: {page_count} 页\n"
-                result += f"     - 摘要: {doc_summary}\n"
-                result += f"\n"
-        else:
-            result += f"  （该分类下暂无文档）\n\n"
+    适用于：不确定答案在哪个文档时，先用它定位候选页面，
+    再用 get_pages_full_summary 或 search_in_document 查看详情。
 
-        result += "\n"
+    Args:
+        query: 检索关键词或问题
+        top_k: 返回的页面数（默认 10）
+        category: 只在该分类中检索（可选）
 
-    result += "=" * 80 + "\n"
-    result += f"【统计】共 {len(categories)} 个分类，{total_docs} 份文档\n\n"
-    result += "【下一步】请选择您想查看的文档（可以是 1 个或多个），我会返回这些文档的目录（所有页面的摘要）。\n"
+    Returns:
+        候选页面列表
+    """
+    logger.info(f"[Tool] search_library_pages: query={query}, top_k={top_k}, category={category}")
 
-    return result
+    try:
+        from app.core.global_search import IndexBuildingError, get_global_search
+
+        try:
+            results = get_global_search().search(query, top_k=top_k, category=category or None)
+        except IndexBuildingError:
+            return "全库索引正在构建中，暂时无法全库检索，请先使用 get_library_catalog 浏览目录选择文档"
+        if not results:
+            return f"全库检索未找到与「{query}」相关的页面，请尝试其他关键词或使用 get_library_catalog 浏览目录"
+
+        response = f"【全库检索结果】查询: {query}\n"
+        response += f"找到 {len(results)} 个候选页面（按相关性排序）\n\n"
+        for hit in results:
+            response += (
+                f"{hit['rank']}. [{hit['relevance_level']}] 文档: {hit['title']} (ID: {hit['doc_id']}) "
+                f"第 {hit['page_num']} 页 | 分类: {hit['category']} | 得分: {hit['score']:.2f}\n"
+                f"   {hit['snippet']}\n"
+            )
+        response += "\n【下一步】使用 get_pages_full_summary 查看候选页面详情，必要时再用 search_in_document 做全量 OCR。\n"
+        return response
+
+    except Exception as e:
+        logger.error(f"search_library_pages error: {e}", exc_info=True)
+        return f"全库检索出错：{str(e)}"
 
 
 @tool
@@ -111,7 +163,7 @@ def get_documents_table_of_contents(doc_ids: list, query: str = "") -> str:
     这个工具会返回指定文档的所有页面摘要，像翻阅目录一样快速了解文档结构。
 
     工作流程：
-    1. 读取指定文档的 summaries.json
+    1. 读取指定文档的 Summary（summaries.bin 或 summaries.json，已读取的结果会缓存）
     2. 提取所有页面的 page_summary
     3. 返回简洁的目录格式
 
@@ -129,24 +181,23 @@ def get_documents_table_of_contents(doc_ids: list, query: str = "") -> str:
 
     try:
         import sys
-        import json
         from pathlib import Path
 
         # Add project root to path
         project_root = Path(__file__).parent.parent.parent.parent
         sys.path.insert(0, str(project_root))
 
-        from app.core.library_manager import LibraryManager
+        from app.core.summary_store import get_summary_store
         from app.config import get_settings
 
-        library_manager = LibraryManager()
         settings = get_settings()
+        summary_store = get_summary_store()
 
         result = "【文档目录】\n\n"
 
         for doc_id in doc_ids:
             # 获取文档信息
-            doc_info = library_manager.get_document(doc_id)
+            doc_info = _library_manager.get_document(doc_id)
             if not doc_info:
                 result += f"⚠️ 错误：文档 {doc_id} 不存在\n\n"
                 continue
@@ -166,12 +217,10 @@ def get_documents_table_of_contents(doc_ids: list, query: str = "") -> str:
                 # data 文件夹在项目根目录，所以使用 _project_root
                 summary_path = settings._project_root / summary_path
 
-            # 读取 Summary JSON
-            with open(summary_path, 'r', encoding='utf-8') as f:
-                summary_data = json.load(f)
-
-            # 检查格式
-            if not isinstance(summary_data, list):
+            # 读取 Summary（检查格式）
+            try:
+                summaries = summary_store.load(summary_path)
+            except ValueError:
                 result += f"⚠️ 错误：文档 {doc_id} 的 Summary 文件格式不正确\n\n"
                 continue
 
@@ -180,10 +229,10 @@ def get_documents_table_of_contents(doc_ids: list, query: str = "") -> str:
             result += f"   总页数: {page_count} 页\n"
             result += f"{'-' * 80}\n"
 
-            # 提取所有页面的 page_summary
-            for page_data in summary_data:
-                page_num = page_data.get("page_num", "?")
-                page_summary = page_data.get("page_summary", "无摘要")
+            # 提取所有页面的 page_summary（二进制格式只读取目录列）
+            for page_num, page_summary in summaries.toc():
+                page_num = "?" if page_num is None else page_num
+                page_summary = "无摘要" if page_summary is None else page_summary
 
                 result += f"  第 {page_num} 页：{page_summary}\n"
 
@@ -226,21 +275,19 @@ def get_pages_full_summary(doc_id: str, page_nums: list) -> str:
 
     try:
         import sys
-        import json
         from pathlib import Path
 
         # Add project root to path
         project_root = Path(__file__).parent.parent.parent.parent
         sys.path.insert(0, str(project_root))
 
-        from app.core.library_manager import LibraryManager
+        from app.core.summary_store import get_summary_store
         from app.config import get_settings
 
-        library_manager = LibraryManager()
         settings = get_settings()
 
         # 获取文档信息
-        doc_info = library_manager.get_document(doc_id)
+        doc_info = _library_manager.get_document(doc_id)
         if not doc_info:
             return f"错误：文档 {doc_id} 不存在"
 
@@ -256,12 +303,10 @@ def get_pages_full_summary(doc_id: str, page_nums: list) -> str:
             # data 文件夹在项目根目录，所以使用 _project_root
             summary_path = settings._project_root / summary_path
 
-        # 读取 Summary JSON
-        with open(summary_path, 'r', encoding='utf-8') as f:
-            summary_data = json.load(f)
-
-        # 检查格式
-        if not isinstance(summary_data, list):
+        # 读取 Summary（检查格式）
+        try:
+            summaries = get_summary_store().load(summary_path)
+        except ValueError:
             return f"错误：文档 {doc_id} 的 Summary 文件格式不正确"
 
         result = f"【页面详细信息】\n"
@@ -281,11 +326,7 @@ def get_pages_full_summary(doc_id: str, page_nums: list) -> str:
                 continue
 
             # 查找对应的页面数据
-            page_data = None
-            for data in summary_data:
-                if data.get("page_num") == page_num_int:
-                    page_data = data
-                    break
+            page_data = summaries.get_page(page_num_int)
 
             if not page_data:
                 result += f"⚠️ 第 {page_num_int} 页：未找到 Summary 数据\n\n"
@@ -408,7 +449,7 @@ def search_in_document(doc_id: str, page_nums: list, query: str = "") -> str:
     - 需要精确的数字、公式、代码等
 
     工作流程：
-    1. 对指定的页面进行全量 OCR（耗时 3-5 秒/页）
+    1. 对指定的页面进行全量 OCR（耗时 3-5 秒/页，多页并发处理）
     2. 返回 OCR 结果
 
     Args:
@@ -444,16 +485,13 @@ def search_in_document(doc_id: str, page_nums: list, query: str = "") -> str:
         project_root = Path(__file__).parent.parent.parent.parent
         sys.path.insert(0, str(project_root))
 
-        from visual_memvid.visual_retriever import VisualMemvidRetriever
-        from visual_memvid.ocr_client import DeepSeekOCRClient
         from app.config import get_settings
-        from app.core.library_manager import LibraryManager
+        from app.core.retriever_registry import get_retriever_registry
 
         settings = get_settings()
-        library_manager = LibraryManager()
 
         # 获取文档信息
-        doc_info = library_manager.get_document(doc_id)
+        doc_info = _library_manager.get_document(doc_id)
         if not doc_info:
             return f"错误：文档 {doc_id} 不存在"
 
@@ -477,59 +515,63 @@ def search_in_document(doc_id: str, page_nums: list, query: str = "") -> str:
 
         logger.info(f"[Tool] 视频路径: {video_path}")
         logger.info(f"[Tool] 索引路径: {index_path}")
-        logger.info(f"[Tool] 视频文件存在: {video_path.exists()}")
-        logger.info(f"[Tool] 索引文件存在: {index_path.exists()}")
 
-        # 初始化 OCR 客户端和 visual retriever
-        ocr_client = DeepSeekOCRClient(endpoint=settings.ocr_api_url)
+        # 复用该文档的检索器和共享的 OCR 客户端（首次使用时创建，索引按需加载）
+        try:
+            visual_retriever = get_retriever_registry().get(doc_id, video_path, index_path)
+        except FileNotFoundError as e:
+            return f"错误：{e}"
         logger.info(f"[Tool] 正在调用 DeepSeek OCR API: {settings.ocr_api_url}")
 
-        visual_retriever = VisualMemvidRetriever(
-            video_path=str(video_path),
-            index_path=str(index_path),
-            ocr_client=ocr_client,
-            enable_cache=True
-        )
-
-        # 精准 OCR：只处理指定的页面
+        # 精准 OCR：只处理指定的页面（一次提取所有帧，并发 OCR，结果按请求的页码顺序返回）
         logger.info(f"[Tool] 精准 OCR 模式：处理指定的 {len(page_nums)} 页: {page_nums}")
-        results = []
+        # 逐页校验页码：无效页码单独跳过并报告，不影响其他页面
+        valid_pages = []
+        invalid_pages = []
         for page_num in page_nums:
             try:
-                # 提取帧并 OCR（页码从 1 开始，frame_num 从 0 开始）
-                frame_num = page_num - 1
-                frame = visual_retriever._extract_frame(frame_num)
-                if frame is not None:
-                    ocr_result = ocr_client.ocr_image(frame)
-
-                    # 检查 OCR 结果是否为 None
-                    if ocr_result is None:
-                        logger.warning(f"[Tool] ⚠️ 第 {page_num} 页 OCR 返回 None")
-                        continue
-
-                    if ocr_result.get("success"):
-                        content = ocr_result.get("text", "")
-                        results.append({
-                            "page_num": page_num,
-                            "frame_num": frame_num,
-                            "content": content,
-                            "page_type": "OCR"
-                        })
-                        logger.info(f"[Tool] ✅ 第 {page_num} 页 OCR 成功，内容长度: {len(content)}")
-                    else:
-                        error_msg = ocr_result.get("error", "未知错误")
-                        logger.warning(f"[Tool] ⚠️ 第 {page_num} 页 OCR 失败: {error_msg}")
-                else:
-                    logger.warning(f"[Tool] ⚠️ 第 {page_num} 页帧提取失败")
-            except Exception as e:
-                logger.error(f"[Tool] ❌ 第 {page_num} 页处理出错: {e}", exc_info=True)
+                page_int = int(page_num)
+            except (TypeError, ValueError):
+                page_int = 0
+            if page_int < 1:
+                logger.warning(f"[Tool] ⚠️ 无效页码，已跳过: {page_num!r}")
+                invalid_pages.append(page_num)
+                continue
+            valid_pages.append(page_int)
+        if not valid_pages:
+            return f"错误：没有有效的页码（无效页码: {invalid_pages}），页码应为从 1 开始的整数"
+
+        frame_nums = [page_num - 1 for page_num in valid_pages]  # 页码从 1 开始，frame_num 从 0 开始
+        ocr_results = visual_retriever.ocr_frames(frame_nums)
+
+        results = []
+        for page_num, frame_num, ocr_result in zip(valid_pages, frame_nums, ocr_results):
+            if ocr_result.get("success"):
+                content = ocr_result.get("text", "")
+                results.append({
+                    "page_num": page_num,
+                    "frame_num": frame_num,
+                    "content": content,
+                    "page_type": "OCR"
+                })
+                source = "缓存命中" if ocr_result.get("from_cache") else "OCR 成功"
+                logger.info(f"[Tool] ✅ 第 {page_num} 页{source}，内容长度: {len(content)}")
+            else:
+                error_msg = ocr_result.get("error", "未知错误")
+                logger.warning(f"[Tool] ⚠️ 第 {page_num} 页 OCR 失败: {error_msg}")
+
+        # Agent 通常会接着翻看相邻页：后台预取到缓存（请求结束时自动取消）
+        visual_retriever.prefetch_neighbours(frame_nums)
 
         if results:
             logger.info(f"[Tool] DeepSeek OCR 成功处理 {len(results)} 个页面")
 
             response = f"【全量 OCR 结果】\n"
             response += f"文档: {doc_id}\n"
-            response += f"处理了 {len(results)} 个页面（指定页码: {page_nums}）\n\n"
+            response += f"处理了 {len(results)} 个页面（指定页码: {page_nums}）\n"
+            if invalid_pages:
+                response += f"无效页码（已跳过）: {invalid_pages}\n"
+            response += "\n"
             response += "=" * 80 + "\n\n"
 
             for i, page_result in enumerate(results, 1):
@@ -543,7 +585,10 @@ def search_in_document(doc_id: str, page_nums: list, query: str = "") -> str:
 
             return response
         else:
-            return f"OCR 失败：未能成功处理任何页面"
+            response = f"OCR 失败：未能成功处理任何页面"
+            if invalid_pages:
+                response += f"（无效页码: {invalid_pages}）"
+            return response
 
     except Exception as e:
         logger.error(f"search_in_document error: {e}", exc_info=True)
@@ -657,13 +702,15 @@ class DKRAgent:
                 temperature=0.3
             )
 
-        # 定义工具列表（新版本：5个工具）
+        # 定义工具列表
         self.tools = [
-            get_library_catalog,                # 工具1: 获取文档库完整目录
-            get_documents_table_of_contents,    # 工具2: 获取文档目录（所有 page_summary）
-            get_pages_full_summary,             # 工具3: 获取页面详细信息
-            search_in_document,                 # 工具4: 全量 OCR
-            evaluate_answer_confidence          # 工具5: 评估答案置信度
+            get_library_catalog,                # 工具1: 获取文档库目录（完整 / 分层）
+            browse_category,                    # 工具2: 分层目录下钻（分类下的文档）
+            search_library_pages,               # 工具3: 全库 BM25 页面检索
+            get_documents_table_of_contents,    # 工具4: 获取文档目录（所有 page_summary）
+            get_pages_full_summary,             # 工具5: 获取页面详细信息
+            search_in_document,                 # 工具6: 全量 OCR
+            evaluate_answer_confidence          # 工具7: 评估答案置信度
         ]
 
         # 创建 Agent（无状态，每次独立问答）
@@ -727,10 +774,12 @@ class DKRAgent:
             logger.info(f"查询: {query}")
             logger.info("=" * 80)
 
-            result = await self.agent.ainvoke(
-                {"messages": [HumanMessage(content=query)]},
-                config=config
-            )
+            # 预取会话：工具调用期间后台预取相邻页面，请求结束时取消剩余任务
+            with prefetch_session():
+                result = await self.agent.ainvoke(
+                    {"messages": [HumanMessage(content=query)]},
+                    config=config
+                )
 
             # 调试：打印 result 的类型和内容
             logger.debug(f"Agent ainvoke 返回类型: {type(result)}")
@@ -1,11 +1,13 @@
 """
 外部 Agent API - 供其他 Agent 调用
 """
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from loguru import logger
 
 from app.agent.dkr_agent import DKRAgent
 from app.core.library_manager import LibraryManager
+from app.utils import etag_matches, make_etag
 
 router = APIRouter(prefix="/agent", tags=["agent"])
 
@@ -115,24 +117,62 @@ async def get_categories():
 
 
 @router.get("/library/documents/{category}")
-async def get_documents_in_category(category: str):
+async def get_documents_in_category(
+    category: str,
+    request: Request,
+    response: Response,
+    q: Optional[str] = None,
+    fields: Optional[str] = None,
+    sort: Optional[str] = None,
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500)
+):
     """
     获取指定分类下的文档（供外部 Agent 调用）
     
     Args:
         category: 分类名称
+        q / fields / sort / order / cursor / limit: 分页参数，同 GET /documents/
     
     Returns:
-        文档列表
+        文档列表；指定分页参数时额外返回 next_cursor、total、version
     """
     try:
-        documents = library_manager.list_documents(category=category)
+        params = {"category": category, **request.query_params}
+        etag = make_etag(library_manager.get_revision(), params)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+
+        if not any(value is not None for value in (q, fields, sort, cursor, limit)):
+            documents = library_manager.list_documents(category=category)
+            return {
+                "success": True,
+                "category": category,
+                "documents": documents
+            }
+
+        page = library_manager.query_documents(
+            category=category,
+            q=q,
+            fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+            sort=sort or "upload_time",
+            order=order,
+            cursor=cursor,
+            limit=limit or 50
+        )
         return {
             "success": True,
             "category": category,
-            "documents": documents
+            "documents": page["items"],
+            "next_cursor": page["next_cursor"],
+            "total": page["total"],
+            "version": page["version"]
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取分类文档失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-
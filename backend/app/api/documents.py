@@ -1,14 +1,17 @@
 """
 文档管理 API
 """
-from typing import List
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from pathlib import Path
+from typing import List, Optional, Union
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Query, Request, Response
 from loguru import logger
 
-from app.models.document import Document, DocumentUploadResponse
+from app.models.document import Document, DocumentPage, DocumentUploadResponse
 from app.core.library_manager import LibraryManager
 from app.core.document_processor import DocumentProcessor
 from app.core.classifier import DocumentClassifier
+from app.core.global_search import get_global_search
+from app.utils import etag_matches, make_etag
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
@@ -18,22 +21,71 @@ document_processor = DocumentProcessor()
 classifier = DocumentClassifier()
 
 
-@router.get("/", response_model=List[Document])
-async def list_documents(category: str = None):
+@router.get("/", response_model=Union[List[Document], DocumentPage])
+async def list_documents(
+    request: Request,
+    response: Response,
+    category: str = None,
+    q: Optional[str] = None,
+    fields: Optional[str] = None,
+    sort: Optional[str] = None,
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500)
+):
     """
     获取文档列表
     
     Args:
         category: 可选，按分类筛选
+        q: 可选，标题 / doc_id 关键词
+        fields: 可选，逗号分隔的返回字段（如 doc_id,title,page_count）
+        sort: 可选，排序字段（upload_time / title / page_count / doc_id / created_at / updated_at）
+        order: asc / desc
+        cursor: 上一页返回的 next_cursor
+        limit: 每页数量（默认 50）
+
+    未指定 q / fields / sort / cursor / limit 时返回完整文档列表（兼容旧客户端），
+    否则返回分页结构 {items, next_cursor, total, version}。
+    响应带 ETag（文档库版本号 + 查询参数），If-None-Match 命中时返回 304
     """
     try:
-        documents = library_manager.list_documents(category=category)
-        return documents
+        params = dict(request.query_params)
+        etag = make_etag(library_manager.get_revision(), params)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+
+        if not any(value is not None for value in (q, fields, sort, cursor, limit)):
+            return library_manager.list_documents(category=category)
+
+        return library_manager.query_documents(
+            category=category,
+            q=q,
+            fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+            sort=sort or "upload_time",
+            order=order,
+            cursor=cursor,
+            limit=limit or 50
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取文档列表失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/prewarm/status")
+async def get_prewarm_status():
+    """获取 OCR 预热队列状态"""
+    try:
+        return document_processor.get_prewarm_status()
+    except Exception as e:
+        logger.error(f"获取预热状态失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/{doc_id}", response_model=Document)
 async def get_document(doc_id: str):
     """获取单个文档详情"""
@@ -50,12 +102,13 @@ async def get_document(doc_id: str):
 
 
 @router.post("/upload/batch")
-async def upload_documents_batch(files: List[UploadFile] = File(...)):
+async def upload_documents_batch(files: List[UploadFile] = File(...), prewarm: bool = Form(False)):
     """
     批量上传文档
 
     Args:
         files: 多个 PDF 文件
+        prewarm: 是否在低峰时段对全部页面做 OCR 预热
 
     Returns:
         批量上传结果
@@ -74,7 +127,7 @@ async def upload_documents_batch(files: List[UploadFile] = File(...)):
                 continue
 
             # 调用单文件上传逻辑
-            result = await _process_single_upload(file)
+            result = await _process_single_upload(file, prewarm=prewarm)
             results.append({
                 "filename": file.filename,
                 "success": result["success"],
@@ -105,7 +158,7 @@ async def upload_documents_batch(files: List[UploadFile] = File(...)):
 
 
 @router.post("/upload", response_model=DocumentUploadResponse)
-async def upload_document(file: UploadFile = File(...)):
+async def upload_document(file: UploadFile = File(...), prewarm: bool = Form(False)):
     """
     上传单个文档（Agent-First：自动分类）
 
@@ -114,13 +167,14 @@ async def upload_document(file: UploadFile = File(...)):
     2. 处理文档（PDF → Video + Summary）
     3. 使用 LLM 自动分类
     4. 添加到文档库
+    5. 按需加入 OCR 预热队列（prewarm=true 或分类配置为预热）
     """
     try:
         # 验证文件类型
         if not file.filename.endswith('.pdf'):
             raise HTTPException(status_code=400, detail="只支持 PDF 文件")
 
-        result = await _process_single_upload(file)
+        result = await _process_single_upload(file, prewarm=prewarm)
 
         if not result["success"]:
             raise HTTPException(status_code=500, detail=result.get("error", "上传失败"))
@@ -139,10 +193,14 @@ async def upload_document(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def _process_single_upload(file: UploadFile) -> dict:
+async def _process_single_upload(file: UploadFile, prewarm: bool = False) -> dict:
     """
     处理单个文件上传（内部方法）
 
+    Args:
+        file: 上传的 PDF
+        prewarm: 是否强制加入 OCR 预热队列
+
     Returns:
         上传结果字典
     """
@@ -221,6 +279,20 @@ async def _process_single_upload(file: UploadFile) -> dict:
 
         logger.info(f"文档上传成功: {doc_id}")
 
+        # 增量写入全库检索索引（后台进行）
+        get_global_search().schedule_add_document(doc_id)
+
+        # OCR 预热（失败不影响上传结果）
+        try:
+            document_processor.schedule_prewarm(
+                doc_id=doc_id,
+                video_path=process_result.get("video_path"),
+                category=category,
+                force=prewarm
+            )
+        except Exception as e:
+            logger.warning(f"加入 OCR 预热队列失败: {e}")
+
         return {
             "success": True,
             "doc_id": doc_id,
@@ -236,6 +308,30 @@ async def _process_single_upload(file: UploadFile) -> dict:
         }
 
 
+@router.post("/{doc_id}/prewarm")
+async def prewarm_document(doc_id: str):
+    """手动将已有文档加入 OCR 预热队列"""
+    try:
+        document = library_manager.get_document(doc_id)
+        if not document:
+            raise HTTPException(status_code=404, detail=f"文档 {doc_id} 不存在")
+
+        video_path = document.get("metadata", {}).get("video_path")
+        if video_path and not Path(video_path).is_absolute():
+            video_path = str(document_processor.settings._project_root / video_path)
+
+        job = document_processor.schedule_prewarm(doc_id, video_path, force=True, reason="manual")
+        if job is None:
+            raise HTTPException(status_code=400, detail=f"文档 {doc_id} 缺少视频文件")
+        return {"success": True, "job": job}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"加入预热队列失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.delete("/{doc_id}")
 async def delete_document(doc_id: str):
     """删除文档"""
@@ -245,6 +341,10 @@ async def delete_document(doc_id: str):
             raise HTTPException(status_code=404, detail=f"文档 {doc_id} 不存在")
         
         logger.info(f"文档已删除: {doc_id}")
+        try:
+            get_global_search().delete_document(doc_id)
+        except Exception as e:
+            logger.error(f"从全库索引删除文档失败: {e}")
         return {"success": True, "message": f"文档 {doc_id} 已删除"}
     
     except HTTPException:
@@ -0,0 +1,58 @@
+"""
+全库检索 API - 跨文档 BM25S 页面检索
+"""
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from loguru import logger
+
+from app.core.global_search import IndexBuildingError, get_global_search
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+
+@router.get("/pages")
+async def search_pages(
+    q: str = Query(..., description="查询文本"),
+    top_k: int = Query(10, ge=1, le=100, description="返回页面数"),
+    category: Optional[str] = Query(None, description="只检索该分类")
+):
+    """
+    在全库范围内检索相关页面
+
+    基于页面摘要、实体、关键数据和 PDF 文本层的 BM25S 索引，
+    返回按得分排序的 (doc_id, page_num) 列表
+    """
+    try:
+        results = get_global_search().search(q, top_k=top_k, category=category)
+        return {
+            "success": True,
+            "query": q,
+            "total": len(results),
+            "results": results
+        }
+    except IndexBuildingError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"全库检索失败: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/stats")
+async def get_search_stats():
+    """获取全库索引状态"""
+    try:
+        return get_global_search().get_stats()
+    except Exception as e:
+        logger.error(f"获取全库索引状态失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/rebuild")
+async def rebuild_index():
+    """在后台重建全库索引"""
+    try:
+        get_global_search().schedule_rebuild()
+        return {"success": True, "message": "全库索引重建已开始"}
+    except Exception as e:
+        logger.error(f"重建全库索引失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
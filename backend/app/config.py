@@ -106,9 +106,17 @@ class Settings(BaseSettings):
         """临时文件目录"""
         return self.data_dir / "temp"
 
+    # ==================== 文档库存储 ====================
+    library_backend: str = "json"  # json（data/library_index.json）, sqlite（data/library.sqlite3）
+
     # ==================== Agent 配置 ====================
     agent_max_iterations: int = 10
     agent_confidence_threshold: float = 0.9
+    agent_catalog_max_tokens: int = 8000  # get_library_catalog 目录的 token 预算（0 表示不限制）
+    agent_catalog_mode: str = "auto"  # full, hierarchical, auto（完整目录超出预算时使用分层目录）
+    agent_catalog_top_n: int = 5  # 分层目录每个分类列出的文档数
+    summary_cache_max_mb: int = 256  # Agent 工具缓存已解析 summaries.json 的内存预算（按文件大小估算）
+    retriever_cache_size: int = 16  # Agent 工具缓存的文档检索器数量（LRU）
 
     # ==================== 文档分类 ====================
     default_categories: str = "年度调研报告,申请书,中期报告,结项报告,其他"
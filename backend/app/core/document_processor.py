@@ -26,10 +26,15 @@ class DocumentProcessor:
 
         # Initialize encoder with OCR client
         from visual_memvid.ocr_client import DeepSeekOCRClient
+        from visual_memvid.ocr_pool import PRIORITY_BULK
 
         # Initialize OCR client and check availability
+        # 入库 OCR 走 bulk 通道，让查询时的 OCR 优先
         logger.info(f"🔧 初始化 OCR 客户端: {self.settings.ocr_api_url}")
-        ocr_client = DeepSeekOCRClient(endpoint=self.settings.ocr_api_url)
+        ocr_client = DeepSeekOCRClient(
+            endpoint=self.settings.ocr_api_url,
+            default_priority=PRIORITY_BULK
+        )
 
         if ocr_client.is_available:
             logger.info("✅ OCR 客户端初始化成功，Summary 生成已启用")
@@ -43,6 +48,44 @@ class DocumentProcessor:
             enable_summary=enable_summary,
             enable_doris=False
         )
+
+    def schedule_prewarm(
+        self,
+        doc_id: str,
+        video_path: str,
+        category: Optional[str] = None,
+        force: bool = False,
+        reason: str = "upload"
+    ) -> Optional[Dict[str, Any]]:
+        """
+        安排入库预热（夜间窗口内对每页做全页 OCR 并写入缓存）
+
+        Args:
+            doc_id: 文档 ID
+            video_path: 视频文件路径
+            category: 文档分类（属于配置的预热分类时自动预热）
+            force: 是否强制预热（上传时指定或手动触发）
+            reason: 强制预热的原因（upload / manual）
+
+        Returns:
+            预热任务信息，不需要预热时返回 None
+        """
+        from visual_memvid.prewarm import get_prewarm_scheduler, should_prewarm
+
+        if not force and not should_prewarm(category):
+            return None
+        if not video_path:
+            logger.warning(f"⚠️ 文档 {doc_id} 缺少视频文件，跳过预热")
+            return None
+
+        # OCR 客户端由调度器在首次运行时创建，避免每次上传都做一次同步健康检查
+        scheduler = get_prewarm_scheduler(ocr_endpoint=self.settings.ocr_api_url)
+        return scheduler.enqueue(doc_id, video_path, reason=reason if force else "category")
+
+    def get_prewarm_status(self) -> Dict[str, Any]:
+        """获取预热调度器状态"""
+        from visual_memvid.prewarm import get_prewarm_scheduler
+        return get_prewarm_scheduler(ocr_endpoint=self.settings.ocr_api_url).get_status()
     
     async def process_document(
         self,
@@ -0,0 +1,244 @@
+"""
+全库检索服务 - 维护跨文档的 BM25S 页面索引
+"""
+import sys
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+from loguru import logger
+
+# Add project root to path (to import visual_memvid)
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from visual_memvid.segmented_index import SegmentedBM25SIndex
+
+from app.config import get_settings
+from app.core.library_manager import LibraryManager
+
+
+class IndexBuildingError(RuntimeError):
+    """全库索引首次构建尚未完成"""
+
+
+class GlobalSearchService:
+    """
+    全库检索服务
+
+    - 索引保存在 data/indexes/global，按段增量维护（见 SegmentedBM25SIndex）
+    - 文档上传后在后台写入新段，删除时记录墓碑，后台线程定期合并段
+    - 查询使用不可变快照，写入和合并期间继续返回一致的结果
+    - 索引不存在时在后台线程首次构建，构建完成前查询抛出 IndexBuildingError，
+      删除请求先记录下来，构建完成后再执行
+    """
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.index_dir = self.settings.indexes_dir / "global"
+        self.library_manager = LibraryManager()
+
+        self._index: Optional[SegmentedBM25SIndex] = None
+        self._lock = threading.Lock()
+        # 首次构建完成（或磁盘上已有索引）后置位
+        self._ready = threading.Event()
+        self._pending_deletes: set = set()
+
+    def _resolve_path(self, path: Optional[str], fallback: Path) -> Optional[Path]:
+        """解析元数据中的文件路径（支持相对路径；原路径不存在时使用默认位置）"""
+        if path:
+            candidate = Path(path)
+            if not candidate.is_absolute():
+                candidate = self.settings._project_root / candidate
+            if candidate.exists():
+                return candidate
+        return fallback if fallback.exists() else None
+
+    def _load_document(self, doc: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """读取构建索引所需的文档数据（缺少 Summary 时返回 None）"""
+        doc_id = doc["doc_id"]
+        metadata = doc.get("metadata", {})
+
+        summary_path = self._resolve_path(
+            metadata.get("summary_path"),
+            self.settings.summaries_dir / doc_id / "summaries.json"
+        )
+        if summary_path is None:
+            logger.warning(f"全库索引跳过文档 {doc_id}：缺少 Summary 文件")
+            return None
+
+        try:
+            with open(summary_path, "r", encoding="utf-8") as f:
+                summaries = json.load(f)
+        except Exception as e:
+            logger.warning(f"全库索引跳过文档 {doc_id}：读取 Summary 失败: {e}")
+            return None
+
+        pdf_path = self._resolve_path(
+            metadata.get("file_path"),
+            self.settings.documents_dir / f"{doc_id}.pdf"
+        )
+
+        return {
+            "doc_id": doc_id,
+            "title": doc.get("title", ""),
+            "category": doc.get("category", ""),
+            "summaries": summaries if isinstance(summaries, list) else [],
+            "pdf_path": str(pdf_path) if pdf_path else None,
+        }
+
+    def _iter_documents(self):
+        """遍历文档库，产出构建索引所需的文档数据"""
+        for doc in self.library_manager.list_documents():
+            document = self._load_document(doc)
+            if document is not None:
+                yield document
+
+    def rebuild(self) -> Dict[str, Any]:
+        """
+        全量重建全库索引（构建完成后原子替换为单个段）
+
+        Returns:
+            重建结果（文档数、页面数）
+        """
+        index = self._get_index(build_if_missing=False)
+        logger.info("🔨 开始重建全库索引...")
+        try:
+            index.rebuild(self._iter_documents())
+        finally:
+            self._finish_build(index)
+        return index.get_stats()
+
+    def schedule_rebuild(self):
+        """在后台线程全量重建索引"""
+        def _run():
+            try:
+                self.rebuild()
+            except Exception as e:
+                logger.error(f"全库索引重建失败: {e}", exc_info=True)
+
+        threading.Thread(target=_run, name="global-index-rebuild", daemon=True).start()
+
+    def add_document(self, doc_id: str) -> int:
+        """
+        把文档增量写入索引（同 doc_id 的旧版本会被标记删除）
+
+        Returns:
+            写入的页面数
+        """
+        doc = self.library_manager.get_document(doc_id)
+        if doc is None:
+            logger.warning(f"全库索引跳过文档 {doc_id}：文档不存在")
+            return 0
+        # get_document 返回的文档不带分类字段（list_documents 才有）
+        doc["category"] = self.library_manager.get_document_category(doc_id) or ""
+        document = self._load_document(doc)
+        if document is None:
+            return 0
+        index = self._get_index()
+        # 首次构建期间上传的文档可能不在构建读取的文档列表中，等构建完成后再写入
+        self._ready.wait()
+        return index.add_documents([document])
+
+    def schedule_add_document(self, doc_id: str):
+        """在后台线程把文档写入索引（不阻塞上传请求）"""
+        def _run():
+            try:
+                self.add_document(doc_id)
+            except Exception as e:
+                logger.error(f"全库索引写入失败 {doc_id}: {e}", exc_info=True)
+
+        threading.Thread(target=_run, name="global-index-add", daemon=True).start()
+
+    def delete_document(self, doc_id: str) -> bool:
+        """从索引中删除文档（记录墓碑，后台合并时物理删除；首次构建期间延迟到构建完成后执行）"""
+        index = self._get_index()
+        with self._lock:
+            if not self._ready.is_set():
+                self._pending_deletes.add(doc_id)
+                return True
+        return index.delete_document(doc_id)
+
+    def _finish_build(self, index: SegmentedBM25SIndex):
+        """执行构建期间记录的删除，然后标记索引可用"""
+        while True:
+            with self._lock:
+                pending, self._pending_deletes = self._pending_deletes, set()
+                if not pending:
+                    self._ready.set()
+                    return
+            for doc_id in pending:
+                index.delete_document(doc_id)
+
+    def _start_initial_build(self, index: SegmentedBM25SIndex):
+        """在后台线程首次全量构建索引"""
+        def _run():
+            try:
+                logger.info("🔨 全库索引不存在，开始全量构建...")
+                index.rebuild(self._iter_documents())
+            except Exception as e:
+                logger.error(f"全库索引构建失败: {e}", exc_info=True)
+            finally:
+                # 构建失败时也放行：查询返回空结果，可通过 /search/rebuild 重试
+                self._finish_build(index)
+
+        threading.Thread(target=_run, name="global-index-build", daemon=True).start()
+
+    def _get_index(self, build_if_missing: bool = True) -> SegmentedBM25SIndex:
+        """获取索引（首次使用时从磁盘打开并启动后台合并；索引不存在时在后台全量构建）"""
+        with self._lock:
+            if self._index is None:
+                self._index = SegmentedBM25SIndex(str(self.index_dir))
+                self._index.start_background_merge()
+                if self._index.exists():
+                    self._ready.set()
+                elif build_if_missing:
+                    self._start_initial_build(self._index)
+            return self._index
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        category: Optional[str] = None,
+        doc_ids: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        全库检索
+
+        Args:
+            query: 查询文本
+            top_k: 返回页面数
+            category: 只检索该分类（可选）
+            doc_ids: 只检索这些文档（可选）
+
+        Returns:
+            按得分排序的页面列表（doc_id, page_num, title, category, snippet, score...）
+
+        Raises:
+            IndexBuildingError: 索引首次构建尚未完成
+        """
+        index = self._get_index()
+        if not self._ready.is_set():
+            raise IndexBuildingError("全库索引正在构建中，请稍后重试")
+        return index.search(query, top_k=top_k, category=category or None, doc_ids=doc_ids)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取索引状态（段数、文档数、页数、已删除页数）"""
+        index = self._get_index()
+        return {
+            "index_dir": str(self.index_dir),
+            "ready": self._ready.is_set(),
+            **index.get_stats(),
+        }
+
+
+_global_search: Optional[GlobalSearchService] = None
+
+
+def get_global_search() -> GlobalSearchService:
+    """获取全局检索服务实例"""
+    global _global_search
+    if _global_search is None:
+        _global_search = GlobalSearchService()
+    return _global_search
@@ -0,0 +1,480 @@
+"""
+文档库目录 - Agent 的 get_library_catalog / browse_category 工具使用
+
+目录在每个文档库版本（LibraryManager.get_revision）只构建一次：
+文档添加、删除、重新分类都会使版本号变化，下次读取时重建，其余时间直接复用。
+
+两种目录模式：
+- full: 所有分类 + 所有文档
+- hierarchical: Level 0 分类概览（文档数 + 分类摘要），Level 1 每个分类中与问题最相关的前 N 份文档
+  （按文件名 / 摘要 / 关键词的 BM25 词法得分排序），其余文档通过 browse_category 逐个分类查看
+"""
+import math
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+
+# Add project root to path (to import visual_memvid)
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from visual_memvid.bm25s_index import jieba_split
+
+from app.core.library_manager import LibraryManager
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数（中日韩字符按 1 个 token，其余字符按 4 个字符 1 个 token）"""
+    cjk = sum(1 for ch in text if "\u3000" <= ch <= "\u9fff" or "\uff00" <= ch <= "\uffef")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class CatalogSnapshot:
+    """
+    某个文档库版本的目录（不可变）
+
+    - categories: 结构化目录 [{name, document_count, documents: [{doc_id, filename, page_count, summary}]}]
+    - render(max_tokens): 文本目录，可按 token 预算截断
+    - render_hierarchical / render_category: 分层目录和分类下钻（按问题排序）
+    """
+
+    RULE = "=" * 80
+
+    # 词法排序的 BM25 参数
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(self, version: int, categories: List[Dict[str, Any]]):
+        self.version = version
+        self.categories = categories
+        self.total_documents = sum(category["document_count"] for category in categories)
+
+        # 预先格式化每个分类标题和每个文档条目，渲染时只需拼接
+        self._category_blocks: List[Tuple[str, List[str], List[int]]] = []
+        for category in categories:
+            header = (
+                f"📁 分类：{category['name']}（{category['document_count']} 份文档）\n"
+                f"{'-' * 80}\n"
+            )
+            entries = [
+                (
+                    f"  {i}. {doc['filename']}\n"
+                    f"     - 文档 ID: {doc['doc_id']}\n"
+                    f"     - 页数: {doc['page_count']} 页\n"
+                    f"     - 摘要: {doc['summary']}\n"
+                    f"\n"
+                )
+                for i, doc in enumerate(category["documents"], 1)
+            ]
+            self._category_blocks.append((header, entries, [estimate_tokens(e) for e in entries]))
+
+        self._header = (
+            "【文档库完整目录】\n\n"
+            f"共 {len(categories)} 个分类\n\n"
+            f"{self.RULE}\n\n"
+        )
+        self.full_tokens = (
+            estimate_tokens(self._header)
+            + sum(estimate_tokens(header) + sum(costs) for header, _, costs in self._category_blocks)
+            + estimate_tokens(self._footer(self.total_documents))
+        )
+        self._rendered: Dict[Optional[int], str] = {}
+        self._lock = threading.Lock()
+
+        # 分层目录使用的词法索引（首次使用时构建）
+        self._doc_terms: Optional[Dict[str, Counter]] = None
+        self._idf: Dict[str, float] = {}
+        self._avg_length = 1.0
+        self._digests: Dict[str, str] = {}
+        self._compact_entries: Dict[str, Tuple[str, int]] = {}
+
+    def _footer(self, listed: int) -> str:
+        footer = f"{self.RULE}\n"
+        footer += f"【统计】共 {len(self.categories)} 个分类，{self.total_documents} 份文档\n\n"
+        if listed < self.total_documents:
+            footer += (
+                f"【提示】目录已按长度预算截断，列出了 {listed} / {self.total_documents} 份文档；"
+                f"未列出的文档可以用 search_library_pages 按关键词或分类检索。\n"
+            )
+        footer += "【下一步】请选择您想查看的文档（可以是 1 个或多个），我会返回这些文档的目录（所有页面的摘要）。\n"
+        return footer
+
+    def _select(self, max_tokens: Optional[int]) -> List[int]:
+        """
+        计算每个分类列出的文档数
+
+        分类标题和统计信息总是保留；文档条目按轮转方式在分类之间分配预算，
+        避免排在前面的大分类占满预算
+        """
+        counts = [len(entries) for _, entries, _ in self._category_blocks]
+        if max_tokens is None:
+            return counts
+
+        budget = max_tokens - estimate_tokens(self._header) - estimate_tokens(self._footer(0))
+        for header, entries, _ in self._category_blocks:
+            budget -= estimate_tokens(header)
+            if entries:
+                # 截断提示行
+                budget -= 16
+
+        selected = [0] * len(self._category_blocks)
+        progress = True
+        while progress:
+            progress = False
+            for i, (_, entries, costs) in enumerate(self._category_blocks):
+                n = selected[i]
+                if n < len(entries) and costs[n] <= budget:
+                    budget -= costs[n]
+                    selected[i] = n + 1
+                    progress = True
+        return selected
+
+    def render(self, max_tokens: Optional[int] = None) -> str:
+        """
+        渲染文本目录
+
+        Args:
+            max_tokens: token 预算（None 或 <= 0 表示不限制）
+
+        Returns:
+            目录文本（同一预算的结果会缓存）
+        """
+        if max_tokens is not None and max_tokens <= 0:
+            max_tokens = None
+
+        with self._lock:
+            cached = self._rendered.get(max_tokens)
+        if cached is not None:
+            return cached
+
+        if not self.categories:
+            text = "文档库为空，没有任何分类和文档"
+        else:
+            selected = self._select(max_tokens)
+            parts = [self._header]
+            for (header, entries, _), n in zip(self._category_blocks, selected):
+                parts.append(header)
+                if not entries:
+                    parts.append("  （该分类下暂无文档）\n\n")
+                else:
+                    parts.extend(entries[:n])
+                    if n < len(entries):
+                        parts.append(f"  …（本分类还有 {len(entries) - n} 份文档未列出）\n\n")
+                parts.append("\n")
+            parts.append(self._footer(sum(selected)))
+            text = "".join(parts)
+
+        with self._lock:
+            self._rendered[max_tokens] = text
+        return text
+
+
+    # ==================== 分层目录 ====================
+
+    def _ensure_lexical(self):
+        """构建文档词法索引、分类摘要和紧凑条目（每个快照只构建一次）"""
+        if self._doc_terms is not None:
+            return
+        with self._lock:
+            if self._doc_terms is not None:
+                return
+
+            doc_terms: Dict[str, Counter] = {}
+            df: Counter = Counter()
+            category_dfs: Dict[str, Counter] = {}
+            for category in self.categories:
+                category_df = category_dfs[category["name"]] = Counter()
+                for doc in category["documents"]:
+                    text = " ".join([
+                        Path(str(doc["filename"])).stem,
+                        str(doc["summary"]),
+                        " ".join(doc.get("keywords") or []),
+                    ])
+                    terms = Counter(jieba_split(text.lower()))
+                    doc_terms[doc["doc_id"]] = terms
+                    df.update(terms.keys())
+                    category_df.update(terms.keys())
+
+                    entry = (
+                        f"  - {doc['filename']}（ID: {doc['doc_id']}，{doc['page_count']} 页）\n"
+                        f"    摘要: {doc['summary']}\n"
+                    )
+                    self._compact_entries[doc["doc_id"]] = (entry, estimate_tokens(entry))
+
+            n = max(len(doc_terms), 1)
+            self._idf = {term: math.log(1 + (n - freq + 0.5) / (freq + 0.5)) for term, freq in df.items()}
+
+            # 分类摘要：分类内文档频率 × 全库 IDF 最高的词（各分类都常见的词排在后面）+ 前几份文档的文件名
+            for category in self.categories:
+                category_df = category_dfs[category["name"]]
+                top_terms = sorted(category_df, key=lambda t: (-category_df[t] * self._idf[t], t))[:6]
+                examples = "、".join(str(doc["filename"]) for doc in category["documents"][:3])
+                digest = f"关键词：{'、'.join(top_terms)}" if top_terms else ""
+                if examples:
+                    digest += f"{'；' if digest else ''}例如：{examples}"
+                self._digests[category["name"]] = digest
+            lengths = [sum(terms.values()) for terms in doc_terms.values()]
+            self._avg_length = (sum(lengths) / len(lengths)) if lengths and sum(lengths) else 1.0
+            self._doc_terms = doc_terms
+
+    def rank_documents(self, category: Dict[str, Any], query: str) -> List[Dict[str, Any]]:
+        """按与问题的词法相关性排序分类下的文档（得分相同或无查询时保持原顺序）"""
+        self._ensure_lexical()
+        documents = category["documents"]
+        query_terms = [t for t in set(jieba_split(query.lower())) if t in self._idf] if query else []
+        if not query_terms:
+            return list(documents)
+
+        def score(doc: Dict[str, Any]) -> float:
+            terms = self._doc_terms.get(doc["doc_id"], Counter())
+            norm = self.K1 * (1 - self.B + self.B * sum(terms.values()) / self._avg_length)
+            return sum(
+                self._idf[t] * terms[t] * (self.K1 + 1) / (terms[t] + norm)
+                for t in query_terms if terms[t]
+            )
+
+        scored = [(-score(doc), i, doc) for i, doc in enumerate(documents)]
+        scored.sort(key=lambda item: (item[0], item[1]))
+        return [doc for _, _, doc in scored]
+
+    def find_category(self, name: str) -> Optional[Dict[str, Any]]:
+        return next((category for category in self.categories if category["name"] == name), None)
+
+    def render_hierarchical(self, query: str = "", top_n: int = 5, max_tokens: Optional[int] = None) -> str:
+        """
+        渲染分层目录
+
+        Level 0（分类概览）优先占用预算；剩余预算按相关性排名在分类之间轮转分配给
+        Level 1 文档条目，每个分类最多 top_n 份
+
+        Args:
+            query: 用户问题（用于文档排序）
+            top_n: 每个分类最多列出的文档数
+            max_tokens: token 预算（None 或 <= 0 表示不限制）
+
+        Returns:
+            分层目录文本
+        """
+        if not self.categories:
+            return "文档库为空，没有任何分类和文档"
+        self._ensure_lexical()
+        if max_tokens is not None and max_tokens <= 0:
+            max_tokens = None
+        budget = max_tokens if max_tokens is not None else math.inf
+
+        header = (
+            "【文档库分层目录】\n\n"
+            f"共 {len(self.categories)} 个分类，{self.total_documents} 份文档。"
+            f"文档较多，每个分类只列出与问题最相关的前 {top_n} 份。\n\n"
+            f"{self.RULE}\n\n"
+        )
+        footer = (
+            f"{self.RULE}\n"
+            "【下一步】\n"
+            "- 调用 browse_category(category=\"分类名\", query=\"问题\") 查看某个分类下的更多文档\n"
+            "- 或调用 search_library_pages 直接检索全库页面\n"
+            "- 选定文档后调用 get_documents_table_of_contents 查看页面摘要\n"
+        )
+        budget -= estimate_tokens(header) + estimate_tokens(footer)
+
+        # Level 0：分类概览
+        level0 = ["## 分类概览\n"]
+        budget -= estimate_tokens(level0[0])
+        shown_categories = []
+        for category in self.categories:
+            line = f"📁 {category['name']}（{category['document_count']} 份文档）"
+            digest = self._digests.get(category["name"])
+            line += f"｜{digest}\n" if digest else "\n"
+            cost = estimate_tokens(line)
+            if cost > budget:
+                break
+            budget -= cost
+            level0.append(line)
+            shown_categories.append(category)
+        if len(shown_categories) < len(self.categories):
+            level0.append(f"…（还有 {len(self.categories) - len(shown_categories)} 个分类未列出）\n")
+        level0.append("\n")
+
+        # Level 1：每个分类中排名靠前的文档
+        ranked = [self.rank_documents(category, query)[:top_n] for category in shown_categories]
+        for category in shown_categories:
+            budget -= estimate_tokens(f"## 分类：{category['name']}（相关文档 {top_n} / {category['document_count']}）\n\n")
+
+        selected = [0] * len(ranked)
+        progress = True
+        while progress:
+            progress = False
+            for i, docs in enumerate(ranked):
+                n = selected[i]
+                if n < len(docs):
+                    cost = self._compact_entries[docs[n]["doc_id"]][1]
+                    if cost <= budget:
+                        budget -= cost
+                        selected[i] = n + 1
+                        progress = True
+
+        level1 = []
+        for category, docs, n in zip(shown_categories, ranked, selected):
+            if n == 0:
+                continue
+            level1.append(f"## 分类：{category['name']}（相关文档 {n} / {category['document_count']}）\n")
+            level1.extend(self._compact_entries[doc["doc_id"]][0] for doc in docs[:n])
+            level1.append("\n")
+
+        return "".join([header, *level0, *level1, footer])
+
+    def render_category(
+        self,
+        name: str,
+        query: str = "",
+        offset: int = 0,
+        limit: int = 20,
+        max_tokens: Optional[int] = None
+    ) -> str:
+        """
+        渲染单个分类下的文档（按与问题的相关性排序，分页）
+
+        Args:
+            name: 分类名称
+            query: 用户问题（用于排序）
+            offset: 起始位置
+            limit: 最多列出的文档数
+            max_tokens: token 预算（None 或 <= 0 表示不限制）
+
+        Returns:
+            分类文档列表文本
+        """
+        category = self.find_category(name)
+        if category is None:
+            names = "、".join(c["name"] for c in self.categories)
+            return f"错误：分类「{name}」不存在。可用分类：{names}"
+        self._ensure_lexical()
+        if max_tokens is not None and max_tokens <= 0:
+            max_tokens = None
+        budget = max_tokens if max_tokens is not None else math.inf
+
+        ranked = self.rank_documents(category, query)
+        offset = max(0, offset)
+        candidates = ranked[offset:offset + max(1, limit)]
+
+        lines = []
+        budget -= 200  # 标题和翻页提示
+        for doc in candidates:
+            entry, cost = self._compact_entries[doc["doc_id"]]
+            if cost > budget:
+                break
+            budget -= cost
+            lines.append(entry)
+
+        end = offset + len(lines)
+        result = f"【分类文档】{name}：第 {offset + 1}-{end} 份 / 共 {len(ranked)} 份"
+        result += "（按与问题的相关性排序）\n\n" if query else "\n\n"
+        result += "".join(lines) if lines else "  （没有更多文档）\n"
+        if end < len(ranked):
+            result += f"\n【下一页】browse_category(category=\"{name}\", query=\"{query}\", offset={end})\n"
+        return result
+
+
+class CatalogService:
+    """按文档库版本缓存目录快照"""
+
+    def __init__(self, library_manager: Optional[LibraryManager] = None):
+        self.library_manager = library_manager or LibraryManager()
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._lock = threading.Lock()
+
+    def _build(self, version: int) -> CatalogSnapshot:
+        categories = []
+        for category in self.library_manager.get_categories():
+            name = category.get("name", "未命名分类")
+            documents = []
+            for doc in self.library_manager.list_documents(category=name):
+                metadata = doc.get("metadata", {})
+                documents.append({
+                    "doc_id": doc["doc_id"],
+                    "filename": metadata.get("filename", doc.get("title", doc["doc_id"])),
+                    "page_count": metadata.get("page_count", "未知"),
+                    "summary": metadata.get("doc_summary", "无摘要"),
+                    "keywords": metadata.get("keywords") or [],
+                })
+            categories.append({
+                "name": name,
+                "document_count": category.get("document_count", len(documents)),
+                "documents": documents,
+            })
+        return CatalogSnapshot(version, categories)
+
+    def get_snapshot(self) -> CatalogSnapshot:
+        """获取当前文档库版本的目录快照（版本变化时重建）"""
+        version = self.library_manager.get_revision()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version:
+                snapshot = self._build(version)
+                self._snapshot = snapshot
+                logger.info(
+                    f"📚 文档库目录已重建: 版本 {version}，"
+                    f"{len(snapshot.categories)} 个分类，{snapshot.total_documents} 份文档"
+                )
+            return snapshot
+
+    def render(
+        self,
+        query: str = "",
+        max_tokens: Optional[int] = None,
+        mode: str = "auto",
+        top_n: int = 5
+    ) -> str:
+        """
+        获取文本目录
+
+        Args:
+            query: 用户问题（分层目录按它排序文档）
+            max_tokens: token 预算（None 或 <= 0 表示不限制）
+            mode: full / hierarchical / auto（完整目录超出预算时使用分层目录）
+            top_n: 分层目录每个分类列出的文档数
+
+        Returns:
+            目录文本
+        """
+        snapshot = self.get_snapshot()
+        if mode == "auto":
+            fits = not max_tokens or max_tokens <= 0 or snapshot.full_tokens <= max_tokens
+            mode = "full" if fits else "hierarchical"
+
+        if mode == "hierarchical":
+            return snapshot.render_hierarchical(query, top_n=top_n, max_tokens=max_tokens)
+        if mode == "full":
+            return snapshot.render(max_tokens)
+        raise ValueError(f"不支持的目录模式: {mode}，可选: full, hierarchical, auto")
+
+    def render_category(
+        self,
+        category: str,
+        query: str = "",
+        offset: int = 0,
+        limit: int = 20,
+        max_tokens: Optional[int] = None
+    ) -> str:
+        """获取单个分类下的文档（分层目录的下钻）"""
+        return self.get_snapshot().render_category(
+            category, query=query, offset=offset, limit=limit, max_tokens=max_tokens
+        )
+
+
+_catalog_service: Optional[CatalogService] = None
+
+
+def get_catalog_service() -> CatalogService:
+    """获取全局目录服务实例"""
+    global _catalog_service
+    if _catalog_service is None:
+        _catalog_service = CatalogService()
+    return _catalog_service
@@ -1,23 +1,108 @@
 """
 图书馆管理器 - 管理文档索引和分类
+
+存储后端（settings.library_backend）：
+- json: data/library_index.json（默认），原子替换写入 + 文件锁 + 预写日志
+- sqlite: data/library.sqlite3，categories / documents / pages 三张表，写操作在事务中执行；
+  首次打开时自动导入已有的 library_index.json
+
+两种后端都维护单调递增的 revision（每次写入 +1），用于列表接口的 ETag
 """
+import base64
+import copy
+import json
+import os
+import sqlite3
+import threading
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from loguru import logger
 
 from app.config import get_settings
-from app.utils import load_json, save_json
+from app.utils import FileLock, load_json, save_json_atomic
 
 
-class LibraryManager:
-    """图书馆管理器"""
-    
-    def __init__(self):
-        self.settings = get_settings()
-        self.index_path = self.settings.data_dir / "library_index.json"
-        self._ensure_index()
-    
+class LibraryView:
+    """
+    library_index.json 的内存视图（只读）
+
+    - documents: {doc_id: 文档}
+    - by_category: {分类: [文档]}（文档带 category 字段）
+    """
+
+    def __init__(self, index: Dict[str, Any], file_stat: Tuple[int, int, int]):
+        self.index = index
+        self.file_stat = file_stat
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.document_categories: Dict[str, str] = {}
+        self.by_category: Dict[str, List[Dict[str, Any]]] = {}
+
+        for category_name, category_data in index["categories"].items():
+            docs = []
+            for doc_id, doc in category_data["documents"].items():
+                self.documents[doc_id] = doc
+                self.document_categories[doc_id] = category_name
+                docs.append({**doc, "category": category_name})
+            self.by_category[category_name] = docs
+
+
+# 进程内共享的视图缓存 {索引文件路径: LibraryView}，所有 LibraryManager 实例共用
+_views: Dict[Path, LibraryView] = {}
+_views_lock = threading.Lock()
+
+
+class JSONLibraryStore:
+    """
+    JSON 存储（library_index.json）
+
+    - 读取走 inode / mtime 校验的内存视图，不加锁
+    - 写入持有跨进程文件锁：先把操作追加到预写日志（library_index.json.wal）并 fsync，
+      再在锁内重新读取索引、应用操作、写临时文件后 os.replace 原子替换，最后清空日志
+    - 崩溃后下次写入（或启动）时重放日志；操作是幂等的，重复重放不会出错
+    """
+
+    def __init__(self, index_path: Path):
+        self.index_path = index_path
+        self.wal_path = index_path.with_name(f"{index_path.name}.wal")
+        self.lock = FileLock(index_path.with_name(f"{index_path.name}.lock"))
+        with self.lock:
+            self._ensure_index()
+            self._replay_wal()
+
+    def _file_stat(self) -> Tuple[int, int, int]:
+        # 每次写入都经 os.replace 生成新 inode：其他进程的连续写入即使大小相同、
+        # mtime 落在同一时钟粒度内，inode 也会变化
+        stat = self.index_path.stat()
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _view(self) -> LibraryView:
+        """
+        获取内存视图
+
+        每次读取只 stat 一次索引文件，inode / mtime / 大小未变化时直接使用内存中的数据，
+        文件被其他进程或实例修改后自动重新加载
+        """
+        file_stat = self._file_stat()
+        view = _views.get(self.index_path)
+        if view is not None and view.file_stat == file_stat:
+            return view
+
+        with _views_lock:
+            view = _views.get(self.index_path)
+            if view is None or view.file_stat != file_stat:
+                view = LibraryView(load_json(self.index_path), file_stat)
+                _views[self.index_path] = view
+            return view
+
+    def _save_index(self, index: Dict[str, Any]):
+        """原子保存索引并使内存视图失效（调用方持有文件锁）"""
+        save_json_atomic(index, self.index_path)
+        with _views_lock:
+            _views.pop(self.index_path, None)
+
     def _ensure_index(self):
         """确保索引文件存在"""
         if not self.index_path.exists():
@@ -25,15 +110,638 @@ class LibraryManager:
                 "version": "1.0",
                 "categories": {},
                 "total_documents": 0,
+                "revision": 0,
                 "created_at": datetime.now().isoformat(),
                 "updated_at": datetime.now().isoformat()
             }
-            save_json(initial_index, self.index_path)
-    
+            save_json_atomic(initial_index, self.index_path)
+
+    # ==================== 预写日志 ====================
+
+    def _append_wal(self, op: Dict[str, Any]):
+        with open(self.wal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(op, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _truncate_wal(self):
+        with open(self.wal_path, "w", encoding="utf-8"):
+            pass
+
+    def _replay_wal(self):
+        """重放预写日志中未完成的操作（调用方持有文件锁）"""
+        if not self.wal_path.exists() or self.wal_path.stat().st_size == 0:
+            return
+
+        ops = []
+        with open(self.wal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    ops.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # 追加日志时崩溃留下的半行：该操作未生效，丢弃
+                    break
+
+        if ops:
+            index = load_json(self.index_path)
+            for op in ops:
+                self._apply(index, op)
+            self._save_index(index)
+            logger.warning(f"已重放文档库预写日志: {len(ops)} 个操作")
+        self._truncate_wal()
+
+    def _write(self, op: Dict[str, Any]):
+        """记录日志并应用一个写操作"""
+        op["at"] = datetime.now().isoformat()
+        with self.lock:
+            self._replay_wal()
+            self._append_wal(op)
+            # 持锁后重新读取，避免覆盖其他进程刚写入的内容
+            index = load_json(self.index_path)
+            self._apply(index, op)
+            self._save_index(index)
+            self._truncate_wal()
+
+    @staticmethod
+    def _apply(index: Dict[str, Any], op: Dict[str, Any]):
+        """把操作应用到索引（幂等）"""
+        if op["op"] == "add":
+            category = op["category"]
+
+            # Initialize category if not exists
+            if category not in index["categories"]:
+                index["categories"][category] = {
+                    "name": category,
+                    "documents": {},
+                    "document_count": 0
+                }
+
+            # Add document to category
+            index["categories"][category]["documents"][op["doc_id"]] = {
+                "doc_id": op["doc_id"],
+                "title": op["title"],
+                "category_confidence": op["category_confidence"],
+                "metadata": op["metadata"],
+                "created_at": op["at"],
+                "updated_at": op["at"]
+            }
+
+            # Update counts
+            index["categories"][category]["document_count"] = len(
+                index["categories"][category]["documents"]
+            )
+
+        elif op["op"] == "remove":
+            # Find and remove document
+            for category_name, category_data in index["categories"].items():
+                if op["doc_id"] in category_data["documents"]:
+                    del category_data["documents"][op["doc_id"]]
+                    category_data["document_count"] = len(category_data["documents"])
+
+                    # Remove empty category
+                    if category_data["document_count"] == 0:
+                        del index["categories"][category_name]
+
+                    break
+
+        else:
+            raise ValueError(f"未知的文档库操作: {op['op']}")
+
+        index["total_documents"] = sum(
+            cat["document_count"] for cat in index["categories"].values()
+        )
+        index["revision"] = index.get("revision", 0) + 1
+        index["updated_at"] = op["at"]
+
+    # ==================== 读写接口 ====================
+
+    def get_index(self) -> Dict[str, Any]:
+        return copy.deepcopy(self._view().index)
+
+    def add_document(
+        self,
+        doc_id: str,
+        title: str,
+        category: str,
+        category_confidence: float,
+        metadata: Dict[str, Any]
+    ):
+        self._write({
+            "op": "add",
+            "doc_id": doc_id,
+            "title": title,
+            "category": category,
+            "category_confidence": category_confidence,
+            "metadata": metadata,
+        })
+
+    def remove_document(self, doc_id: str):
+        self._write({"op": "remove", "doc_id": doc_id})
+
+    def get_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        doc = self._view().documents.get(doc_id)
+        return copy.deepcopy(doc) if doc is not None else None
+
+    def get_document_category(self, doc_id: str) -> Optional[str]:
+        return self._view().document_categories.get(doc_id)
+
+    def list_documents(self, category: Optional[str] = None) -> List[Dict[str, Any]]:
+        view = self._view()
+
+        if category:
+            docs = view.by_category.get(category, [])
+        else:
+            docs = [doc for category_docs in view.by_category.values() for doc in category_docs]
+
+        # 返回浅拷贝（与原先每次解析文件得到的新对象行为一致，调用方可修改顶层字段）
+        return [doc.copy() for doc in docs]
+
+    def query_documents(
+        self,
+        category: Optional[str],
+        q: Optional[str],
+        sort: str,
+        order: str,
+        after: Optional[Tuple],
+        limit: int
+    ) -> Tuple[List[Tuple[Tuple, Dict[str, Any]]], bool, int]:
+        """分页查询（在内存视图上过滤排序，返回的文档对象只读，不得修改）"""
+        view = self._view()
+        if category:
+            docs = view.by_category.get(category, [])
+        else:
+            docs = [doc for category_docs in view.by_category.values() for doc in category_docs]
+        return _paginate(docs, q, sort, order, after, limit)
+
+    def get_categories(self) -> List[Dict[str, Any]]:
+        index = self._view().index
+        return [
+            {
+                "name": cat_name,
+                "document_count": cat_data["document_count"]
+            }
+            for cat_name, cat_data in index["categories"].items()
+        ]
+
+    def get_total_documents(self) -> int:
+        return self._view().index["total_documents"]
+
+    def get_revision(self) -> int:
+        return self._view().index.get("revision", 0)
+
+
+class SQLiteLibraryStore:
+    """
+    SQLite 存储（WAL 模式）
+
+    - 写操作使用 BEGIN IMMEDIATE 事务，多个上传并发写入不会互相覆盖
+    - 单次写入只涉及该文档的行，不再整体重写文档库
+    - documents 表按 doc_id、category 和各排序字段建立索引，分页查询的排序、游标和 LIMIT 在 SQL 中执行
+    """
+
+    DB_NAME = "library.sqlite3"
+
+    # 排序字段对应的 SQL 表达式（page_count 只在 metadata 中，使用表达式索引）
+    SORT_EXPRESSIONS = {
+        "upload_time": "upload_time",
+        "title": "title",
+        "page_count": "json_extract(metadata, '$.page_count')",
+        "doc_id": "doc_id",
+        "created_at": "created_at",
+        "updated_at": "updated_at",
+    }
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS library_meta (
+        key     TEXT PRIMARY KEY,
+        value   TEXT NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS categories (
+        name        TEXT PRIMARY KEY,
+        created_at  TEXT NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS documents (
+        doc_id              TEXT PRIMARY KEY,
+        category            TEXT NOT NULL REFERENCES categories(name),
+        title               TEXT NOT NULL DEFAULT '',
+        category_confidence REAL,
+        metadata            TEXT NOT NULL DEFAULT '{}',
+        upload_time         TEXT,
+        created_at          TEXT NOT NULL,
+        updated_at          TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_documents_category ON documents(category);
+    CREATE INDEX IF NOT EXISTS idx_documents_upload_time ON documents(upload_time);
+    -- 分页排序：(排序列, doc_id)，与 query_documents 的 ORDER BY 一致
+    CREATE INDEX IF NOT EXISTS idx_documents_sort_upload_time ON documents(upload_time, doc_id);
+    CREATE INDEX IF NOT EXISTS idx_documents_sort_title ON documents(title, doc_id);
+    CREATE INDEX IF NOT EXISTS idx_documents_sort_created_at ON documents(created_at, doc_id);
+    CREATE INDEX IF NOT EXISTS idx_documents_sort_updated_at ON documents(updated_at, doc_id);
+    CREATE INDEX IF NOT EXISTS idx_documents_sort_page_count
+        ON documents(json_extract(metadata, '$.page_count'), doc_id);
+
+    CREATE TABLE IF NOT EXISTS pages (
+        doc_id      TEXT NOT NULL REFERENCES documents(doc_id) ON DELETE CASCADE,
+        page_num    INTEGER NOT NULL,
+        frame_num   INTEGER NOT NULL,
+        PRIMARY KEY (doc_id, page_num)
+    );
+    """
+
+    def __init__(self, data_dir: Path, json_path: Optional[Path] = None):
+        self.db_path = data_dir / self.DB_NAME
+        data_dir.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # isolation_level=None：由 _transaction 显式控制事务
+        self._conn = sqlite3.connect(
+            str(self.db_path), timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.row_factory = sqlite3.Row
+        # 关键词过滤与 JSON 后端一致使用 str.lower（SQLite 内置 lower 只处理 ASCII）
+        self._conn.create_function(
+            "py_lower", 1, lambda value: value.lower() if isinstance(value, str) else value, deterministic=True
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(self.SCHEMA)
+
+        with self._transaction() as conn:
+            now = datetime.now().isoformat()
+            conn.execute("INSERT OR IGNORE INTO library_meta(key, value) VALUES ('version', '1.0')")
+            conn.execute("INSERT OR IGNORE INTO library_meta(key, value) VALUES ('created_at', ?)", (now,))
+            conn.execute("INSERT OR IGNORE INTO library_meta(key, value) VALUES ('updated_at', ?)", (now,))
+            conn.execute("INSERT OR IGNORE INTO library_meta(key, value) VALUES ('revision', '0')")
+
+        # library_index.json 只自动导入一次：之后即使文档全部删除也不再导入
+        imported_flag = self._query("SELECT value FROM library_meta WHERE key = 'json_imported'")
+        if json_path is not None and json_path.exists() and not imported_flag:
+            if self.get_total_documents() == 0:
+                imported = self.import_json(json_path)
+                if imported:
+                    logger.info(f"✅ 已从 {json_path.name} 导入 {imported} 个文档到 SQLite 文档库")
+            else:
+                # 加入该标记之前创建的数据库：已有文档说明导入过
+                with self._transaction() as conn:
+                    self._mark_json_imported(conn)
+
+    @contextmanager
+    def _transaction(self):
+        """写事务（BEGIN IMMEDIATE，失败时回滚）"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _row_to_document(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "doc_id": row["doc_id"],
+            "title": row["title"],
+            "category_confidence": row["category_confidence"],
+            "metadata": json.loads(row["metadata"]),
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    @staticmethod
+    def _upsert_document(conn: sqlite3.Connection, category: str, document: Dict[str, Any]):
+        """写入单个文档（调用方持有事务）"""
+        metadata = document.get("metadata") or {}
+        now = datetime.now().isoformat()
+        conn.execute(
+            "INSERT OR IGNORE INTO categories(name, created_at) VALUES (?, ?)",
+            (category, now)
+        )
+        # ON CONFLICT 更新保留原行号，重复上传的文档在列表中的位置不变
+        conn.execute(
+            """
+            INSERT INTO documents(doc_id, category, title, category_confidence, metadata,
+                                  upload_time, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(doc_id) DO UPDATE SET
+                category = excluded.category,
+                title = excluded.title,
+                category_confidence = excluded.category_confidence,
+                metadata = excluded.metadata,
+                upload_time = excluded.upload_time,
+                created_at = excluded.created_at,
+                updated_at = excluded.updated_at
+            """,
+            (
+                document["doc_id"],
+                category,
+                document.get("title", ""),
+                document.get("category_confidence"),
+                json.dumps(metadata, ensure_ascii=False),
+                metadata.get("upload_time"),
+                document.get("created_at") or now,
+                document.get("updated_at") or now,
+            )
+        )
+
+        page_count = metadata.get("page_count") or 0
+        conn.execute("DELETE FROM pages WHERE doc_id = ?", (document["doc_id"],))
+        conn.executemany(
+            "INSERT INTO pages(doc_id, page_num, frame_num) VALUES (?, ?, ?)",
+            [(document["doc_id"], page_num, page_num - 1) for page_num in range(1, page_count + 1)]
+        )
+
+    @staticmethod
+    def _touch(conn: sqlite3.Connection):
+        """更新文档库修改时间和 revision，清理空分类（调用方持有事务）"""
+        conn.execute(
+            "DELETE FROM categories WHERE name NOT IN (SELECT DISTINCT category FROM documents)"
+        )
+        conn.execute(
+            "UPDATE library_meta SET value = ? WHERE key = 'updated_at'",
+            (datetime.now().isoformat(),)
+        )
+        conn.execute(
+            "UPDATE library_meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'revision'"
+        )
+
+    def import_json(self, json_path: Path) -> int:
+        """
+        从 library_index.json 导入（单个事务；已存在的 doc_id 会被覆盖）
+
+        Returns:
+            导入的文档数
+        """
+        index = load_json(json_path)
+        imported = 0
+        with self._transaction() as conn:
+            for category_name, category_data in index.get("categories", {}).items():
+                for document in category_data.get("documents", {}).values():
+                    self._upsert_document(conn, category_name, document)
+                    imported += 1
+            if index.get("created_at"):
+                conn.execute(
+                    "UPDATE library_meta SET value = ? WHERE key = 'created_at'",
+                    (index["created_at"],)
+                )
+            self._mark_json_imported(conn)
+            self._touch(conn)
+        return imported
+
+    @staticmethod
+    def _mark_json_imported(conn: sqlite3.Connection):
+        """记录已导入过 library_index.json（调用方持有事务）"""
+        conn.execute(
+            "INSERT OR REPLACE INTO library_meta(key, value) VALUES ('json_imported', ?)",
+            (datetime.now().isoformat(),)
+        )
+
+    def get_index(self) -> Dict[str, Any]:
+        """按 JSON 存储的结构组装完整索引"""
+        meta = {row["key"]: row["value"] for row in self._query("SELECT key, value FROM library_meta")}
+        categories: Dict[str, Any] = {
+            row["name"]: {"name": row["name"], "documents": {}, "document_count": 0}
+            for row in self._query("SELECT name FROM categories ORDER BY rowid")
+        }
+        for row in self._query("SELECT * FROM documents ORDER BY rowid"):
+            category = categories.setdefault(
+                row["category"], {"name": row["category"], "documents": {}, "document_count": 0}
+            )
+            category["documents"][row["doc_id"]] = self._row_to_document(row)
+            category["document_count"] += 1
+
+        return {
+            "version": meta.get("version", "1.0"),
+            "categories": categories,
+            "total_documents": sum(cat["document_count"] for cat in categories.values()),
+            "revision": int(meta.get("revision", 0)),
+            "created_at": meta.get("created_at"),
+            "updated_at": meta.get("updated_at"),
+        }
+
+    def add_document(
+        self,
+        doc_id: str,
+        title: str,
+        category: str,
+        category_confidence: float,
+        metadata: Dict[str, Any]
+    ):
+        with self._transaction() as conn:
+            self._upsert_document(conn, category, {
+                "doc_id": doc_id,
+                "title": title,
+                "category_confidence": category_confidence,
+                "metadata": metadata,
+            })
+            self._touch(conn)
+
+    def remove_document(self, doc_id: str):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+            self._touch(conn)
+
+    def get_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query("SELECT * FROM documents WHERE doc_id = ?", (doc_id,))
+        return self._row_to_document(rows[0]) if rows else None
+
+    def get_document_category(self, doc_id: str) -> Optional[str]:
+        rows = self._query("SELECT category FROM documents WHERE doc_id = ?", (doc_id,))
+        return rows[0]["category"] if rows else None
+
+    def list_documents(self, category: Optional[str] = None) -> List[Dict[str, Any]]:
+        if category:
+            rows = self._query(
+                "SELECT * FROM documents WHERE category = ? ORDER BY rowid", (category,)
+            )
+        else:
+            rows = self._query(
+                "SELECT d.* FROM documents d JOIN categories c ON c.name = d.category "
+                "ORDER BY c.rowid, d.rowid"
+            )
+        return [{**self._row_to_document(row), "category": row["category"]} for row in rows]
+
+    def query_documents(
+        self,
+        category: Optional[str],
+        q: Optional[str],
+        sort: str,
+        order: str,
+        after: Optional[Tuple],
+        limit: int
+    ) -> Tuple[List[Tuple[Tuple, Dict[str, Any]]], bool, int]:
+        """
+        分页查询（过滤、排序、游标和 LIMIT 都在 SQL 中执行）
+
+        排序与 _sort_key 一致：SQLite 升序时 NULL 排在最前、降序时排在最后，doc_id 兜底
+        """
+        column = self.SORT_EXPRESSIONS[sort]
+        filters: List[str] = []
+        params: List[Any] = []
+        if category:
+            filters.append("category = ?")
+            params.append(category)
+        if q:
+            needle = q.lower()
+            filters.append("(instr(py_lower(title), ?) > 0 OR instr(py_lower(doc_id), ?) > 0)")
+            params.extend([needle, needle])
+
+        where = f"WHERE {' AND '.join(filters)}" if filters else ""
+        total = self._query(f"SELECT COUNT(*) AS n FROM documents {where}", tuple(params))[0]["n"]
+
+        if after is not None:
+            has_value, value, doc_id = after
+            if order == "asc":
+                if has_value:
+                    filters.append(f"({column} > ? OR ({column} = ? AND doc_id > ?))")
+                    params.extend([value, value, doc_id])
+                else:
+                    filters.append(f"({column} IS NOT NULL OR doc_id > ?)")
+                    params.append(doc_id)
+            else:
+                if has_value:
+                    filters.append(f"({column} < ? OR {column} IS NULL OR ({column} = ? AND doc_id < ?))")
+                    params.extend([value, value, doc_id])
+                else:
+                    filters.append(f"({column} IS NULL AND doc_id < ?)")
+                    params.append(doc_id)
+
+        where = f"WHERE {' AND '.join(filters)}" if filters else ""
+        direction = "ASC" if order == "asc" else "DESC"
+        order_by = f"doc_id {direction}" if sort == "doc_id" else f"{column} {direction}, doc_id {direction}"
+        rows = self._query(
+            f"SELECT * FROM documents {where} ORDER BY {order_by} LIMIT ?",
+            tuple(params) + (limit + 1,)
+        )
+
+        page = []
+        for row in rows[:limit]:
+            doc = {**self._row_to_document(row), "category": row["category"]}
+            page.append((_sort_key(doc, sort), doc))
+        return page, len(rows) > limit, total
+
+    def get_categories(self) -> List[Dict[str, Any]]:
+        rows = self._query(
+            "SELECT c.name, COUNT(d.doc_id) AS document_count FROM categories c "
+            "LEFT JOIN documents d ON d.category = c.name GROUP BY c.name ORDER BY c.rowid"
+        )
+        return [{"name": row["name"], "document_count": row["document_count"]} for row in rows]
+
+    def get_total_documents(self) -> int:
+        return self._query("SELECT COUNT(*) AS n FROM documents")[0]["n"]
+
+    def get_revision(self) -> int:
+        rows = self._query("SELECT value FROM library_meta WHERE key = 'revision'")
+        return int(rows[0]["value"]) if rows else 0
+
+
+# 进程内共享的存储实例 {(后端, 路径): 存储}
+_stores: Dict[Tuple[str, str], Any] = {}
+_stores_lock = threading.Lock()
+
+
+def _get_store(backend: str, data_dir: Path):
+    key = (backend, str(data_dir.resolve()))
+    with _stores_lock:
+        if key not in _stores:
+            json_path = data_dir / "library_index.json"
+            if backend == "sqlite":
+                _stores[key] = SQLiteLibraryStore(data_dir, json_path=json_path)
+            elif backend == "json":
+                _stores[key] = JSONLibraryStore(json_path)
+            else:
+                raise ValueError(f"不支持的文档库存储后端: {backend}")
+        return _stores[key]
+
+
+# ==================== 分页列表 ====================
+
+# 可排序字段（顶层字段或 metadata 中的字段）
+SORTABLE_FIELDS = ("upload_time", "title", "page_count", "doc_id", "created_at", "updated_at")
+
+# 未指定 fields 时返回的字段
+DEFAULT_LIST_FIELDS = ("doc_id", "title", "category", "page_count", "upload_time")
+
+MAX_PAGE_SIZE = 500
+
+
+def _field_value(doc: Dict[str, Any], field: str) -> Any:
+    """读取字段：优先顶层字段，其次 metadata 中的同名字段"""
+    if field in doc:
+        return doc[field]
+    return (doc.get("metadata") or {}).get(field)
+
+
+def _sort_key(doc: Dict[str, Any], sort: str) -> Tuple:
+    """排序键（缺失值排在最前，doc_id 兜底保证顺序唯一）"""
+    value = _field_value(doc, sort)
+    return (value is not None, value if value is not None else "", doc["doc_id"])
+
+
+def _encode_cursor(sort: str, order: str, key: Tuple) -> str:
+    payload = json.dumps({"s": sort, "o": order, "k": list(key)}, ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort: str, order: str) -> Tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        key = tuple(payload["k"])
+    except Exception:
+        raise ValueError("无效的分页游标")
+    if payload.get("s") != sort or payload.get("o") != order or len(key) != 3:
+        raise ValueError("分页游标与当前排序参数不一致")
+    return key
+
+
+def _paginate(
+    docs: List[Dict[str, Any]],
+    q: Optional[str],
+    sort: str,
+    order: str,
+    after: Optional[Tuple],
+    limit: int
+) -> Tuple[List[Tuple[Tuple, Dict[str, Any]]], bool, int]:
+    """在内存中过滤、排序并按游标切片，返回 ([(排序键, 文档)], 是否还有下一页, 总数)"""
+    if q:
+        needle = q.lower()
+        docs = [
+            doc for doc in docs
+            if needle in str(doc.get("title", "")).lower() or needle in doc["doc_id"].lower()
+        ]
+
+    keyed = sorted(((_sort_key(doc, sort), doc) for doc in docs), key=lambda item: item[0])
+    keys = [key for key, _ in keyed]
+
+    if order == "asc":
+        start = bisect_right(keys, after) if after is not None else 0
+        return keyed[start:start + limit], start + limit < len(keyed), len(docs)
+
+    end = bisect_left(keys, after) if after is not None else len(keyed)
+    return keyed[max(0, end - limit):end][::-1], end - limit > 0, len(docs)
+
+
+class LibraryManager:
+    """图书馆管理器"""
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.index_path = self.settings.data_dir / "library_index.json"
+        self.backend = self.settings.library_backend
+        self.store = _get_store(self.backend, self.settings.data_dir)
+
     def get_index(self) -> Dict[str, Any]:
-        """获取完整索引"""
-        return load_json(self.index_path)
-    
+        """获取完整索引（副本，可自由修改）"""
+        return self.store.get_index()
+
     def add_document(
         self,
         doc_id: str,
@@ -44,55 +752,26 @@ class LibraryManager:
     ) -> bool:
         """
         添加文档到索引
-        
+
         Args:
             doc_id: 文档 ID
             title: 文档标题
             category: 分类
             category_confidence: 分类置信度
             metadata: 元数据
-        
+
         Returns:
             是否成功
         """
         try:
-            index = self.get_index()
-            
-            # Initialize category if not exists
-            if category not in index["categories"]:
-                index["categories"][category] = {
-                    "name": category,
-                    "documents": {},
-                    "document_count": 0
-                }
-            
-            # Add document to category
-            index["categories"][category]["documents"][doc_id] = {
-                "doc_id": doc_id,
-                "title": title,
-                "category_confidence": category_confidence,
-                "metadata": metadata,
-                "created_at": datetime.now().isoformat(),
-                "updated_at": datetime.now().isoformat()
-            }
-            
-            # Update counts
-            index["categories"][category]["document_count"] = len(
-                index["categories"][category]["documents"]
-            )
-            index["total_documents"] = sum(
-                cat["document_count"] for cat in index["categories"].values()
-            )
-            index["updated_at"] = datetime.now().isoformat()
-            
-            save_json(index, self.index_path)
+            self.store.add_document(doc_id, title, category, category_confidence, metadata)
             logger.info(f"文档已添加到索引: {doc_id} -> {category}")
             return True
-        
+
         except Exception as e:
             logger.error(f"添加文档到索引失败: {e}")
             return False
-    
+
     def delete_document(self, doc_id: str) -> bool:
         """
         完全删除文档（包括所有相关文件）
@@ -128,6 +807,9 @@ class LibraryManager:
             # Summary 文件
             if "summary_path" in metadata:
                 files_to_delete.append(metadata["summary_path"])
+                # 二进制 Summary（与 summaries.json 同目录同名）
+                if metadata["summary_path"]:
+                    files_to_delete.append(str(Path(metadata["summary_path"]).with_suffix(".bin")))
 
             # 索引文件
             if "index_path" in metadata:
@@ -167,42 +849,22 @@ class LibraryManager:
             是否成功
         """
         try:
-            index = self.get_index()
-
-            # Find and remove document
-            for category_name, category_data in index["categories"].items():
-                if doc_id in category_data["documents"]:
-                    del category_data["documents"][doc_id]
-                    category_data["document_count"] = len(category_data["documents"])
-
-                    # Remove empty category
-                    if category_data["document_count"] == 0:
-                        del index["categories"][category_name]
-
-                    break
-
-            # Update total count
-            index["total_documents"] = sum(
-                cat["document_count"] for cat in index["categories"].values()
-            )
-            index["updated_at"] = datetime.now().isoformat()
-
-            save_json(index, self.index_path)
+            self.store.remove_document(doc_id)
             logger.info(f"文档已从索引移除: {doc_id}")
             return True
 
         except Exception as e:
             logger.error(f"从索引移除文档失败: {e}")
             return False
-    
+
     def get_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
         """获取文档信息"""
-        index = self.get_index()
-        for category_data in index["categories"].values():
-            if doc_id in category_data["documents"]:
-                return category_data["documents"][doc_id]
-        return None
-    
+        return self.store.get_document(doc_id)
+
+    def get_document_category(self, doc_id: str) -> Optional[str]:
+        """获取文档所属分类"""
+        return self.store.get_document_category(doc_id)
+
     def list_documents(self, category: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         列出文档
@@ -213,56 +875,98 @@ class LibraryManager:
         Returns:
             文档列表
         """
-        index = self.get_index()
-        documents = []
+        return self.store.list_documents(category)
+
+    def get_revision(self) -> int:
+        """文档库版本号（每次写入 +1）"""
+        return self.store.get_revision()
+
+    def query_documents(
+        self,
+        category: Optional[str] = None,
+        q: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        sort: str = "upload_time",
+        order: str = "desc",
+        cursor: Optional[str] = None,
+        limit: int = 50
+    ) -> Dict[str, Any]:
+        """
+        分页列出文档（游标分页 + 字段投影 + 排序过滤）
+
+        游标记录上一页最后一个文档的排序键，翻页期间有文档增删也不会跳过或重复
+
+        Args:
+            category: 分类过滤（可选）
+            q: 标题 / doc_id 包含的关键词（不区分大小写，可选）
+            fields: 返回的字段（顶层字段或 metadata 中的字段），默认 DEFAULT_LIST_FIELDS
+            sort: 排序字段，见 SORTABLE_FIELDS
+            order: asc / desc
+            cursor: 上一页返回的 next_cursor
+            limit: 每页数量（1 ~ MAX_PAGE_SIZE）
+
+        Returns:
+            {"items", "next_cursor", "total", "version"}
+
+        Raises:
+            ValueError: 参数或游标无效
+        """
+        if sort not in SORTABLE_FIELDS:
+            raise ValueError(f"不支持的排序字段: {sort}，可选: {', '.join(SORTABLE_FIELDS)}")
+        if order not in ("asc", "desc"):
+            raise ValueError(f"不支持的排序方向: {order}，可选: asc, desc")
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        fields = list(fields) if fields else list(DEFAULT_LIST_FIELDS)
+
+        version = self.get_revision()
+        after = _decode_cursor(cursor, sort, order) if cursor else None
+        page, has_more, total = self.store.query_documents(category, q, sort, order, after, limit)
+
+        items = [{field: _field_value(doc, field) for field in fields} for _, doc in page]
+        next_cursor = _encode_cursor(sort, order, page[-1][0]) if page and has_more else None
+
+        return {
+            "items": items,
+            "next_cursor": next_cursor,
+            "total": total,
+            "version": version,
+        }
 
-        if category:
-            if category in index["categories"]:
-                # 添加 category 字段到每个文档
-                for doc in index["categories"][category]["documents"].values():
-                    doc_with_category = doc.copy()
-                    doc_with_category["category"] = category
-                    documents.append(doc_with_category)
-        else:
-            for category_name, category_data in index["categories"].items():
-                # 添加 category 字段到每个文档
-                for doc in category_data["documents"].values():
-                    doc_with_category = doc.copy()
-                    doc_with_category["category"] = category_name
-                    documents.append(doc_with_category)
-
-        return documents
-    
     def get_categories(self) -> List[Dict[str, Any]]:
         """获取所有分类"""
-        index = self.get_index()
-        return [
-            {
-                "name": cat_name,
-                "document_count": cat_data["document_count"]
-            }
-            for cat_name, cat_data in index["categories"].items()
-        ]
-    
+        return self.store.get_categories()
+
     def get_category_summary(self) -> str:
         """
         获取分类摘要（用于 Layer 0 检索）
-        
+
         Returns:
             分类摘要文本
         """
-        index = self.get_index()
         summary_lines = [
             f"# 文档库概览",
-            f"总文档数: {index['total_documents']}",
+            f"总文档数: {self.store.get_total_documents()}",
             f"",
             f"## 分类列表"
         ]
-        
-        for cat_name, cat_data in index["categories"].items():
+
+        for category in self.get_categories():
             summary_lines.append(
-                f"- **{cat_name}**: {cat_data['document_count']} 份文档"
+                f"- **{category['name']}**: {category['document_count']} 份文档"
             )
-        
+
         return "\n".join(summary_lines)
 
+    def import_json(self, json_path: Optional[Path] = None) -> int:
+        """
+        把 library_index.json 导入 SQLite 存储
+
+        Args:
+            json_path: JSON 文件路径，默认 data/library_index.json
+
+        Returns:
+            导入的文档数
+        """
+        if not isinstance(self.store, SQLiteLibraryStore):
+            raise ValueError("当前文档库存储后端不是 sqlite，无需导入")
+        return self.store.import_json(Path(json_path) if json_path else self.index_path)
@@ -30,9 +30,9 @@ class DKRRetriever:
         self.library_manager = LibraryManager()
         self.llm_client = DeepSeekLLMClient()
 
-        # Initialize OCR client for visual retrieval
-        from visual_memvid.ocr_client import DeepSeekOCRClient
-        self.ocr_client = DeepSeekOCRClient(endpoint=self.settings.ocr_api_url)
+        # Shared OCR client for visual retrieval
+        from app.core.retriever_registry import get_ocr_client
+        self.ocr_client = get_ocr_client()
     
     async def retrieve(
         self,
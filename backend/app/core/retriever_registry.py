@@ -0,0 +1,124 @@
+"""
+检索器注册表 - 进程内共享的 OCR 客户端和按文档缓存的检索器
+
+- OCR 客户端全进程共享一个：健康检查只在创建时做一次，之后由端点池定期检查
+- 每个文档的 VisualMemvidRetriever 创建后缓存复用（LRU 淘汰），索引延迟到首次检索时加载
+- 视频或索引文件被替换（mtime / 大小变化）后自动重新创建
+"""
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from loguru import logger
+
+# Add project root to path (to import visual_memvid)
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from visual_memvid.ocr_client import DeepSeekOCRClient
+from visual_memvid.visual_retriever import VisualMemvidRetriever
+
+from app.config import get_settings
+
+
+_ocr_client: Optional[DeepSeekOCRClient] = None
+_ocr_client_lock = threading.Lock()
+
+
+def get_ocr_client() -> DeepSeekOCRClient:
+    """获取共享的 OCR 客户端（首次调用时创建）"""
+    global _ocr_client
+    if _ocr_client is None:
+        with _ocr_client_lock:
+            if _ocr_client is None:
+                _ocr_client = DeepSeekOCRClient(endpoint=get_settings().ocr_api_url)
+    return _ocr_client
+
+
+def _file_stat(path: Path) -> Tuple[int, int]:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+class RetrieverRegistry:
+    """按文档缓存 VisualMemvidRetriever（线程安全，LRU 淘汰）"""
+
+    def __init__(self, max_handles: int):
+        self.max_handles = max(1, max_handles)
+        # {doc_id: ((视频路径, 视频 stat, 索引路径, 索引 stat), 检索器)}
+        self._handles: "OrderedDict[str, Tuple[Tuple, VisualMemvidRetriever]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, doc_id: str, video_path: Path, index_path: Path) -> VisualMemvidRetriever:
+        """
+        获取文档的检索器（缓存未命中或文件已变化时创建）
+
+        Args:
+            doc_id: 文档 ID
+            video_path: 视频文件绝对路径
+            index_path: 索引文件绝对路径
+
+        Returns:
+            VisualMemvidRetriever
+
+        Raises:
+            FileNotFoundError: 视频或索引文件不存在
+        """
+        if not video_path.exists():
+            raise FileNotFoundError(f"视频文件不存在: {video_path}")
+        if not index_path.exists():
+            raise FileNotFoundError(f"索引文件不存在: {index_path}")
+        key = (str(video_path), _file_stat(video_path), str(index_path), _file_stat(index_path))
+
+        with self._lock:
+            cached = self._handles.get(doc_id)
+            if cached is not None and cached[0] == key:
+                self._handles.move_to_end(doc_id)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        retriever = VisualMemvidRetriever(
+            video_path=str(video_path),
+            index_path=str(index_path),
+            ocr_client=get_ocr_client(),
+            enable_cache=True,
+            lazy_index=True
+        )
+
+        with self._lock:
+            self._handles[doc_id] = (key, retriever)
+            self._handles.move_to_end(doc_id)
+            while len(self._handles) > self.max_handles:
+                evicted_id, _ = self._handles.popitem(last=False)
+                self.evictions += 1
+                logger.debug(f"检索器已淘汰: {evicted_id}")
+        return retriever
+
+    def get_stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "handles": len(self._handles),
+                "max_handles": self.max_handles,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+_retriever_registry: Optional[RetrieverRegistry] = None
+
+
+def get_retriever_registry() -> RetrieverRegistry:
+    """获取全局检索器注册表"""
+    global _retriever_registry
+    if _retriever_registry is None:
+        _retriever_registry = RetrieverRegistry(get_settings().retriever_cache_size)
+    return _retriever_registry
@@ -0,0 +1,158 @@
+"""
+Summary 存储 - Agent 工具共享的 Summary 读取缓存
+
+- 同目录存在不旧于 summaries.json 的 summaries.bin 时使用二进制格式：只读取页码索引，页面按需从 mmap 解压
+- 否则每个文档的 summaries.json 只解析一次，按 page_num 建立索引
+- 以文件 mtime / 大小校验，文件被重新生成后自动重新加载
+- LRU 淘汰，总大小（JSON 按文件字节数估算，二进制按索引大小）不超过内存预算
+"""
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+from loguru import logger
+
+# Add project root to path (to import visual_memvid)
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from visual_memvid.summary_file import BINARY_SUFFIX, SummaryFile
+
+from app.config import get_settings
+
+
+class DocumentSummaries:
+    """单个文档的页面 Summary（summaries.json 解析结果，只读）"""
+
+    __slots__ = ("pages", "by_page", "memory_bytes")
+
+    def __init__(self, pages: List[Dict[str, Any]], memory_bytes: int):
+        self.pages = pages
+        self.memory_bytes = memory_bytes
+        # 页码重复时保留第一个，与线性查找一致
+        self.by_page: Dict[int, Dict[str, Any]] = {}
+        for page in pages:
+            page_num = page.get("page_num")
+            if isinstance(page_num, int):
+                self.by_page.setdefault(page_num, page)
+
+    def get_page(self, page_num: int) -> Optional[Dict[str, Any]]:
+        return self.by_page.get(page_num)
+
+    def toc(self) -> List[Tuple[Any, Optional[str]]]:
+        """目录列：[(page_num, page_summary)]（字段缺失时为 None）"""
+        return [(page.get("page_num"), page.get("page_summary")) for page in self.pages]
+
+
+# 两种格式提供相同的只读接口：get_page / toc / memory_bytes
+Summaries = Union[DocumentSummaries, SummaryFile]
+
+
+class SummaryStore:
+    """按内存预算淘汰的 Summary 缓存（线程安全）"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        # {文件路径: ((mtime_ns, 大小), Summary)}
+        self._entries: "OrderedDict[Path, Tuple[Tuple[int, int], Summaries]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _evict(self):
+        """淘汰最久未使用的文档，直到总大小不超过预算（调用方持有锁）"""
+        # 被淘汰的 SummaryFile 不主动关闭：其他线程可能仍在读取，mmap 随对象回收释放
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._total_bytes -= evicted.memory_bytes
+
+    @staticmethod
+    def _resolve(summary_path: Path) -> Tuple[Path, os.stat_result]:
+        """选择实际读取的文件：二进制文件存在且不旧于 JSON 时优先使用"""
+        if summary_path.suffix == BINARY_SUFFIX:
+            return summary_path, summary_path.stat()
+
+        bin_path = summary_path.with_suffix(BINARY_SUFFIX)
+        try:
+            bin_stat = bin_path.stat()
+        except FileNotFoundError:
+            return summary_path, summary_path.stat()
+        try:
+            json_stat = summary_path.stat()
+        except FileNotFoundError:
+            return bin_path, bin_stat
+        if bin_stat.st_mtime_ns >= json_stat.st_mtime_ns:
+            return bin_path, bin_stat
+        return summary_path, json_stat
+
+    def load(self, summary_path: Path) -> Summaries:
+        """
+        读取文档的页面 Summary
+
+        Args:
+            summary_path: summaries.json（或 summaries.bin）的绝对路径
+
+        Returns:
+            DocumentSummaries 或 SummaryFile（调用方只读，不得修改）
+
+        Raises:
+            FileNotFoundError: 文件不存在
+            ValueError: 文件格式不正确
+        """
+        path, stat = self._resolve(summary_path)
+        file_stat = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached is not None and cached[0] == file_stat:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        if path.suffix == BINARY_SUFFIX:
+            entry: Summaries = SummaryFile(path)
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                pages = json.load(f)
+            if not isinstance(pages, list):
+                raise ValueError("Summary 文件格式不正确")
+            entry = DocumentSummaries(pages, file_stat[1])
+
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self._total_bytes -= old[1].memory_bytes
+            self._entries[path] = (file_stat, entry)
+            self._total_bytes += entry.memory_bytes
+            self._evict()
+        logger.debug(f"已加载 Summary: {path}")
+        return entry
+
+    def get_stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "documents": len(self._entries),
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+_summary_store: Optional[SummaryStore] = None
+
+
+def get_summary_store() -> SummaryStore:
+    """获取全局 Summary 存储实例"""
+    global _summary_store
+    if _summary_store is None:
+        _summary_store = SummaryStore(get_settings().summary_cache_max_mb * 1024 * 1024)
+    return _summary_store
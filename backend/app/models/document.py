@@ -64,3 +64,11 @@ class DocumentListResponse(BaseModel):
     documents: List[Document]
     categories: Dict[str, int]  # category -> count
 
+
+
+class DocumentPage(BaseModel):
+    """分页文档列表（items 只包含请求的字段）"""
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+    total: int
+    version: int
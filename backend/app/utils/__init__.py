@@ -1,13 +1,18 @@
 """
 工具函数
 """
-from .file_utils import generate_doc_id, get_file_hash
-from .json_utils import load_json, save_json
+from .file_utils import FileLock, generate_doc_id, get_file_hash
+from .http_utils import etag_matches, make_etag
+from .json_utils import load_json, save_json, save_json_atomic
 
 __all__ = [
+    "FileLock",
+    "etag_matches",
     "generate_doc_id",
     "get_file_hash",
     "load_json",
+    "make_etag",
     "save_json",
+    "save_json_atomic",
 ]
 
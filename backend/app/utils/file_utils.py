@@ -2,6 +2,8 @@
 文件处理工具
 """
 import hashlib
+import os
+import threading
 import uuid
 from pathlib import Path
 from typing import Union
@@ -32,3 +34,66 @@ def ensure_dir(directory: Union[str, Path]) -> Path:
     path.mkdir(parents=True, exist_ok=True)
     return path
 
+
+
+class FileLock:
+    """
+    跨进程文件锁（POSIX 使用 fcntl.flock，Windows 使用 msvcrt.locking）
+
+    同一进程内的线程通过内部的 threading.Lock 互斥
+
+    用法：
+        with FileLock(path.with_suffix(".lock")):
+            ...
+    """
+
+    def __init__(self, lock_path: Union[str, Path]):
+        self.lock_path = Path(lock_path)
+        self._thread_lock = threading.Lock()
+        self._fd = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        try:
+            self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+            self._fd = open(self.lock_path, "a+b")
+            if os.name == "nt":
+                import msvcrt
+                self._fd.seek(0)
+                # LK_LOCK 最多重试 10 秒，继续循环直到拿到锁
+                while True:
+                    try:
+                        msvcrt.locking(self._fd.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+            else:
+                import fcntl
+                fcntl.flock(self._fd.fileno(), fcntl.LOCK_EX)
+        except Exception:
+            if self._fd is not None:
+                self._fd.close()
+                self._fd = None
+            self._thread_lock.release()
+            raise
+
+    def release(self):
+        try:
+            if os.name == "nt":
+                import msvcrt
+                self._fd.seek(0)
+                msvcrt.locking(self._fd.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._fd.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._fd.close()
+            self._fd = None
+            self._thread_lock.release()
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
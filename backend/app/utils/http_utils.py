@@ -0,0 +1,29 @@
+"""
+HTTP 缓存工具
+"""
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+
+def make_etag(version: int, params: Dict[str, Any]) -> str:
+    """
+    生成弱 ETag：数据版本号 + 请求参数摘要
+
+    同一版本下不同的查询参数对应不同的响应，因此参数也要参与计算
+    """
+    digest = hashlib.sha1(
+        json.dumps(params, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    ).hexdigest()[:16]
+    return f'W/"{version}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否命中（支持逗号分隔的多个值和 *，按弱比较）"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" in candidates:
+        return True
+    weak = etag[2:] if etag.startswith("W/") else etag
+    return any((tag[2:] if tag.startswith("W/") else tag) == weak for tag in candidates)
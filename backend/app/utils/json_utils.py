@@ -2,6 +2,7 @@
 JSON 处理工具
 """
 import json
+import os
 from pathlib import Path
 from typing import Any, Dict, Union
 
@@ -19,6 +20,27 @@ def save_json(data: Dict[str, Any], file_path: Union[str, Path], indent: int = 2
         json.dump(data, f, ensure_ascii=False, indent=indent)
 
 
+def save_json_atomic(data: Dict[str, Any], file_path: Union[str, Path], indent: int = 2) -> None:
+    """
+    原子保存 JSON 文件
+
+    先写入同目录的临时文件并 fsync，再用 os.replace 替换目标文件；
+    写入过程中崩溃只会留下临时文件，目标文件保持完整
+    """
+    file_path = Path(file_path)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = file_path.with_name(f"{file_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
 def update_json(file_path: Union[str, Path], updates: Dict[str, Any]) -> Dict[str, Any]:
     """更新 JSON 文件"""
     if Path(file_path).exists():
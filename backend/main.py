@@ -16,7 +16,7 @@ from loguru import logger
 load_dotenv()
 
 # Import routers
-from app.api import documents, query, agent, settings
+from app.api import documents, query, agent, settings, search
 from app.api import config as config_api
 
 # Configure logger
@@ -110,6 +110,16 @@ async def health_check():
     }
 
 
+@app.get("/health/providers")
+async def providers_health():
+    """OCR / VLM 服务健康指标（重试、限流、熔断状态）"""
+    from visual_memvid.resilience import get_providers_health
+    return {
+        "success": True,
+        "providers": get_providers_health()
+    }
+
+
 @app.get("/")
 async def root():
     """根路径"""
@@ -126,6 +136,7 @@ app.include_router(query.router)
 app.include_router(agent.router)
 app.include_router(config_api.router)
 app.include_router(settings.router)
+app.include_router(search.router)
 
 
 # Global exception handler
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+本地模拟 DeepSeek OCR 服务（不需要 GPU）
+
+用于测试多端点负载均衡、优先级通道和容错：
+- GET  /health      健康检查
+- POST /ocr/image   返回固定文本（可配置延迟和失败率）
+- POST /ocr/batch   按上传文件数返回结果
+- POST /ocr/base64  返回固定文本
+
+用法：
+    # 启动两个端点
+    python examples/fake_ocr_server.py --port 5011 --delay 2
+    python examples/fake_ocr_server.py --port 5012 --delay 2 --fail-rate 0.3
+
+    # 客户端使用逗号分隔的多个端点
+    OCR_API_URL=http://127.0.0.1:5011,http://127.0.0.1:5012 python examples/fake_ocr_server.py --demo
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# 添加父目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def make_handler(port: int, delay: float, fail_rate: float):
+    """创建请求处理器"""
+
+    class FakeOCRHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            if status == 429:
+                self.send_header("Retry-After", "1")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send_json(200, {"status": "ok", "port": port})
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+            time.sleep(delay)
+
+            if random.random() < fail_rate:
+                self._send_json(random.choice([429, 502, 503]), {"error": "simulated failure"})
+                return
+
+            result = {
+                "success": True,
+                "text": f"# 模拟 OCR 结果\n\n来自端点 :{port}，请求大小 {len(body)} 字节",
+                "processing_time": delay,
+                "error": None,
+            }
+            if self.path == "/ocr/batch":
+                count = max(1, body.count(b'name="files"'))
+                self._send_json(200, [result] * count)
+            elif self.path in ("/ocr/image", "/ocr/base64"):
+                self._send_json(200, result)
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def log_message(self, format, *args):
+            print(f"[:{port}] {format % args}")
+
+    return FakeOCRHandler
+
+
+def run_demo():
+    """用多个线程同时发送 bulk 和 interactive 请求，观察优先级通道"""
+    import numpy as np
+    from visual_memvid import DeepSeekOCRClient
+    from visual_memvid.ocr_pool import PRIORITY_BULK, PRIORITY_INTERACTIVE
+
+    client = DeepSeekOCRClient()
+    image = np.full((64, 64, 3), 255, dtype=np.uint8)
+    finished = []
+
+    def worker(priority: str, idx: int):
+        start = time.time()
+        result = client.ocr_image(image, priority=priority)
+        finished.append((time.time() - start, priority, idx, result.get("success")))
+
+    threads = [threading.Thread(target=worker, args=(PRIORITY_BULK, i)) for i in range(10)]
+    for t in threads:
+        t.start()
+    time.sleep(0.2)
+    interactive = threading.Thread(target=worker, args=(PRIORITY_INTERACTIVE, 0))
+    interactive.start()
+    for t in threads + [interactive]:
+        t.join()
+
+    for elapsed, priority, idx, success in sorted(finished):
+        print(f"{elapsed:6.2f}s  {priority:<12} #{idx}  success={success}")
+    print(json.dumps(client.pool.get_stats(), ensure_ascii=False, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟 DeepSeek OCR 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5011)
+    parser.add_argument("--delay", type=float, default=1.0, help="每个请求的模拟处理时间（秒）")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="随机返回 429/502/503 的概率")
+    parser.add_argument("--demo", action="store_true", help="作为客户端运行优先级演示")
+    args = parser.parse_args()
+
+    if args.demo:
+        run_demo()
+        return
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.port, args.delay, args.fail_rate))
+    print(f"🚀 模拟 OCR 服务已启动: http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
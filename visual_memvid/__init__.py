@@ -13,6 +13,7 @@ from .visual_retriever import VisualMemvidRetriever
 # from .doris_client import DorisClient  # Optional Doris integration
 from .enhanced_encoder import EnhancedPDFEncoder
 # from .doris_retriever import DorisProgressiveRetriever  # Optional Doris integration
+from .resilience import get_resilience, get_providers_health
 from .config import CONFIG
 
 __version__ = "0.1.0"
@@ -26,6 +27,8 @@ __all__ = [
     # "DorisClient",
     "EnhancedPDFEncoder",
     # "DorisProgressiveRetriever",
+    "get_resilience",
+    "get_providers_health",
     "CONFIG",
 ]
 
@@ -8,18 +8,69 @@ BM25S Index
 """
 
 import json
-from typing import List, Dict, Optional, Any
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional, Any, Tuple
 from pathlib import Path
 import logging
 
 import bm25s
+import numpy as np
 import jieba
 from bm25s.tokenization import Tokenizer
 
 from .config import CONFIG
+from .page_lookup import ChapterLookup, build_frame_lookup
+from .query_cache import create_query_cache
 
 logger = logging.getLogger(__name__)
 
+# 未配置分词进程数时的上限：每个进程都要加载一份 jieba 词典（约 1.6 秒）
+DEFAULT_MAX_TOKENIZE_WORKERS = 4
+
+
+def jieba_split(text: str) -> List[str]:
+    """jieba 分词，过滤空白和单字符（数字除外）"""
+    tokens = (t.strip() for t in jieba.cut(text))
+    return [t for t in tokens if t and (len(t) > 1 or t.isdigit())]
+
+
+def _init_tokenize_worker():
+    """分词进程初始化：每个进程只加载一次 jieba 词典"""
+    jieba.initialize()
+
+
+def _split_chunk(texts: List[str]) -> List[List[str]]:
+    """在分词进程中处理一批文本（与 Tokenizer 一致，先转小写再分词）"""
+    return [jieba_split(text.lower()) for text in texts]
+
+
+def parallel_split(texts: List[str], workers: int) -> List[List[str]]:
+    """
+    使用进程池并行分词
+
+    Args:
+        texts: 文本列表
+        workers: 进程数
+
+    Returns:
+        与 texts 顺序一致的分词结果
+    """
+    chunk_size = max(1, -(-len(texts) // (workers * 4)))
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    # 不使用 fork：服务进程中有其他线程（段合并、索引重建、健康检查等），
+    # fork 时它们持有的锁（jieba 词典锁、日志锁）会被复制到子进程，可能导致死锁
+    methods = multiprocessing.get_all_start_methods()
+    mp_context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp_context,
+        initializer=_init_tokenize_worker
+    ) as pool:
+        # map 按提交顺序返回结果，保证词汇表与串行分词一致
+        return [tokens for chunk in pool.map(_split_chunk, chunks) for tokens in chunk]
+
 
 class BM25SIndex:
     """
@@ -37,9 +88,17 @@ class BM25SIndex:
             "toc": {},    # 目录结构 {章节名: [页码列表]}
             "total_pages": 0,
         }
+
+        # 查找表（由 metadata 派生，加载时重建）
+        self._pages_by_frame: Dict[int, Dict] = {}
+        self._chapter_lookup: Optional[ChapterLookup] = None
         
         # BM25S 检索器
         self.retriever = None
+
+        # 索引版本（每次构建 +1）和检索结果缓存
+        self.version = 0
+        self.query_cache = create_query_cache()
         
         # 中文停用词
         self.stopwords = [
@@ -57,16 +116,34 @@ class BM25SIndex:
     
     def _jieba_tokenize(self, text: str) -> List[str]:
         """使用 jieba 分词"""
-        # jieba 分词
-        tokens = list(jieba.cut(text))
-        
-        # 过滤空白和单字符（除了数字）
-        tokens = [
-            t.strip() for t in tokens 
-            if t.strip() and (len(t.strip()) > 1 or t.strip().isdigit())
-        ]
-        
-        return tokens
+        return jieba_split(text)
+
+    def normalize_query(self, query: str) -> Tuple[str, ...]:
+        """归一化查询：分词、去停用词后排序（保留重复词，作为检索结果缓存的键）"""
+        stopwords = set(self.stopwords)
+        return tuple(sorted(t for t in jieba_split(query.lower()) if t not in stopwords))
+
+    def _tokenize_corpus(self, corpus: List[str]) -> List[List[str]]:
+        """
+        对语料分词并更新词汇表
+
+        页面较多时先用进程池并行执行 jieba 分词，再按语料顺序交给 Tokenizer
+        建立词汇表（词 ID 按首次出现顺序分配，结果与串行分词完全一致）
+        """
+        tokenize_config = CONFIG.get("tokenization", {})
+        workers = tokenize_config.get("workers", 0) or min(os.cpu_count() or 1, DEFAULT_MAX_TOKENIZE_WORKERS)
+        workers = min(workers, len(corpus))
+
+        if workers <= 1 or len(corpus) < tokenize_config.get("parallel_min_docs", 200):
+            return self.tokenizer.tokenize(corpus, update_vocab=True, return_as="string")
+
+        logger.info(f"并行分词: {workers} 个进程")
+        pre_split = iter(parallel_split(corpus, workers))
+        self.tokenizer.splitter = lambda _text: next(pre_split)
+        try:
+            return self.tokenizer.tokenize(corpus, update_vocab=True, return_as="string")
+        finally:
+            self.tokenizer.splitter = self._jieba_tokenize
     
     def add_page(
         self,
@@ -98,12 +175,16 @@ class BM25SIndex:
         
         self.metadata["pages"].append(page_meta)
         self.metadata["total_pages"] = len(self.metadata["pages"])
+        self._pages_by_frame.setdefault(frame_num, page_meta)
         
         # 更新目录
         if chapter:
             if chapter not in self.metadata["toc"]:
                 self.metadata["toc"][chapter] = []
             self.metadata["toc"][chapter].append(page_num)
+            # 页码超出章节原有区间时才需要重建章节查找表
+            if self._chapter_lookup is not None and self._chapter_lookup.find(page_num) != chapter:
+                self._chapter_lookup = None
     
     def build_index(self):
         """
@@ -120,11 +201,7 @@ class BM25SIndex:
 
         # 分词（返回 token 字符串列表，而不是 Tokenized 对象）
         logger.info(f"开始分词 {len(corpus)} 个文档...")
-        corpus_tokens = self.tokenizer.tokenize(
-            corpus,
-            update_vocab=True,
-            return_as="string"  # ← 返回字符串列表，而不是 Tokenized 对象
-        )
+        corpus_tokens = self._tokenize_corpus(corpus)  # 返回字符串列表，而不是 Tokenized 对象
 
         # 创建 BM25 检索器（使用 Lucene 变体）
         self.retriever = bm25s.BM25(method="lucene")
@@ -133,6 +210,10 @@ class BM25SIndex:
         logger.info(f"开始构建 BM25S 索引...")
         self.retriever.index(corpus_tokens)
 
+        self.version += 1
+        if self.query_cache is not None:
+            self.query_cache.clear()
+
         vocab_size = len(self.tokenizer.get_vocab_dict())
         logger.info(f"✅ BM25S 索引构建完成: {len(corpus)} 个文档, 词汇表大小 {vocab_size}")
     
@@ -156,72 +237,94 @@ class BM25SIndex:
             logger.error("索引未构建，请先调用 build_index()")
             return []
 
-        # 日志：开始检索
-        logger.info("=" * 80)
-        logger.info(f"【BM25S 检索开始】")
-        logger.info(f"查询: {query}")
-        logger.info(f"Top-K: {top_k}")
+        cache_key = self._cache_key(query, top_k)
+        if cache_key is not None:
+            cached = self.query_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"🔍 BM25S 检索（缓存命中）: {query} (top_k={top_k}) → {len(cached)} 个页面")
+                return cached
 
-        # 分词查询
-        query_tokens = self.tokenizer.tokenize([query], update_vocab=False)
+        result_list = self._format_results(self._retrieve(query, top_k))
+        if cache_key is not None:
+            self.query_cache.set(cache_key, result_list)
 
-        # 日志：分词结果
-        if isinstance(query_tokens, list) and len(query_tokens) > 0:
-            tokens_str = query_tokens[0] if isinstance(query_tokens[0], list) else query_tokens
-            logger.info(f"分词结果: {tokens_str}")
-            logger.info(f"分词数量: {len(tokens_str) if isinstance(tokens_str, list) else 'N/A'}")
+        if not result_list:
+            logger.warning(f"未找到匹配的页面: {query}")
+            return []
 
-        # 检索
-        results, scores = self.retriever.retrieve(query_tokens, k=top_k)
+        logger.info(f"🔍 BM25S 检索: {query} (top_k={top_k}) → {len(result_list)} 个页面")
+        return result_list
 
-        # results 是 (n_queries, k) 的数组，包含文档索引
-        # scores 是 (n_queries, k) 的数组，包含得分
+    def _cache_key(self, query: str, top_k: int) -> Optional[Tuple]:
+        """检索结果缓存键：(索引版本, 归一化查询词, top_k)；未启用缓存时返回 None"""
+        if self.query_cache is None:
+            return None
+        return (self.version, self.normalize_query(query), top_k)
 
-        if results.shape[1] == 0:
-            logger.warning(f"未找到匹配的页面: {query}")
-            logger.info("=" * 80)
-            return []
+    def get_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """检索结果缓存的命中率统计（未启用时返回 None）"""
+        return self.query_cache.get_stats() if self.query_cache is not None else None
 
-        # 获取第一个查询的结果（我们只有一个查询）
-        doc_indices = results[0]
-        doc_scores = scores[0]
+    def search_many(
+        self,
+        queries: List[str],
+        top_k: int = 3,
+        n_threads: int = -1
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        批量检索：一次分词所有查询，并使用 bm25s 的多线程批量检索
 
-        # 过滤掉得分为 0 的结果
-        valid_results = [
-            (int(doc_idx), float(score))
-            for doc_idx, score in zip(doc_indices, doc_scores)
-            if score > 0
-        ]
+        Args:
+            queries: 查询列表
+            top_k: 每个查询返回的结果数
+            n_threads: 检索线程数（-1 = CPU 核数，0 = 单线程）
 
-        if not valid_results:
-            logger.warning(f"未找到匹配的页面: {query}")
-            logger.info("=" * 80)
+        Returns:
+            与 queries 顺序一致的结果列表，每项格式同 search()
+        """
+        if self.retriever is None:
+            logger.error("索引未构建，请先调用 build_index()")
+            return [[] for _ in queries]
+        if not queries:
             return []
 
-        # 计算相关性等级（基于分数分布）
-        scores_only = [score for _, score in valid_results]
-        max_score = max(scores_only) if scores_only else 1.0
+        # 先查缓存，只检索未命中的查询
+        cache_keys = [self._cache_key(query, top_k) for query in queries]
+        all_results: List[Optional[List[Dict[str, Any]]]] = [
+            self.query_cache.get(key) if key is not None else None for key in cache_keys
+        ]
+        missing = [i for i, results in enumerate(all_results) if results is None]
+
+        if missing:
+            hits = self._retrieve_many([queries[i] for i in missing], top_k, n_threads=n_threads)
+            for i, query_hits in zip(missing, hits):
+                all_results[i] = self._format_results(query_hits)
+                if cache_keys[i] is not None:
+                    self.query_cache.set(cache_keys[i], all_results[i])
+
+        logger.info(
+            f"🔍 BM25S 批量检索: {len(queries)} 个查询 (top_k={top_k}) → "
+            f"{sum(len(r) for r in all_results)} 个页面"
+        )
+        return all_results
 
-        # 日志：检索结果详情
-        logger.info(f"\n【检索结果】找到 {len(valid_results)} 个相关页面:")
+    def _format_results(self, hits: List[Tuple[int, float]]) -> List[Dict[str, Any]]:
+        """把 (文档下标, 得分) 转为检索结果，并按与最高分的比值计算相关性等级"""
+        max_score = max((score for _, score in hits), default=1.0)
 
         result_list = []
-        for rank, (doc_idx, score) in enumerate(valid_results, 1):
+        for rank, (doc_idx, score) in enumerate(hits, 1):
             page_info = self.metadata["pages"][doc_idx]
             frame_num = page_info["frame_num"]
             page_num = page_info["page_num"]
-            title = page_info.get("title", "")
 
-            # 计算相关性等级
             score_ratio = score / max_score if max_score > 0 else 0
-            if score_ratio >= 0.7:
-                relevance_level = "高"
-            elif score_ratio >= 0.4:
-                relevance_level = "中"
-            else:
-                relevance_level = "低"
+            relevance_level = self._relevance_level(score_ratio)
 
-            logger.info(f"  {rank}. 页面 {page_num} (frame {frame_num}) | 得分: {score:.4f} ({score_ratio:.1%}) | 相关性: {relevance_level} | 标题: {title}")
+            logger.debug(
+                f"  {rank}. 页面 {page_num} (frame {frame_num}) | 得分: {score:.4f} ({score_ratio:.1%}) | "
+                f"相关性: {relevance_level} | 标题: {page_info.get('title', '')}"
+            )
 
             result_list.append({
                 "frame_num": frame_num,
@@ -231,17 +334,107 @@ class BM25SIndex:
                 "relevance_level": relevance_level,
                 "rank": rank
             })
-
-        logger.info(f"\n返回 {len(result_list)} 个结果（包含分数和相关性等级）")
-        logger.info("=" * 80)
         return result_list
 
+    @staticmethod
+    def _relevance_level(score_ratio: float) -> str:
+        """根据与最高分的比值划分相关性等级"""
+        if score_ratio >= 0.7:
+            return "高"
+        elif score_ratio >= 0.4:
+            return "中"
+        return "低"
+
+    def _retrieve(
+        self,
+        query: str,
+        top_k: int,
+        weight_mask: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        分词并检索单个查询
+
+        Args:
+            query: 查询文本
+            top_k: 返回结果数
+            weight_mask: 文档权重掩码（0 表示排除该文档）
+
+        Returns:
+            [(文档下标, 得分)]，已过滤得分为 0 的结果
+        """
+        return self._retrieve_many([query], top_k, weight_mask=weight_mask)[0]
+
+    def _retrieve_many(
+        self,
+        queries: List[str],
+        top_k: int,
+        weight_mask: Optional[np.ndarray] = None,
+        n_threads: int = 0
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        批量分词并检索
+
+        Args:
+            queries: 查询列表
+            top_k: 每个查询返回的结果数
+            weight_mask: 文档权重掩码（0 表示排除该文档）
+            n_threads: bm25s 检索线程数（-1 = CPU 核数，0 = 单线程）
+
+        Returns:
+            每个查询的 [(文档下标, 得分)]，已过滤得分为 0 的结果
+        """
+        # 分词查询（索引用字符串 token 构建，查询也必须返回字符串，
+        # 否则 Tokenizer 的词表 ID 与 BM25 检索器内部词表 ID 不一致）
+        query_tokens = self.tokenizer.tokenize(
+            queries, update_vocab=False, return_as="string", show_progress=False
+        )
+        # 去掉索引词表外的词（如只含停用词的查询会得到 [""]，bm25s 会直接报错）
+        vocab = self.retriever.vocab_dict
+        query_tokens = [[t for t in tokens if t and t in vocab] for tokens in query_tokens]
+        for query, tokens in zip(queries, query_tokens):
+            logger.debug(f"分词结果: {query} → {tokens}")
+
+        hits: List[List[Tuple[int, float]]] = [[] for _ in queries]
+
+        # k 不能超过文档数
+        top_k = min(top_k, len(self.metadata["pages"]))
+        active = [i for i, tokens in enumerate(query_tokens) if tokens]
+        if top_k <= 0 or not active:
+            return hits
+
+        # results / scores 是 (n_queries, k) 的数组，分别为文档下标和得分
+        results, scores = self.retriever.retrieve(
+            [query_tokens[i] for i in active],
+            k=top_k,
+            show_progress=False,
+            n_threads=n_threads,
+            weight_mask=weight_mask
+        )
+
+        # 过滤掉得分为 0 的结果
+        for i, doc_row, score_row in zip(active, results, scores):
+            hits[i] = [(int(doc_idx), float(score)) for doc_idx, score in zip(doc_row, score_row) if score > 0]
+        return hits
+
     def get_page_info(self, frame_num: int) -> Optional[Dict]:
         """获取页面元数据"""
-        for page in self.metadata["pages"]:
-            if page["frame_num"] == frame_num:
-                return page
-        return None
+        return self._pages_by_frame.get(frame_num)
+
+    def get_chapter(self, page_num: int) -> str:
+        """查找页面所属章节（按目录的页码区间）"""
+        if self._chapter_lookup is None:
+            self._chapter_lookup = ChapterLookup(self.metadata["toc"])
+        return self._chapter_lookup.find(page_num)
+
+    def set_toc(self, toc: Dict[str, List[int]]):
+        """替换目录结构"""
+        self.metadata["toc"] = toc
+        self._chapter_lookup = None
+
+    def _rebuild_lookups(self):
+        """根据 metadata 重建查找表"""
+        self._pages_by_frame = build_frame_lookup(self.metadata["pages"])
+        self._chapter_lookup = None
 
     def save(self, output_dir: str):
         """
@@ -313,6 +506,7 @@ class BM25SIndex:
         metadata_file = index_path / "metadata.json"
         with open(metadata_file, 'r', encoding='utf-8') as f:
             index.metadata = json.load(f)
+        index._rebuild_lookups()
 
         # 加载 BM25S 索引
         bm25s_index_path = index_path / "bm25s_index"
@@ -34,14 +34,75 @@ CONFIG = {
     # OCR settings - 全页OCR（Layer 3）
     "ocr": {
         "provider": os.getenv("OCR_MODEL_PROVIDER", "deepseek_ocr"),  # 从环境变量读取
-        "endpoint": os.getenv("OCR_API_URL", "http://111.230.37.43:5010"),  # 从环境变量读取
+        "endpoint": os.getenv("OCR_API_URL", "http://111.230.37.43:5010"),  # 从环境变量读取（多个端点用逗号分隔）
+        "max_concurrency_per_endpoint": 2,  # 每个端点的最大在途请求数
+        "health_check_interval": 30.0,  # 后台健康检查间隔（秒，0 = 关闭）
         "batch_size": 5,  # 批量处理大小
+        "max_parallel_pages": 4,  # 单次多页 OCR（ocr_frames）同时处理的页数上限
+        "timeout": int(os.getenv("OCR_TIMEOUT", "300")),  # 单次请求超时（秒）
         "prompt_file": "prompts/full_page_ocr_markdown.txt",  # 提示词文件路径
         "base_size": 4096,  # 极限配置：4096 支持超高分辨率图像
         "image_size": 2048,  # 极限配置：2048 保持最多细节
         "crop_mode": True,
     },
-    
+
+    # Resilience settings - OCR/VLM 服务容错（重试、限流、熔断）
+    "resilience": {
+        "max_retries": 3,  # 瞬时错误（429/5xx/连接失败）最大重试次数
+        "base_delay": 1.0,  # 指数退避基准延迟（秒）
+        "max_delay": 30.0,  # 单次退避上限（秒），Retry-After 也受此限制
+        "rate_limit": 0.0,  # 每秒请求数（0 = 不限流）
+        "burst": None,  # 令牌桶突发容量（默认等于 rate_limit）
+        "failure_threshold": 5,  # 连续失败多少次后熔断
+        "recovery_timeout": 30.0,  # 熔断后多久进入半开探测（秒）
+        "half_open_max_calls": 1,  # 半开状态允许的探测请求数
+        # 按 provider 覆盖（键为 provider 名称或其 ':' 前缀）
+        "providers": {
+            "deepseek_ocr": {"max_retries": 2, "failure_threshold": 3},
+            "openrouter": {"rate_limit": 5.0, "burst": 10},
+        },
+    },
+
+    # OCR cache settings - 全页 OCR 结果缓存
+    "ocr_cache": {
+        "dir": os.getenv("OCR_CACHE_DIR", "ocr_cache"),  # 缓存目录（Docker 中挂载为卷）
+        "backend": "sqlite",  # sqlite（单库 WAL 模式）或 json（每页一个文件，旧格式）
+        "memory_max_bytes": 64 * 1024 * 1024,  # 进程内 LRU 容量（按文本字节数，0 = 禁用）
+        # 淘汰策略（由后台压缩任务执行）
+        "max_total_bytes": int(os.getenv("OCR_CACHE_MAX_BYTES", str(2 * 1024 ** 3))),  # 缓存总容量上限（0 = 不限制）
+        "max_bytes_per_document": int(os.getenv("OCR_CACHE_MAX_BYTES_PER_DOC", "0")),  # 单文档容量上限（0 = 不限制）
+        "eviction_policy": os.getenv("OCR_CACHE_EVICTION_POLICY", "lru"),  # lru（最近最少使用）或 lfu（最不经常使用）
+        "ttl_seconds": int(os.getenv("OCR_CACHE_TTL_SECONDS", "0")),  # 缓存有效期（0 = 永不过期）
+        "compaction_interval": 600,  # 后台压缩间隔（秒，0 = 禁用）
+    },
+
+    # Prefetch settings - 推测式预取相邻页面（Agent 请求期间后台 OCR 写入缓存）
+    "prefetch": {
+        "enabled": os.getenv("OCR_PREFETCH_ENABLED", "true").lower() == "true",
+        "pages_ahead": 2,  # 向后预取页数
+        "pages_behind": 1,  # 向前预取页数
+        "budget_per_query": int(os.getenv("OCR_PREFETCH_BUDGET", "6")),  # 每次请求最多预取页数
+        "max_workers": 2,  # 预取线程数
+    },
+
+    # Prewarm settings - 入库预热（低峰时段对整篇文档做全页 OCR 写入缓存）
+    "prewarm": {
+        "window": os.getenv("OCR_PREWARM_WINDOW", "01:00-06:00"),  # 运行时间窗口（本地时间，空 = 随时运行）
+        "max_concurrency": int(os.getenv("OCR_PREWARM_CONCURRENCY", "1")),  # OCR 并发上限
+        "categories": [c.strip() for c in os.getenv("OCR_PREWARM_CATEGORIES", "").split(",") if c.strip()],  # 入库时自动预热的分类
+        "poll_interval": 60,  # 窗口外 / 队列为空时的检查间隔（秒）
+    },
+
+    # Global index settings - 全库 BM25S 索引（页面摘要 + 实体 + 关键数据 + 文本层）
+    "global_index": {
+        "include_text_layer": True,  # 是否索引 PDF 文本层
+        "max_text_chars": 4000,  # 每页文本层最多索引的字符数
+        "default_top_k": 10,
+        "max_segments": 8,  # 段数超过该值时后台合并
+        "merge_deleted_ratio": 0.2,  # 已删除页面占比超过该值时后台合并
+        "merge_interval": 60,  # 后台合并检查间隔（秒）
+    },
+
     # Retrieval settings
     "retrieval": {
         "context_window": 1,  # 前后页窗口（1 = 前后各 1 页）
@@ -54,6 +115,18 @@ CONFIG = {
         "min_keyword_length": 3,  # 最小关键词长度
         "max_keywords_per_page": 20,  # 每页最多关键词数
     },
+
+    # BM25S query result cache
+    "query_cache": {
+        "enabled": True,
+        "max_entries": 256,  # 每个索引最多缓存的查询数（LRU）
+    },
+
+    # BM25S tokenization (index build)
+    "tokenization": {
+        "workers": 0,  # 分词进程数（0 = CPU 核数，最多 4 个；1 = 串行）
+        "parallel_min_docs": 200,  # 页面数少于该值时串行分词（进程池启动开销更大）
+    },
     
     # LLM settings (for smart retrieval)
     "llm": {
@@ -79,6 +152,7 @@ CONFIG = {
         "model": os.getenv("SUMMARY_MODEL_NAME", "google/gemini-2.5-flash-preview-09-2025"),  # 从环境变量读取
         "prompt_file": "prompts/summary_rich_json.txt",  # 提示词文件路径
         "enabled": True,  # 是否生成 Summary
+        "binary_format": True,  # 同时写入 summaries.bin（按页压缩 + 偏移索引，支持单页 mmap 读取）
     },
 
     # AI Agent settings - 总调度智能体（LangGraph）
@@ -17,6 +17,7 @@ import hashlib
 from typing import Any
 from .pdf_encoder import VisualMemvidEncoder
 from .ocr_client import DeepSeekOCRClient
+from .ocr_pool import PRIORITY_BULK
 from .gemini_ocr_client import GeminiOCRClient
 from .qwen_ocr_client import QwenOCRClient
 from .grok_ocr_client import GrokOCRClient
@@ -82,13 +83,15 @@ class EnhancedPDFEncoder(VisualMemvidEncoder):
             else:
                 # 默认使用 DeepSeek OCR
                 self.summary_client = DeepSeekOCRClient(
-                    endpoint=CONFIG["ocr"]["endpoint"]
+                    endpoint=CONFIG["ocr"]["endpoint"],
+                    default_priority=PRIORITY_BULK
                 )
                 logger.info("✅ 使用 DeepSeek OCR 生成 Summary")
 
         # 初始化全页 OCR 客户端
         self.ocr_client = ocr_client or DeepSeekOCRClient(
-            endpoint=CONFIG["ocr"]["endpoint"]
+            endpoint=CONFIG["ocr"]["endpoint"],
+            default_priority=PRIORITY_BULK
         )
 
         self.doris_client = doris_client
@@ -208,6 +211,13 @@ class EnhancedPDFEncoder(VisualMemvidEncoder):
                     json.dump(summaries, f, ensure_ascii=False, indent=2)
                 logger.info(f"💾 Summary 已保存: {summary_path}")
 
+                # 二进制格式（Agent 工具按页读取），summaries.json 保留用于兼容
+                if CONFIG.get("summary", {}).get("binary_format", True):
+                    from .summary_file import BINARY_SUFFIX, write_summary_file
+
+                    binary_path = write_summary_file(summaries, summary_path.with_suffix(BINARY_SUFFIX))
+                    logger.info(f"💾 Summary 二进制文件已保存: {binary_path}")
+
             except Exception as e:
                 logger.error(f"❌ Summary 生成失败: {e}")
                 logger.error(f"🗑️ 清理已生成的文件...")
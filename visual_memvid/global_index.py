@@ -0,0 +1,286 @@
+"""
+Global BM25S Index
+
+全库 BM25S 索引：把所有文档的页面摘要、实体、关键数据和 PDF 文本层放进同一个索引，
+以 (doc_id, page_num) 为键，一次稀疏检索即可在全库范围内定位候选页面，
+不再需要让 LLM 逐个阅读文档的 page_summary。
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+
+import numpy as np
+
+from .bm25s_index import BM25SIndex
+from .config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def build_page_text(summary: Dict, text_layer: str = "") -> str:
+    """
+    拼接页面的可检索文本
+
+    Args:
+        summary: summaries.json 中的单页记录
+        text_layer: PDF 文本层（可选）
+
+    Returns:
+        page_summary + entities + key_data + 表格/图表/图片描述 + 文本层
+    """
+    parts = [summary.get("page_summary") or ""]
+
+    entities = summary.get("entities") or []
+    parts.extend(str(e) for e in entities)
+
+    for item in summary.get("key_data") or []:
+        if isinstance(item, dict):
+            parts.append(f"{item.get('key', '')} {item.get('value', '')}")
+        else:
+            parts.append(str(item))
+
+    for field in ("table_info", "chart_info", "image_info"):
+        info = summary.get(field)
+        if isinstance(info, dict):
+            parts.extend(str(v) for v in info.values() if isinstance(v, (str, int, float)))
+            for v in info.values():
+                if isinstance(v, list):
+                    parts.extend(str(x) for x in v)
+        elif info:
+            parts.append(str(info))
+
+    if text_layer:
+        parts.append(text_layer)
+
+    return "\n".join(p for p in parts if p)
+
+
+def extract_text_layers(pdf_path: str, max_chars: Optional[int] = None) -> Dict[int, str]:
+    """
+    提取 PDF 每页的文本层
+
+    Args:
+        pdf_path: PDF 文件路径
+        max_chars: 每页最多保留的字符数
+
+    Returns:
+        {page_num（从 1 开始）: 文本}；文件不存在或无法打开时返回空字典
+    """
+    import fitz  # PyMuPDF
+
+    if not pdf_path or not Path(pdf_path).exists():
+        return {}
+
+    text_layers = {}
+    try:
+        with fitz.open(pdf_path) as doc:
+            for page_index, page in enumerate(doc):
+                text = page.get_text().strip()
+                if text:
+                    text_layers[page_index + 1] = text[:max_chars] if max_chars else text
+    except Exception as e:
+        logger.warning(f"⚠️ 提取 PDF 文本层失败 {pdf_path}: {e}")
+    return text_layers
+
+
+def rank_results(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """按得分排序并补充 rank、score_ratio、relevance_level（原地修改）"""
+    results.sort(key=lambda r: r["score"], reverse=True)
+    max_score = results[0]["score"] if results else 0
+    for rank, result in enumerate(results, 1):
+        score_ratio = result["score"] / max_score if max_score > 0 else 0
+        result["score_ratio"] = score_ratio
+        result["relevance_level"] = BM25SIndex._relevance_level(score_ratio)
+        result["rank"] = rank
+    return results
+
+
+class GlobalBM25SIndex(BM25SIndex):
+    """
+    全库 BM25S 索引
+
+    每条记录对应一个页面，元数据包含 doc_id、文档标题、分类和摘要片段；
+    检索结果以 (doc_id, page_num) 标识页面
+    """
+
+    SNIPPET_CHARS = 120
+    CORPUS_FILE = "corpus.jsonl"
+
+    def __init__(self):
+        super().__init__()
+        # 构建时的原始文本（与 metadata["pages"] 对齐），保存为 corpus.jsonl 供段合并时重新索引
+        self.corpus: Optional[List[str]] = None
+
+    def add_document(
+        self,
+        doc_id: str,
+        summaries: List[Dict],
+        title: str = "",
+        category: str = "",
+        text_layers: Optional[Dict[int, str]] = None
+    ) -> int:
+        """
+        添加一个文档的所有页面
+
+        Args:
+            doc_id: 文档 ID
+            summaries: summaries.json 中的页面记录
+            title: 文档标题
+            category: 文档分类
+            text_layers: {page_num: PDF 文本层}
+
+        Returns:
+            添加的页面数
+        """
+        text_layers = text_layers or {}
+        for summary in summaries:
+            page_num = summary.get("page_num")
+            if page_num is None:
+                continue
+            self.add_page(
+                page_num=page_num,
+                frame_num=summary.get("frame_num", page_num - 1),
+                text_preview=build_page_text(summary, text_layers.get(page_num, "")),
+                title=title,
+                doc_id=doc_id,
+                category=category,
+                snippet=(summary.get("page_summary") or "")[:self.SNIPPET_CHARS],
+            )
+        return len(summaries)
+
+    def build_index(self):
+        """构建索引后把原始文本移出元数据（全库文本层体积较大，单独保存为 corpus.jsonl）"""
+        super().build_index()
+        self.corpus = [page.pop("text", "") for page in self.metadata["pages"]]
+
+    def save(self, output_dir: str):
+        """保存索引，并把原始文本写入 corpus.jsonl（保存后释放内存）"""
+        super().save(output_dir)
+        if self.corpus is not None:
+            with open(Path(output_dir) / self.CORPUS_FILE, "w", encoding="utf-8") as f:
+                for text in self.corpus:
+                    f.write(json.dumps(text, ensure_ascii=False) + "\n")
+            self.corpus = None
+
+    def iter_records(self, index_dir: str) -> Iterable[Dict]:
+        """
+        遍历已保存索引的页面记录（元数据 + 原始文本），用于合并或重建
+
+        Args:
+            index_dir: 该索引的保存目录
+        """
+        corpus_file = Path(index_dir) / self.CORPUS_FILE
+        with open(corpus_file, "r", encoding="utf-8") as f:
+            for page, line in zip(self.metadata["pages"], f):
+                yield {**page, "text": json.loads(line)}
+
+    def add_record(self, record: Dict):
+        """添加一条 iter_records 产出的页面记录"""
+        record = dict(record)
+        self.add_page(
+            page_num=record.pop("page_num"),
+            frame_num=record.pop("frame_num"),
+            text_preview=record.pop("text", ""),
+            **record
+        )
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        category: Optional[str] = None,
+        doc_ids: Optional[Iterable[str]] = None,
+        exclude_doc_ids: Optional[Iterable[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        全库检索
+
+        Args:
+            query: 查询文本
+            top_k: 返回页面数
+            category: 只检索该分类（可选）
+            doc_ids: 只检索这些文档（可选）
+            exclude_doc_ids: 排除这些文档（如已删除的文档）
+
+        Returns:
+            [{"doc_id", "page_num", "frame_num", "title", "category", "snippet",
+              "score", "score_ratio", "relevance_level", "rank"}, ...]
+        """
+        if self.retriever is None:
+            logger.error("全库索引未构建")
+            return []
+
+        weight_mask = None
+        if category or doc_ids or exclude_doc_ids:
+            doc_id_set = set(doc_ids) if doc_ids else None
+            excluded = set(exclude_doc_ids or ())
+            weight_mask = np.array([
+                (not category or page.get("category") == category)
+                and (doc_id_set is None or page.get("doc_id") in doc_id_set)
+                and page.get("doc_id") not in excluded
+                for page in self.metadata["pages"]
+            ], dtype=np.float32)
+            if not weight_mask.any():
+                return []
+
+        hits = self._retrieve(query, top_k, weight_mask=weight_mask)
+        if not hits:
+            logger.info(f"全库检索无结果: {query}")
+            return []
+
+        results = [
+            {
+                "doc_id": page.get("doc_id"),
+                "page_num": page["page_num"],
+                "frame_num": page["frame_num"],
+                "title": page.get("title", ""),
+                "category": page.get("category", ""),
+                "snippet": page.get("snippet", ""),
+                "score": score,
+            }
+            for page, score in ((self.metadata["pages"][doc_idx], score) for doc_idx, score in hits)
+        ]
+        rank_results(results)
+
+        logger.info(f"🔎 全库检索: {query} → {len(results)} 个页面")
+        return results
+
+    def get_document_ids(self) -> List[str]:
+        """索引中包含的文档 ID"""
+        return sorted({page.get("doc_id") for page in self.metadata["pages"]})
+
+
+def build_global_index(documents: Iterable[Dict]) -> GlobalBM25SIndex:
+    """
+    从文档列表构建全库索引
+
+    Args:
+        documents: [{"doc_id", "title", "category", "summaries", "pdf_path"(可选)}, ...]
+
+    Returns:
+        已构建的 GlobalBM25SIndex
+    """
+    index_config = CONFIG.get("global_index", {})
+    include_text_layer = index_config.get("include_text_layer", True)
+    max_text_chars = index_config.get("max_text_chars")
+
+    index = GlobalBM25SIndex()
+    doc_count = 0
+    for doc in documents:
+        text_layers = {}
+        if include_text_layer and doc.get("pdf_path"):
+            text_layers = extract_text_layers(doc["pdf_path"], max_text_chars)
+        index.add_document(
+            doc_id=doc["doc_id"],
+            summaries=doc.get("summaries") or [],
+            title=doc.get("title", ""),
+            category=doc.get("category", ""),
+            text_layers=text_layers
+        )
+        doc_count += 1
+
+    index.build_index()
+    logger.info(f"✅ 全库索引构建完成: {doc_count} 个文档, {index.metadata['total_pages']} 页")
+    return index
@@ -11,6 +11,8 @@ from typing import Dict, Optional
 import time
 from pathlib import Path
 
+from .resilience import get_resilience
+
 
 class GrokOCRClient:
     """Grok OCR 客户端（通过 OpenRouter）"""
@@ -32,8 +34,10 @@ class GrokOCRClient:
         self.client = OpenAI(
             base_url=base_url,
             api_key=api_key,
+            max_retries=0,  # 重试由 resilience 层统一处理
         )
         self.model = model
+        self.resilience = get_resilience(f"openrouter:{model}")
         self.is_available = True
         
         # 加载默认提示词
@@ -113,7 +117,8 @@ class GrokOCRClient:
             img_url = self._image_to_base64(image)
             
             # 调用 Grok API（通过 OpenRouter）
-            completion = self.client.chat.completions.create(
+            completion = self.resilience.call(
+                self.client.chat.completions.create,
                 extra_headers={
                     "HTTP-Referer": "https://dkr-system.com",
                     "X-Title": "DKR Document Processing",
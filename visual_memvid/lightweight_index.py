@@ -13,7 +13,10 @@ from pathlib import Path
 from collections import Counter, defaultdict
 import logging
 
+import numpy as np
+
 from .config import CONFIG
+from .page_lookup import ChapterLookup, build_frame_lookup
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +37,10 @@ class LightweightIndex:
             "toc": {},    # 目录结构 {章节名: [页码列表]}
             "total_pages": 0,
         }
+
+        # 查找表（由 metadata 派生，加载时重建）
+        self._pages_by_frame: Dict[int, Dict] = {}
+        self._chapter_lookup: Optional[ChapterLookup] = None
         self.min_keyword_length = CONFIG["index"]["min_keyword_length"]
         self.max_keywords = CONFIG["index"]["max_keywords_per_page"]
 
@@ -44,6 +51,14 @@ class LightweightIndex:
         # BM25 统计信息（在索引构建完成后计算）
         self.idf = {}  # {term: idf_score}
         self.avgdl = 0  # 平均文档长度
+
+        # 倒排索引（首次检索时构建，添加页面后失效）
+        self._postings: Optional[Dict[str, Tuple[np.ndarray, np.ndarray]]] = None  # {词: (页面下标, 词频)}
+        self._title_postings: Dict[str, np.ndarray] = {}  # {标题词: 页面下标}
+        self._chapter_postings: Dict[str, np.ndarray] = {}  # {章节词: 页面下标}
+        self._page_positions: Dict[int, np.ndarray] = {}  # {页码: 页面下标}
+        self._page_nums: Optional[np.ndarray] = None  # 各页面的页码（同分排序用）
+        self._length_norm: Optional[np.ndarray] = None  # 1 - b + b * |D| / avgdl
     
     def add_page(
         self,
@@ -82,12 +97,17 @@ class LightweightIndex:
         
         self.metadata["pages"].append(page_meta)
         self.metadata["total_pages"] = len(self.metadata["pages"])
+        self._pages_by_frame.setdefault(frame_num, page_meta)
+        self._postings = None
         
         # 更新目录
         if chapter:
             if chapter not in self.metadata["toc"]:
                 self.metadata["toc"][chapter] = []
             self.metadata["toc"][chapter].append(page_num)
+            # 页码超出章节原有区间时才需要重建章节查找表
+            if self._chapter_lookup is not None and self._chapter_lookup.find(page_num) != chapter:
+                self._chapter_lookup = None
     
     def _extract_keywords(self, text: str) -> List[str]:
         """
@@ -161,7 +181,55 @@ class LightweightIndex:
             # IDF = log((N - df + 0.5) / (df + 0.5) + 1)
             self.idf[term] = math.log((N - doc_freq + 0.5) / (doc_freq + 0.5) + 1)
 
+        self._postings = None
         logger.info(f"✅ BM25 索引构建完成: {len(self.idf)} 个词, 平均文档长度 {self.avgdl:.2f}")
+
+    def _build_postings(self):
+        """
+        构建倒排索引
+
+        - 关键词 → (页面下标, 词频)
+        - 标题 / 章节关键词 → 页面下标（章节名相同的页面只提取一次）
+        - 页码 → 页面下标
+        """
+        pages = self.metadata["pages"]
+        term_postings = defaultdict(lambda: ([], []))
+        title_postings = defaultdict(list)
+        chapter_postings = defaultdict(list)
+        page_positions = defaultdict(list)
+        chapter_terms: Dict[str, set] = {}
+
+        for idx, page in enumerate(pages):
+            for term, tf in Counter(page["keywords"]).items():
+                docs, tfs = term_postings[term]
+                docs.append(idx)
+                tfs.append(tf)
+
+            if page.get("title"):
+                for term in set(self._extract_keywords(page["title"])):
+                    title_postings[term].append(idx)
+
+            chapter = page.get("chapter")
+            if chapter:
+                if chapter not in chapter_terms:
+                    chapter_terms[chapter] = set(self._extract_keywords(chapter))
+                for term in chapter_terms[chapter]:
+                    chapter_postings[term].append(idx)
+
+            page_positions[page["page_num"]].append(idx)
+
+        to_array = lambda docs: np.array(docs, dtype=np.int64)
+        self._postings = {
+            term: (to_array(docs), np.array(tfs, dtype=np.float64))
+            for term, (docs, tfs) in term_postings.items()
+        }
+        self._title_postings = {term: to_array(docs) for term, docs in title_postings.items()}
+        self._chapter_postings = {term: to_array(docs) for term, docs in chapter_postings.items()}
+        self._page_positions = {page_num: to_array(docs) for page_num, docs in page_positions.items()}
+        self._page_nums = to_array([page["page_num"] for page in pages])
+
+        lengths = np.array([len(page["keywords"]) for page in pages], dtype=np.float64)
+        self._length_norm = 1 - self.b + self.b * lengths / (self.avgdl or 1)
     
     def search(self, query: str, top_k: int = 3, use_bm25: bool = True) -> List[int]:
         """
@@ -194,72 +262,55 @@ class LightweightIndex:
             logger.warning(f"查询中没有有效关键词: {query}")
             return []
 
-        scores = []
-
-        for page in self.metadata["pages"]:
-            bm25_score = 0
-
-            # 计算文档长度
-            doc_length = len(page["keywords"])
-
-            # 统计查询词在文档中的词频
-            term_freq = Counter(page["keywords"])
-
-            # 计算 BM25 得分
-            for term in query_terms:
-                if term in term_freq:
-                    # 词频
-                    tf = term_freq[term]
-
-                    # IDF（如果词不在索引中，使用默认值）
-                    idf = self.idf.get(term, 0)
-
-                    # BM25 公式
-                    numerator = tf * (self.k1 + 1)
-                    denominator = tf + self.k1 * (1 - self.b + self.b * doc_length / self.avgdl)
-                    bm25_score += idf * (numerator / denominator)
+        if self._postings is None:
+            self._build_postings()
+
+        # 只遍历查询词的倒排列表，累加 (页面下标, 得分) 贡献
+        positions: List[np.ndarray] = []
+        contributions: List[np.ndarray] = []
+
+        for term in query_terms:
+            posting = self._postings.get(term)
+            if posting is not None:
+                docs, tf = posting
+                idf = self.idf.get(term, 0)  # 词不在 IDF 表中时得分为 0
+                positions.append(docs)
+                contributions.append(idf * tf * (self.k1 + 1) / (tf + self.k1 * self._length_norm[docs]))
+
+            # 额外加权：标题匹配（权重 5）、章节匹配（权重 3）
+            for postings, weight in ((self._title_postings, 5.0), (self._chapter_postings, 3.0)):
+                docs = postings.get(term)
+                if docs is not None:
+                    positions.append(docs)
+                    contributions.append(np.full(len(docs), weight))
+
+        # 页码直接匹配（权重 10）
+        page_num_match = re.search(r'第?\s*(\d+)\s*页', query)
+        if page_num_match:
+            docs = self._page_positions.get(int(page_num_match.group(1)))
+            if docs is not None:
+                positions.append(docs)
+                contributions.append(np.full(len(docs), 10.0))
+
+        if not positions:
+            logger.warning(f"未找到匹配的页面: {query}")
+            return []
 
-            # 额外加权（保留原有的特殊匹配逻辑）
-            bonus_score = 0
+        candidates, inverse = np.unique(np.concatenate(positions), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(contributions))
 
-            # 标题匹配（权重 5）
-            if page.get("title"):
-                title_terms = self._extract_keywords(page["title"])
-                for term in query_terms:
-                    if term in title_terms:
-                        bonus_score += 5
-
-            # 章节匹配（权重 3）
-            if page.get("chapter"):
-                chapter_terms = self._extract_keywords(page["chapter"])
-                for term in query_terms:
-                    if term in chapter_terms:
-                        bonus_score += 3
-
-            # 页码直接匹配（权重 10）
-            page_num_match = re.search(r'第?\s*(\d+)\s*页', query)
-            if page_num_match:
-                target_page = int(page_num_match.group(1))
-                if page["page_num"] == target_page:
-                    bonus_score += 10
-
-            # 总分 = BM25 得分 + 额外加权
-            total_score = bm25_score + bonus_score
-
-            scores.append((page["frame_num"], total_score, page["page_num"]))
+        # 按得分降序排序，过滤掉得分为 0 的结果；同分按页码、再按页面顺序排列。
+        # 累加顺序不同会带来浮点误差，先舍入再比较，避免数学上同分的页面顺序随误差变化
+        rounded = np.round(scores, 9)
+        order = np.lexsort((candidates, self._page_nums[candidates], -rounded))
+        order = order[rounded[order] > 0][:top_k]
 
-        # 排序并返回 top_k
-        scores.sort(key=lambda x: x[1], reverse=True)
-
-        # 过滤掉得分为 0 的结果
-        valid_scores = [(frame_num, score, page_num) for frame_num, score, page_num in scores if score > 0]
-
-        if not valid_scores:
+        if len(order) == 0:
             logger.warning(f"未找到匹配的页面: {query}")
             return []
 
         # 返回帧号列表
-        result_frames = [frame_num for frame_num, _, _ in valid_scores[:top_k]]
+        result_frames = [self.metadata["pages"][idx]["frame_num"] for idx in candidates[order]]
 
         logger.info(f"BM25 检索到 {len(result_frames)} 个相关页面: {result_frames}")
         return result_frames
@@ -269,6 +320,8 @@ class LightweightIndex:
         简单关键词匹配检索（降级方案）
         """
         query_lower = query.lower()
+        page_num_match = re.search(r'第?\s*(\d+)\s*页', query)
+        target_page = int(page_num_match.group(1)) if page_num_match else None
         scores = []
 
         for page in self.metadata["pages"]:
@@ -288,11 +341,8 @@ class LightweightIndex:
                 score += 3
 
             # 4. 页码直接匹配（权重 10）
-            page_num_match = re.search(r'第?\s*(\d+)\s*页', query)
-            if page_num_match:
-                target_page = int(page_num_match.group(1))
-                if page["page_num"] == target_page:
-                    score += 10
+            if page["page_num"] == target_page:
+                score += 10
 
             scores.append((page["frame_num"], score, page["page_num"]))
 
@@ -314,10 +364,23 @@ class LightweightIndex:
     
     def get_page_info(self, frame_num: int) -> Optional[Dict]:
         """获取页面元数据"""
-        for page in self.metadata["pages"]:
-            if page["frame_num"] == frame_num:
-                return page
-        return None
+        return self._pages_by_frame.get(frame_num)
+
+    def get_chapter(self, page_num: int) -> str:
+        """查找页面所属章节（按目录的页码区间）"""
+        if self._chapter_lookup is None:
+            self._chapter_lookup = ChapterLookup(self.metadata["toc"])
+        return self._chapter_lookup.find(page_num)
+
+    def set_toc(self, toc: Dict[str, List[int]]):
+        """替换目录结构"""
+        self.metadata["toc"] = toc
+        self._chapter_lookup = None
+
+    def _rebuild_lookups(self):
+        """根据 metadata 重建查找表"""
+        self._pages_by_frame = build_frame_lookup(self.metadata["pages"])
+        self._chapter_lookup = None
     
     def save(self, output_path: str):
         """保存索引到 JSON 文件（包含 BM25 索引）"""
@@ -371,6 +434,7 @@ class LightweightIndex:
             index.build_bm25_index()
             logger.info(f"✅ 索引已加载（旧格式）: {index_path} ({index.metadata['total_pages']} 页)")
 
+        index._rebuild_lookups()
         return index
     
     def get_chapter_pages(self, chapter: str) -> List[int]:
@@ -2,191 +2,1009 @@
 OCR 缓存模块
 
 缓存已 OCR 的页面，避免重复处理
+
+缓存键由页面图像内容哈希 + OCR 参数指纹（提示词、image_size 等）生成：
+- 视频/数据目录移动后缓存依然有效
+- 修改提示词或 OCR 参数后旧结果自然失效
+
+两级缓存：
+- 内存 LRU（进程内共享，按缓存文本总字节数限制容量）
+- 持久化存储（写穿透）
+
+存储后端：
+- sqlite（默认）: 单个 SQLite 数据库（WAL 模式），统计信息增量维护
+- json: 每页一个 JSON 文件（旧格式，保留兼容）
+
+淘汰策略（后台压缩任务定期执行）：
+- 总容量上限 / 单文档容量上限，按 LRU 或 LFU 淘汰
+- 可选 TTL（按写入时间过期）
 """
 
 import json
 import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Optional, Dict, Iterable, List, Tuple
 import logging
 
+import cv2
+import numpy as np
+
+from .config import CONFIG
+
 logger = logging.getLogger(__name__)
 
 
+class JSONFileStore:
+    """
+    JSON 文件存储（旧格式）
+
+    布局: <cache_dir>/<video_stem>/<cache_key>.json
+    帧哈希: <cache_dir>/_frame_hashes/<video_fingerprint>.jsonl
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+
+    def _get_frame_hash_file(self, video_fp: str) -> Path:
+        return self.cache_dir / "_frame_hashes" / f"{video_fp}.jsonl"
+
+    def get_frame_hashes(self, video_fp: str) -> Dict[int, str]:
+        hash_file = self._get_frame_hash_file(video_fp)
+        if not hash_file.exists():
+            return {}
+        hashes = {}
+        with hash_file.open('r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    hashes[record['frame_num']] = record['frame_hash']
+        return hashes
+
+    def set_frame_hashes(self, video_fp: str, hashes: Dict[int, str]):
+        hash_file = self._get_frame_hash_file(video_fp)
+        hash_file.parent.mkdir(exist_ok=True, parents=True)
+        with hash_file.open('a', encoding='utf-8') as f:
+            for frame_num, frame_hash in hashes.items():
+                f.write(json.dumps({'frame_num': frame_num, 'frame_hash': frame_hash}) + "\n")
+
+    def _get_cache_file(self, cache_key: str, video_name: str) -> Path:
+        return self.cache_dir / video_name / f"{cache_key}.json"
+
+    def get(self, cache_key: str, video_name: str) -> Optional[str]:
+        cache_file = self._get_cache_file(cache_key, video_name)
+        if not cache_file.exists():
+            return None
+        with cache_file.open('r', encoding='utf-8') as f:
+            return json.load(f).get('content')
+
+    def get_many(self, cache_keys: List[str], video_name: str) -> Dict[str, str]:
+        results = {}
+        for cache_key in cache_keys:
+            content = self.get(cache_key, video_name)
+            if content is not None:
+                results[cache_key] = content
+        return results
+
+    def set_many(self, video_name: str, records: List[Tuple[str, str, int, str]]):
+        """records: [(cache_key, video_path, frame_num, content), ...]"""
+        cache_subdir = self.cache_dir / video_name
+        cache_subdir.mkdir(exist_ok=True, parents=True)
+        for cache_key, video_path, frame_num, content in records:
+            with (cache_subdir / f"{cache_key}.json").open('w', encoding='utf-8') as f:
+                json.dump({
+                    'video_path': video_path,
+                    'frame_num': frame_num,
+                    'content': content
+                }, f, ensure_ascii=False, indent=2)
+
+    def touch(self, cache_keys: Iterable[str], video_name: str):
+        """记录访问（用文件修改时间表示最近访问时间）"""
+        for cache_key in cache_keys:
+            try:
+                os.utime(self._get_cache_file(cache_key, video_name))
+            except OSError:
+                pass
+
+    def evict(
+        self,
+        max_total_bytes: int = 0,
+        max_bytes_per_document: int = 0,
+        policy: str = "lru",
+        ttl_seconds: int = 0
+    ) -> Dict:
+        """按 TTL、单文档配额、总容量淘汰缓存文件（JSON 布局不记录命中次数，lfu 按 lru 处理）"""
+        entries = []  # (mtime, size, video_name, path)
+        for cache_file in self.cache_dir.glob('*/*.json'):
+            try:
+                stat = cache_file.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, cache_file.parent.name, cache_file))
+        entries.sort(key=lambda e: e[0])
+
+        removed = []
+        report = {'expired': 0, 'evicted_quota': 0, 'evicted_size': 0}
+
+        if ttl_seconds > 0:
+            deadline = time.time() - ttl_seconds
+            report['expired'] = sum(1 for e in entries if e[0] < deadline)
+            removed.extend(e for e in entries if e[0] < deadline)
+            entries = [e for e in entries if e[0] >= deadline]
+
+        if max_bytes_per_document > 0:
+            doc_sizes: Dict[str, int] = {}
+            for e in entries:
+                doc_sizes[e[2]] = doc_sizes.get(e[2], 0) + e[1]
+            kept = []
+            for e in entries:
+                if doc_sizes[e[2]] > max_bytes_per_document:
+                    doc_sizes[e[2]] -= e[1]
+                    removed.append(e)
+                    report['evicted_quota'] += 1
+                else:
+                    kept.append(e)
+            entries = kept
+
+        if max_total_bytes > 0:
+            total = sum(e[1] for e in entries)
+            while entries and total > max_total_bytes:
+                e = entries.pop(0)
+                total -= e[1]
+                removed.append(e)
+                report['evicted_size'] += 1
+
+        for e in removed:
+            e[3].unlink(missing_ok=True)
+
+        report['removed_keys'] = [e[3].stem for e in removed]
+        report['reclaimed_bytes'] = sum(e[1] for e in removed)
+        return report
+
+    def clear(self, video_name: Optional[str] = None):
+        if video_name:
+            cache_subdir = self.cache_dir / video_name
+            if cache_subdir.exists():
+                shutil.rmtree(cache_subdir)
+        else:
+            shutil.rmtree(self.cache_dir)
+            self.cache_dir.mkdir(exist_ok=True, parents=True)
+
+    def get_stats(self, video_name: Optional[str] = None) -> Dict:
+        if video_name:
+            cache_files = list((self.cache_dir / video_name).glob('*.json'))
+            total_size = sum(f.stat().st_size for f in cache_files)
+            return {
+                'video': video_name,
+                'cached_pages': len(cache_files),
+                'total_size': total_size,
+                'avg_size': total_size / len(cache_files) if cache_files else 0
+            }
+
+        all_cache_files = list(self.cache_dir.rglob('*.json'))
+        videos = {}
+        for cache_file in all_cache_files:
+            videos[cache_file.parent.name] = videos.get(cache_file.parent.name, 0) + 1
+        return {
+            'total_cached_pages': len(all_cache_files),
+            'total_size': sum(f.stat().st_size for f in all_cache_files),
+            'videos': videos
+        }
+
+
+class SQLiteStore:
+    """
+    SQLite 存储（WAL 模式）
+
+    - 所有页面存放在一个数据库文件中，不再产生大量小文件
+    - cache_stats 表由触发器增量维护，get_stats 无需扫描
+    - 旧的 JSON 目录布局不导入（键格式已改为页面内容哈希，旧条目无法再命中）
+    """
+
+    DB_NAME = "ocr_cache.sqlite3"
+    MAX_PARAMS = 500
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS ocr_cache (
+        cache_key   TEXT PRIMARY KEY,
+        video_name  TEXT NOT NULL,
+        video_path  TEXT,
+        frame_num   INTEGER,
+        content     TEXT NOT NULL,
+        size        INTEGER NOT NULL,
+        created_at  REAL NOT NULL,
+        last_access REAL,
+        hits        INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS idx_ocr_cache_video ON ocr_cache(video_name);
+
+    CREATE TABLE IF NOT EXISTS frame_hashes (
+        video_fp    TEXT NOT NULL,
+        frame_num   INTEGER NOT NULL,
+        frame_hash  TEXT NOT NULL,
+        PRIMARY KEY (video_fp, frame_num)
+    );
+
+    CREATE TABLE IF NOT EXISTS cache_stats (
+        video_name  TEXT PRIMARY KEY,
+        pages       INTEGER NOT NULL DEFAULT 0,
+        total_size  INTEGER NOT NULL DEFAULT 0
+    );
+
+    CREATE TRIGGER IF NOT EXISTS trg_ocr_cache_insert AFTER INSERT ON ocr_cache
+    BEGIN
+        INSERT OR IGNORE INTO cache_stats(video_name, pages, total_size) VALUES (NEW.video_name, 0, 0);
+        UPDATE cache_stats SET pages = pages + 1, total_size = total_size + NEW.size
+        WHERE video_name = NEW.video_name;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_ocr_cache_delete AFTER DELETE ON ocr_cache
+    BEGIN
+        UPDATE cache_stats SET pages = pages - 1, total_size = total_size - OLD.size
+        WHERE video_name = OLD.video_name;
+        DELETE FROM cache_stats WHERE video_name = OLD.video_name AND pages <= 0;
+    END;
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+        self.db_path = cache_dir / self.DB_NAME
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._upgrade_schema()
+        self._conn.commit()
+
+        # 访问记录先在内存中累积，批量写回（避免每次读取都写库）
+        self._pending_touches: Dict[str, int] = {}
+        self._pending_since = time.time()
+
+        self._warn_json_layout()
+
+    def _upgrade_schema(self):
+        """为旧版数据库补充访问统计列"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(ocr_cache)")}
+        if "last_access" not in columns:
+            self._conn.execute("ALTER TABLE ocr_cache ADD COLUMN last_access REAL")
+        if "hits" not in columns:
+            self._conn.execute("ALTER TABLE ocr_cache ADD COLUMN hits INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_cache_access ON ocr_cache(last_access)")
+
+    def _warn_json_layout(self):
+        """提示旧版 JSON 缓存目录不再使用（不自动删除，可能仍被 json 后端使用）"""
+        legacy_dirs = [d for d in self.cache_dir.iterdir() if d.is_dir() and any(d.glob('*.json'))]
+        if legacy_dirs:
+            logger.warning(
+                f"⚠️ 发现 {len(legacy_dirs)} 个 JSON 格式的 OCR 缓存目录，SQLite 后端不会读取，"
+                f"如不再使用 json 后端可手动删除"
+            )
+
+    def get_frame_hashes(self, video_fp: str) -> Dict[int, str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT frame_num, frame_hash FROM frame_hashes WHERE video_fp = ?", (video_fp,)
+            ).fetchall()
+        return dict(rows)
+
+    def set_frame_hashes(self, video_fp: str, hashes: Dict[int, str]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO frame_hashes(video_fp, frame_num, frame_hash) VALUES (?, ?, ?)",
+                [(video_fp, frame_num, frame_hash) for frame_num, frame_hash in hashes.items()]
+            )
+
+    def get(self, cache_key: str, video_name: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content FROM ocr_cache WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_many(self, cache_keys: List[str], video_name: str) -> Dict[str, str]:
+        results = {}
+        # 分块查询，避免超过 SQLite 的参数数量上限
+        for i in range(0, len(cache_keys), self.MAX_PARAMS):
+            chunk = cache_keys[i:i + self.MAX_PARAMS]
+            placeholders = ",".join("?" * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT cache_key, content FROM ocr_cache WHERE cache_key IN ({placeholders})",
+                    chunk
+                ).fetchall()
+            results.update(rows)
+        return results
+
+    def set_many(self, video_name: str, records: Iterable[Tuple[str, str, int, str]]):
+        """records: [(cache_key, video_path, frame_num, content), ...]"""
+        now = time.time()
+        # 内容相同的页面（空白页、重复页）缓存键相同，同一批中只写一次，避免主键冲突
+        rows = list({
+            cache_key: (cache_key, video_name, video_path, frame_num, content, len(content.encode('utf-8')), now)
+            for cache_key, video_path, frame_num, content in records
+        }.values())
+        if not rows:
+            return
+        with self._lock, self._conn:
+            # 先删除再插入，保证触发器正确维护统计信息
+            self._conn.executemany("DELETE FROM ocr_cache WHERE cache_key = ?", [(r[0],) for r in rows])
+            self._conn.executemany(
+                "INSERT INTO ocr_cache(cache_key, video_name, video_path, frame_num, content, size, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    TOUCH_FLUSH_SIZE = 256
+    TOUCH_FLUSH_INTERVAL = 30.0
+
+    def touch(self, cache_keys: Iterable[str], video_name: str):
+        """记录访问（用于 LRU / LFU 淘汰），累积到一定数量或时间后批量写回"""
+        with self._lock:
+            for cache_key in cache_keys:
+                self._pending_touches[cache_key] = self._pending_touches.get(cache_key, 0) + 1
+            should_flush = (
+                len(self._pending_touches) >= self.TOUCH_FLUSH_SIZE
+                or time.time() - self._pending_since >= self.TOUCH_FLUSH_INTERVAL
+            )
+        if should_flush:
+            self.flush_touches()
+
+    def flush_touches(self):
+        with self._lock:
+            pending, self._pending_touches = self._pending_touches, {}
+            self._pending_since = time.time()
+            if not pending:
+                return
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE ocr_cache SET last_access = ?, hits = hits + ? WHERE cache_key = ?",
+                    [(self._pending_since, count, key) for key, count in pending.items()]
+                )
+
+    def _delete_keys(self, cache_keys: List[str]):
+        """删除指定缓存键（调用方持有锁并处于事务中）"""
+        for i in range(0, len(cache_keys), self.MAX_PARAMS):
+            chunk = cache_keys[i:i + self.MAX_PARAMS]
+            placeholders = ",".join("?" * len(chunk))
+            self._conn.execute(f"DELETE FROM ocr_cache WHERE cache_key IN ({placeholders})", chunk)
+
+    def _file_bytes(self) -> int:
+        """数据库文件（含 WAL）占用的磁盘空间"""
+        total = 0
+        for suffix in ("", "-wal", "-shm"):
+            path = Path(str(self.db_path) + suffix)
+            if path.exists():
+                total += path.stat().st_size
+        return total
+
+    def evict(
+        self,
+        max_total_bytes: int = 0,
+        max_bytes_per_document: int = 0,
+        policy: str = "lru",
+        ttl_seconds: int = 0
+    ) -> Dict:
+        """
+        按 TTL、单文档配额、总容量淘汰缓存
+
+        Returns:
+            {'expired', 'evicted_quota', 'evicted_size', 'removed_keys', 'reclaimed_bytes', 'file_bytes_before', 'file_bytes_after'}
+        """
+        self.flush_touches()
+        if policy == "lfu":
+            order_by = "hits ASC, COALESCE(last_access, created_at) ASC"
+        else:
+            order_by = "COALESCE(last_access, created_at) ASC"
+
+        report = {'expired': 0, 'evicted_quota': 0, 'evicted_size': 0}
+        removed_keys: List[str] = []
+        reclaimed = 0
+        file_bytes_before = self._file_bytes()
+
+        def pick_victims(where: str, params: tuple, excess: int) -> List[Tuple[str, int]]:
+            victims, freed = [], 0
+            cursor = self._conn.execute(
+                f"SELECT cache_key, size FROM ocr_cache {where} ORDER BY {order_by}", params
+            )
+            for cache_key, size in cursor:
+                if freed >= excess:
+                    break
+                victims.append((cache_key, size))
+                freed += size
+            return victims
+
+        with self._lock, self._conn:
+            if ttl_seconds > 0:
+                expired = self._conn.execute(
+                    "SELECT cache_key, size FROM ocr_cache WHERE created_at < ?",
+                    (time.time() - ttl_seconds,)
+                ).fetchall()
+                self._delete_keys([k for k, _ in expired])
+                report['expired'] = len(expired)
+                removed_keys.extend(k for k, _ in expired)
+                reclaimed += sum(s for _, s in expired)
+
+            if max_bytes_per_document > 0:
+                over_quota = self._conn.execute(
+                    "SELECT video_name, total_size FROM cache_stats WHERE total_size > ?",
+                    (max_bytes_per_document,)
+                ).fetchall()
+                for video_name, total_size in over_quota:
+                    victims = pick_victims(
+                        "WHERE video_name = ?", (video_name,), total_size - max_bytes_per_document
+                    )
+                    self._delete_keys([k for k, _ in victims])
+                    report['evicted_quota'] += len(victims)
+                    removed_keys.extend(k for k, _ in victims)
+                    reclaimed += sum(s for _, s in victims)
+
+            if max_total_bytes > 0:
+                total_size = self._conn.execute(
+                    "SELECT COALESCE(SUM(total_size), 0) FROM cache_stats"
+                ).fetchone()[0]
+                if total_size > max_total_bytes:
+                    victims = pick_victims("", (), total_size - max_total_bytes)
+                    self._delete_keys([k for k, _ in victims])
+                    report['evicted_size'] = len(victims)
+                    removed_keys.extend(k for k, _ in victims)
+                    reclaimed += sum(s for _, s in victims)
+
+        if removed_keys:
+            with self._lock:
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                # 空闲页超过 1/4 时整理数据库文件，真正归还磁盘空间
+                page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+                freelist = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if page_count and freelist * 4 > page_count:
+                    self._conn.execute("VACUUM")
+
+        report['removed_keys'] = removed_keys
+        report['reclaimed_bytes'] = reclaimed
+        report['file_bytes_before'] = file_bytes_before
+        report['file_bytes_after'] = self._file_bytes()
+        return report
+
+    def clear(self, video_name: Optional[str] = None):
+        with self._lock, self._conn:
+            if video_name:
+                self._conn.execute("DELETE FROM ocr_cache WHERE video_name = ?", (video_name,))
+            else:
+                self._conn.execute("DELETE FROM ocr_cache")
+                self._conn.execute("DELETE FROM cache_stats")
+                self._conn.execute("DELETE FROM frame_hashes")
+        if not video_name:
+            with self._lock:
+                self._conn.execute("VACUUM")
+
+    def get_stats(self, video_name: Optional[str] = None) -> Dict:
+        with self._lock:
+            if video_name:
+                row = self._conn.execute(
+                    "SELECT pages, total_size FROM cache_stats WHERE video_name = ?", (video_name,)
+                ).fetchone()
+                pages, total_size = row if row else (0, 0)
+                return {
+                    'video': video_name,
+                    'cached_pages': pages,
+                    'total_size': total_size,
+                    'avg_size': total_size / pages if pages else 0
+                }
+
+            rows = self._conn.execute("SELECT video_name, pages, total_size FROM cache_stats").fetchall()
+        return {
+            'total_cached_pages': sum(r[1] for r in rows),
+            'total_size': sum(r[2] for r in rows),
+            'videos': {r[0]: r[1] for r in rows}
+        }
+
+    def close(self):
+        self.flush_touches()
+        with self._lock:
+            self._conn.close()
+
+
+class MemoryLRU:
+    """
+    进程内 LRU 缓存
+
+    容量按缓存文本的 UTF-8 总字节数限制，同时记录内存命中 / 磁盘命中 / 未命中次数
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: "OrderedDict[str, Tuple[str, str, int]]" = OrderedDict()  # key -> (content, video_name, size)
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+            return entry[0]
+
+    def put(self, key: str, content: str, video_name: str):
+        size = len(content.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[2]
+            self._entries[key] = (content, video_name, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def discard(self, keys: Iterable[str]):
+        with self._lock:
+            for key in keys:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self.current_bytes -= entry[2]
+
+    def clear(self, video_name: Optional[str] = None):
+        with self._lock:
+            if video_name is None:
+                self._entries.clear()
+                self.current_bytes = 0
+                return
+            for key in [k for k, v in self._entries.items() if v[1] == video_name]:
+                self.current_bytes -= self._entries.pop(key)[2]
+
+    def record(self, disk_hits: int = 0, misses: int = 0):
+        with self._lock:
+            self.disk_hits += disk_hits
+            self.misses += misses
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else None,
+            }
+
+
+# 进程内共享的内存缓存（按缓存目录区分，多个 OCRCache 实例共用）
+_memory_caches: Dict[str, MemoryLRU] = {}
+_memory_caches_lock = threading.Lock()
+
+
+def _get_memory_cache(cache_dir: Path, max_bytes: int) -> MemoryLRU:
+    key = str(cache_dir.resolve())
+    with _memory_caches_lock:
+        if key not in _memory_caches:
+            _memory_caches[key] = MemoryLRU(max_bytes)
+        return _memory_caches[key]
+
+
+# 进程内共享的存储实例和压缩任务（按缓存目录区分）
+_stores: Dict[Tuple[str, str], object] = {}
+_compactors: Dict[str, "CacheCompactor"] = {}
+_stores_lock = threading.Lock()
+
+
+def _get_store(cache_dir: Path, backend: str):
+    key = (str(cache_dir.resolve()), backend)
+    with _stores_lock:
+        if key not in _stores:
+            if backend == "sqlite":
+                _stores[key] = SQLiteStore(cache_dir)
+            elif backend == "json":
+                _stores[key] = JSONFileStore(cache_dir)
+            else:
+                raise ValueError(f"不支持的缓存后端: {backend}")
+        return _stores[key]
+
+
+class CacheCompactor:
+    """
+    后台压缩任务
+
+    定期按配置执行 TTL 过期、单文档配额和总容量淘汰，并记录回收的空间
+    """
+
+    def __init__(self, cache: "OCRCache", interval: float):
+        self.cache = cache
+        self.interval = interval
+        self.last_report: Optional[Dict] = None
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="ocr-cache-compaction", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _loop(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.cache.compact()
+            except Exception as e:
+                logger.warning(f"⚠️ OCR 缓存压缩失败: {e}")
+
+
+# 视频指纹缓存: (resolved_path, size, mtime_ns) -> video_fp
+_video_fingerprints: Dict[Tuple[str, int, int], str] = {}
+# 帧哈希缓存: video_fp -> {frame_num: frame_hash}
+_frame_hashes: Dict[str, Dict[int, str]] = {}
+_hashes_lock = threading.Lock()
+
+# 计算视频指纹时读取的首尾字节数
+FINGERPRINT_SAMPLE_BYTES = 1024 * 1024
+
+
+def _video_fingerprint(video_path: Path) -> str:
+    """
+    视频文件指纹（文件大小 + 首尾各 1MB 内容的哈希）
+
+    不依赖路径，视频移动或复制后指纹不变；按 (路径, 大小, 修改时间) 缓存，避免重复读取
+    """
+    stat = video_path.stat()
+    memo_key = (str(video_path.resolve()), stat.st_size, stat.st_mtime_ns)
+    with _hashes_lock:
+        if memo_key in _video_fingerprints:
+            return _video_fingerprints[memo_key]
+
+    digest = hashlib.sha256(str(stat.st_size).encode())
+    with video_path.open('rb') as f:
+        digest.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+        if stat.st_size > FINGERPRINT_SAMPLE_BYTES:
+            f.seek(max(FINGERPRINT_SAMPLE_BYTES, stat.st_size - FINGERPRINT_SAMPLE_BYTES))
+            digest.update(f.read())
+    video_fp = digest.hexdigest()[:32]
+
+    with _hashes_lock:
+        _video_fingerprints[memo_key] = video_fp
+    return video_fp
+
+
+def hash_frame(frame: np.ndarray) -> str:
+    """页面图像内容哈希"""
+    digest = hashlib.sha256(str(frame.shape).encode())
+    digest.update(np.ascontiguousarray(frame).tobytes())
+    return digest.hexdigest()
+
+
 class OCRCache:
     """
     OCR 结果缓存
-    
+
     缓存策略：
-    - 键: video_path + frame_num 的哈希
-    - 值: OCR 结果（JSON）
-    - 存储: 本地文件系统
+    - 键: 页面图像内容哈希 + OCR 参数指纹的哈希
+    - 值: OCR 结果文本
+    - 一级: 进程内 LRU（按字节数限制）
+    - 二级: SQLite（默认）或每页一个 JSON 文件，写穿透
+
+    帧号到图像内容哈希的映射按视频指纹持久化，只有首次访问某页时才需要解码视频帧
     """
-    
-    def __init__(self, cache_dir: str = "ocr_cache"):
+
+    def __init__(self, cache_dir: Optional[str] = None, backend: Optional[str] = None):
         """
         初始化缓存
-        
+
         Args:
-            cache_dir: 缓存目录
+            cache_dir: 缓存目录，默认从配置读取
+            backend: 存储后端（sqlite / json），默认从配置读取
         """
-        self.cache_dir = Path(cache_dir)
+        cache_config = CONFIG.get("ocr_cache", {})
+        self.cache_dir = Path(cache_dir or cache_config.get("dir", "ocr_cache"))
         self.cache_dir.mkdir(exist_ok=True, parents=True)
-        
-        logger.info(f"📦 OCR 缓存目录: {self.cache_dir}")
-    
-    def _get_cache_key(self, video_path: str, frame_num: int) -> str:
+
+        self.backend = backend or cache_config.get("backend", "sqlite")
+        self.store = _get_store(self.cache_dir, self.backend)
+
+        # 淘汰策略
+        self.max_total_bytes = cache_config.get("max_total_bytes", 0)
+        self.max_bytes_per_document = cache_config.get("max_bytes_per_document", 0)
+        self.eviction_policy = cache_config.get("eviction_policy", "lru")
+        self.ttl_seconds = cache_config.get("ttl_seconds", 0)
+        if self.eviction_policy not in ("lru", "lfu"):
+            raise ValueError(f"不支持的淘汰策略: {self.eviction_policy}")
+
+        # 内存 LRU（max_bytes <= 0 时禁用）
+        memory_max_bytes = cache_config.get("memory_max_bytes", 64 * 1024 * 1024)
+        self.memory = _get_memory_cache(self.cache_dir, memory_max_bytes) if memory_max_bytes > 0 else None
+
+        # 后台压缩任务（每个缓存目录一个）
+        self.compactor = self._start_compactor(cache_config.get("compaction_interval", 0))
+
+        logger.info(f"📦 OCR 缓存目录: {self.cache_dir} (backend={self.backend})")
+
+    def _start_compactor(self, interval: float) -> Optional[CacheCompactor]:
+        if interval <= 0:
+            return None
+        key = str(self.cache_dir.resolve())
+        with _stores_lock:
+            if key not in _compactors:
+                _compactors[key] = CacheCompactor(self, interval)
+                _compactors[key].start()
+            return _compactors[key]
+
+    def _get_frame_hashes(self, video_path: str, frame_nums: Iterable[int]) -> Dict[int, str]:
+        """
+        获取帧号对应的图像内容哈希
+
+        依次查找进程内缓存、持久化存储，仍缺失的帧才从视频中解码计算
+
+        Returns:
+            {frame_num: frame_hash}，无法解码的帧不包含在内
+        """
+        video_path = Path(video_path)
+        frame_nums = list(frame_nums)
+        video_fp = _video_fingerprint(video_path)
+
+        with _hashes_lock:
+            known = _frame_hashes.get(video_fp)
+        if known is None:
+            try:
+                known = self.store.get_frame_hashes(video_fp)
+            except Exception as e:
+                logger.warning(f"⚠️ 帧哈希读取失败: {e}")
+                known = {}
+            with _hashes_lock:
+                known = _frame_hashes.setdefault(video_fp, known)
+
+        missing = [f for f in frame_nums if f not in known]
+        if missing:
+            computed = {}
+            cap = cv2.VideoCapture(str(video_path))
+            try:
+                for frame_num in sorted(missing):
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num)
+                    ret, frame = cap.read()
+                    if ret:
+                        computed[frame_num] = hash_frame(frame)
+            finally:
+                cap.release()
+
+            if computed:
+                with _hashes_lock:
+                    known.update(computed)
+                try:
+                    self.store.set_frame_hashes(video_fp, computed)
+                except Exception as e:
+                    logger.warning(f"⚠️ 帧哈希保存失败: {e}")
+
+        return {f: known[f] for f in frame_nums if f in known}
+
+    def _get_cache_keys(self, video_path: str, frame_nums: Iterable[int], fingerprint: str = "") -> Dict[int, str]:
         """
         生成缓存键
-        
+
         Args:
-            video_path: 视频文件路径
-            frame_num: 帧号
-        
+            video_path: 视频文件路径（只用于定位帧，不参与键的计算）
+            frame_nums: 帧号列表
+            fingerprint: OCR 参数指纹（见 DeepSeekOCRClient.cache_fingerprint）
+
         Returns:
-            缓存键（哈希）
+            {frame_num: 缓存键（哈希）}
         """
-        # 使用视频路径 + 帧号生成唯一键
-        key_str = f"{Path(video_path).resolve()}_{frame_num}"
-        return hashlib.md5(key_str.encode()).hexdigest()
-    
-    def _get_cache_file(self, video_path: str, frame_num: int) -> Path:
+        frame_hashes = self._get_frame_hashes(video_path, frame_nums)
+        return {
+            frame_num: hashlib.sha256(f"{frame_hash}:{fingerprint}".encode()).hexdigest()
+            for frame_num, frame_hash in frame_hashes.items()
+        }
+
+    @staticmethod
+    def _get_video_name(video_path: str) -> str:
+        """视频名称（用于分组统计和按视频清除）"""
+        return Path(video_path).stem
+
+    def get(self, video_path: str, frame_num: int, fingerprint: str = "") -> Optional[str]:
         """
-        获取缓存文件路径
-        
+        获取缓存的 OCR 结果
+
         Args:
             video_path: 视频文件路径
             frame_num: 帧号
-        
+            fingerprint: OCR 参数指纹
+
         Returns:
-            缓存文件路径
+            OCR 结果，如果不存在则返回 None
         """
-        cache_key = self._get_cache_key(video_path, frame_num)
-        
-        # 使用视频名称作为子目录（便于管理）
-        video_name = Path(video_path).stem
-        cache_subdir = self.cache_dir / video_name
-        cache_subdir.mkdir(exist_ok=True)
-        
-        return cache_subdir / f"{cache_key}.json"
-    
-    def get(self, video_path: str, frame_num: int) -> Optional[str]:
+        return self.get_many(video_path, [frame_num], fingerprint).get(frame_num)
+
+    def get_many(self, video_path: str, frame_nums: Iterable[int], fingerprint: str = "") -> Dict[int, str]:
         """
-        获取缓存的 OCR 结果
-        
+        批量获取缓存的 OCR 结果
+
         Args:
             video_path: 视频文件路径
-            frame_num: 帧号
-        
+            frame_nums: 帧号列表
+            fingerprint: OCR 参数指纹
+
         Returns:
-            OCR 结果，如果不存在则返回 None
+            {frame_num: OCR 结果}，只包含命中的帧
         """
-        cache_file = self._get_cache_file(video_path, frame_num)
-        
-        if not cache_file.exists():
-            return None
-        
         try:
-            with cache_file.open('r', encoding='utf-8') as f:
-                data = json.load(f)
-                logger.debug(f"✅ 缓存命中: 第 {frame_num + 1} 页")
-                return data.get('content')
+            # 内容相同的页面共用一个缓存键
+            key_to_frames: Dict[str, List[int]] = {}
+            for frame_num, key in self._get_cache_keys(video_path, frame_nums, fingerprint).items():
+                key_to_frames.setdefault(key, []).append(frame_num)
         except Exception as e:
-            logger.warning(f"⚠️ 缓存读取失败: {e}")
-            return None
-    
-    def set(self, video_path: str, frame_num: int, content: str):
+            logger.warning(f"⚠️ 缓存键生成失败: {e}")
+            return {}
+        video_name = self._get_video_name(video_path)
+
+        hits = {}
+        if self.memory is not None:
+            for key in key_to_frames:
+                content = self.memory.get(key)
+                if content is not None:
+                    hits[key] = content
+
+        if hits:
+            self.store.touch(list(hits), video_name)
+
+        missing = [key for key in key_to_frames if key not in hits]
+        if missing:
+            try:
+                disk_hits = self.store.get_many(missing, video_name)
+            except Exception as e:
+                logger.warning(f"⚠️ 缓存批量读取失败: {e}")
+                disk_hits = {}
+            if disk_hits:
+                self.store.touch(list(disk_hits), video_name)
+
+            if self.memory is not None:
+                self.memory.record(disk_hits=len(disk_hits), misses=len(missing) - len(disk_hits))
+                for key, content in disk_hits.items():
+                    self.memory.put(key, content, video_name)
+            hits.update(disk_hits)
+
+        results = {
+            frame_num: content
+            for key, content in hits.items()
+            for frame_num in key_to_frames[key]
+        }
+        logger.debug(f"✅ 缓存批量命中: {len(results)}/{sum(map(len, key_to_frames.values()))} 页")
+        return results
+
+    def set(self, video_path: str, frame_num: int, content: str, fingerprint: str = ""):
         """
         设置缓存
-        
+
         Args:
             video_path: 视频文件路径
             frame_num: 帧号
             content: OCR 结果
+            fingerprint: OCR 参数指纹
+        """
+        self.set_many(video_path, {frame_num: content}, fingerprint)
+
+    def set_many(self, video_path: str, contents: Dict[int, str], fingerprint: str = ""):
         """
-        cache_file = self._get_cache_file(video_path, frame_num)
-        
+        批量设置缓存（单个事务）
+
+        Args:
+            video_path: 视频文件路径
+            contents: {frame_num: OCR 结果}
+            fingerprint: OCR 参数指纹
+        """
+        contents = {f: c for f, c in contents.items() if c is not None}
         try:
-            with cache_file.open('w', encoding='utf-8') as f:
-                json.dump({
-                    'video_path': str(video_path),
-                    'frame_num': frame_num,
-                    'content': content
-                }, f, ensure_ascii=False, indent=2)
-            
-            logger.debug(f"💾 缓存已保存: 第 {frame_num + 1} 页")
+            cache_keys = self._get_cache_keys(video_path, contents, fingerprint)
+        except Exception as e:
+            logger.warning(f"⚠️ 缓存键生成失败: {e}")
+            return
+
+        records = [
+            (cache_keys[frame_num], str(video_path), frame_num, content)
+            for frame_num, content in contents.items()
+            if frame_num in cache_keys
+        ]
+        video_name = self._get_video_name(video_path)
+        try:
+            self.store.set_many(video_name, records)
+            logger.debug(f"💾 缓存已保存: {len(records)} 页")
         except Exception as e:
             logger.warning(f"⚠️ 缓存保存失败: {e}")
-    
+            return
+
+        # 写穿透：持久化成功后再更新内存缓存
+        if self.memory is not None:
+            for cache_key, _, _, content in records:
+                self.memory.put(cache_key, content, video_name)
+
+    def compact(self) -> Dict:
+        """
+        按配置执行淘汰（TTL、单文档配额、总容量）
+
+        Returns:
+            压缩报告（过期 / 超配额 / 超容量淘汰的页数和回收的字节数）
+        """
+        start = time.time()
+        report = self.store.evict(
+            max_total_bytes=self.max_total_bytes,
+            max_bytes_per_document=self.max_bytes_per_document,
+            policy=self.eviction_policy,
+            ttl_seconds=self.ttl_seconds
+        )
+        removed_keys = report.pop('removed_keys')
+        if self.memory is not None and removed_keys:
+            self.memory.discard(removed_keys)
+
+        report['removed'] = len(removed_keys)
+        report['policy'] = self.eviction_policy
+        report['duration'] = time.time() - start
+        report['finished_at'] = time.time()
+        if self.compactor is not None:
+            self.compactor.last_report = report
+
+        if removed_keys:
+            logger.info(
+                f"🧹 OCR 缓存压缩: 淘汰 {len(removed_keys)} 页 "
+                f"(过期 {report['expired']}, 超配额 {report['evicted_quota']}, 超容量 {report['evicted_size']})，"
+                f"回收 {report['reclaimed_bytes'] / 1024 / 1024:.2f} MB"
+            )
+        return report
+
     def clear(self, video_path: Optional[str] = None):
         """
         清除缓存
-        
+
         Args:
             video_path: 如果指定，只清除该视频的缓存；否则清除所有缓存
         """
         if video_path:
-            # 清除特定视频的缓存
-            video_name = Path(video_path).stem
-            cache_subdir = self.cache_dir / video_name
-            
-            if cache_subdir.exists():
-                import shutil
-                shutil.rmtree(cache_subdir)
-                logger.info(f"🗑️ 已清除缓存: {video_name}")
+            video_name = self._get_video_name(video_path)
+            self.store.clear(video_name)
+            if self.memory is not None:
+                self.memory.clear(video_name)
+            logger.info(f"🗑️ 已清除缓存: {video_name}")
         else:
-            # 清除所有缓存
-            import shutil
-            shutil.rmtree(self.cache_dir)
-            self.cache_dir.mkdir(exist_ok=True)
+            self.store.clear()
+            with _hashes_lock:
+                _frame_hashes.clear()
+            if self.memory is not None:
+                self.memory.clear()
             logger.info(f"🗑️ 已清除所有缓存")
-    
+
     def get_stats(self, video_path: Optional[str] = None) -> Dict:
         """
         获取缓存统计信息
-        
+
         Args:
             video_path: 如果指定，只统计该视频的缓存
-        
+
         Returns:
-            统计信息
+            统计信息（全局统计额外包含内存缓存命中情况）
         """
         if video_path:
-            video_name = Path(video_path).stem
-            cache_subdir = self.cache_dir / video_name
-            
-            if not cache_subdir.exists():
-                return {
-                    'video': video_name,
-                    'cached_pages': 0,
-                    'total_size': 0
-                }
-            
-            cache_files = list(cache_subdir.glob('*.json'))
-            total_size = sum(f.stat().st_size for f in cache_files)
-            
-            return {
-                'video': video_name,
-                'cached_pages': len(cache_files),
-                'total_size': total_size,
-                'avg_size': total_size / len(cache_files) if cache_files else 0
-            }
-        else:
-            # 统计所有缓存
-            all_cache_files = list(self.cache_dir.rglob('*.json'))
-            total_size = sum(f.stat().st_size for f in all_cache_files)
-            
-            # 按视频分组
-            videos = {}
-            for cache_file in all_cache_files:
-                video_name = cache_file.parent.name
-                if video_name not in videos:
-                    videos[video_name] = 0
-                videos[video_name] += 1
-            
-            return {
-                'total_cached_pages': len(all_cache_files),
-                'total_size': total_size,
-                'videos': videos
-            }
+            return self.store.get_stats(self._get_video_name(video_path))
 
+        stats = self.store.get_stats()
+        if self.memory is not None:
+            stats['memory'] = self.memory.get_stats()
+        stats['eviction'] = {
+            'policy': self.eviction_policy,
+            'max_total_bytes': self.max_total_bytes,
+            'max_bytes_per_document': self.max_bytes_per_document,
+            'ttl_seconds': self.ttl_seconds,
+            'last_compaction': self.compactor.last_report if self.compactor is not None else None,
+        }
+        return stats
@@ -6,9 +6,12 @@ DeepSeek OCR Client
 
 import requests
 import base64
+import hashlib
 import io
+import json
 import time
-from typing import List, Dict, Optional, Union
+from contextlib import ExitStack
+from typing import Callable, List, Dict, Optional, Tuple, Union
 from pathlib import Path
 import numpy as np
 from PIL import Image
@@ -16,6 +19,14 @@ import cv2
 import logging
 
 from .config import CONFIG
+from .resilience import (
+    CircuitOpenError,
+    RETRYABLE_STATUS_CODES,
+    TransientError,
+    get_resilience,
+    parse_retry_after,
+)
+from .ocr_pool import PRIORITY_INTERACTIVE, get_endpoint_pool, parse_endpoints
 
 logger = logging.getLogger(__name__)
 
@@ -28,21 +39,39 @@ class DeepSeekOCRClient:
     - 单张图片 OCR
     - 批量图片 OCR
     - Base64 图片 OCR
-    - 自动重试和错误处理
+    - 自动重试、限流和熔断（见 resilience 模块）
+    - 多端点负载均衡和优先级通道（见 ocr_pool 模块）
     """
     
-    def __init__(self, endpoint: Optional[str] = None):
+    def __init__(
+        self,
+        endpoint: Optional[Union[str, List[str]]] = None,
+        default_priority: str = PRIORITY_INTERACTIVE
+    ):
         """
         初始化 OCR 客户端
 
         Args:
-            endpoint: OCR 服务地址，默认从配置读取
+            endpoint: OCR 服务地址，支持单个 URL、逗号分隔的多个 URL 或 URL 列表，默认从配置读取
+            default_priority: 默认优先级通道（查询时 OCR 用 interactive，批量入库用 bulk）
         """
-        self.endpoint = endpoint or CONFIG["ocr"]["endpoint"]
+        self.endpoints = parse_endpoints(endpoint) or parse_endpoints(CONFIG["ocr"]["endpoint"])
+        self.endpoint = self.endpoints[0]  # 兼容旧代码（日志等）
         self.batch_size = CONFIG["ocr"]["batch_size"]
+        self.timeout = CONFIG["ocr"].get("timeout", 300)
+        self.default_priority = default_priority
+
+        # 端点池（同一组端点的客户端共享，按最少在途请求调度）
+        self.pool = get_endpoint_pool(
+            self.endpoints,
+            max_concurrency=CONFIG["ocr"].get("max_concurrency_per_endpoint", 2),
+            health_check_interval=CONFIG["ocr"].get("health_check_interval", 30.0)
+        )
 
-        # 从提示词文件加载默认提示词
-        self.default_prompt = self._load_prompt(CONFIG["ocr"]["prompt_file"])
+        # 从提示词文件加载默认提示词（文件被修改后自动重新加载）
+        self._prompt_path: Optional[Path] = None
+        self._prompt_mtime: Optional[float] = None
+        self._default_prompt = self._load_prompt(CONFIG["ocr"]["prompt_file"])
 
         self.is_available = False
 
@@ -72,6 +101,8 @@ class DeepSeekOCRClient:
                     return "<image>\n请将这页文档的全部内容转换为Markdown格式。"
 
             if path.exists():
+                self._prompt_path = path
+                self._prompt_mtime = path.stat().st_mtime
                 return path.read_text(encoding="utf-8")
             else:
                 logger.warning(f"⚠️ 提示词文件不存在: {prompt_path}，使用默认提示词")
@@ -79,32 +110,143 @@ class DeepSeekOCRClient:
         except Exception as e:
             logger.error(f"❌ 加载提示词失败: {e}，使用默认提示词")
             return "<image>\n请将这页文档的全部内容转换为Markdown格式。"
+
+    @property
+    def default_prompt(self) -> str:
+        """默认提示词（通过 /settings/prompts 修改提示词文件后自动生效）"""
+        if self._prompt_path is not None:
+            try:
+                mtime = self._prompt_path.stat().st_mtime
+                if mtime != self._prompt_mtime:
+                    self._default_prompt = self._prompt_path.read_text(encoding="utf-8")
+                    self._prompt_mtime = mtime
+                    logger.info(f"🔄 提示词已重新加载: {self._prompt_path.name}")
+            except OSError as e:
+                logger.warning(f"⚠️ 重新加载提示词失败: {e}")
+        return self._default_prompt
+
+    def cache_fingerprint(self, prompt: Optional[str] = None, **kwargs) -> str:
+        """
+        OCR 参数指纹（作为 OCR 缓存键的一部分）
+
+        提示词或 base_size / image_size / crop_mode 变化时指纹随之变化，旧缓存自然失效
+
+        Args:
+            prompt: OCR 提示词，默认使用当前默认提示词
+            **kwargs: 与 ocr_image 相同的参数
+
+        Returns:
+            指纹（哈希）
+        """
+        params = {
+            "provider": "deepseek_ocr",
+            "prompt": prompt or self.default_prompt,
+            "base_size": int(kwargs.get("base_size", CONFIG["ocr"]["base_size"])),
+            "image_size": int(kwargs.get("image_size", CONFIG["ocr"]["image_size"])),
+            "crop_mode": bool(kwargs.get("crop_mode", CONFIG["ocr"]["crop_mode"])),
+        }
+        payload = json.dumps(params, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
     
     def _check_health(self) -> bool:
-        """检查 OCR 服务是否可用"""
-        logger.info(f"🔍 检查 OCR 服务健康状态: {self.endpoint}")
-        try:
-            # 禁用代理
-            proxies = {
-                'http': None,
-                'https': None,
-            }
-            logger.debug(f"   发送健康检查请求 (禁用代理)...")
-            response = requests.get(f"{self.endpoint}/health", timeout=5, proxies=proxies)
-            logger.debug(f"   收到响应: {response.status_code}")
+        """检查 OCR 服务是否可用（任一端点可用即可），并启动后台健康检查"""
+        logger.info(f"🔍 检查 OCR 服务健康状态: {', '.join(self.endpoints)}")
+        available = self.pool.check_all()
+        self.pool.start_health_checks()
+
+        healthy_count = sum(1 for e in self.pool.get_stats()["endpoints"] if e["healthy"])
+        if available:
+            logger.info(f"✅ DeepSeek OCR 服务正常: {healthy_count}/{len(self.endpoints)} 个端点可用")
+        else:
+            logger.warning(f"⚠️ 无法连接到 DeepSeek OCR 服务")
+            logger.warning(f"⚠️ OCR 服务将不可用: {', '.join(self.endpoints)}")
+        return available
+
+    def _post(
+        self,
+        path: str,
+        make_request: Callable[[], Dict],
+        priority: Optional[str] = None
+    ) -> requests.Response:
+        """
+        通过端点池发送 POST 请求
+
+        端点重试耗尽或熔断时，自动转移到下一个可用端点。
+
+        Args:
+            path: 接口路径（如 /ocr/image）
+            make_request: 每次尝试时构造 requests 参数（files/data/json）的函数
+            priority: 优先级通道，默认使用客户端的 default_priority
+        """
+        priority = priority or self.default_priority
+        tried = set()
+        last_error: Optional[Exception] = None
+
+        while len(tried) < len(self.endpoints):
+            # 槽位只在发送期间持有：重试退避前释放，退避结束后重新排队获取同一端点的槽位，
+            # 避免重试中的请求占着端点并发名额睡眠
+            slot = ExitStack()
+            endpoint = slot.enter_context(self.pool.acquire(priority, exclude=tried))
+            tried.add(endpoint)
+            others = set(self.endpoints) - {endpoint}
+
+            def _send():
+                nonlocal slot
+                if slot is None:
+                    slot = ExitStack()
+                    slot.enter_context(self.pool.acquire(priority, exclude=others))
+                try:
+                    logger.debug(f"   发送 OCR 请求到: {endpoint}{path} (priority={priority})")
+                    resp = requests.post(
+                        f"{endpoint}{path}",
+                        proxies={'http': None, 'https': None},
+                        timeout=self.timeout,
+                        **make_request()
+                    )
+                    logger.debug(f"   收到响应: {resp.status_code}")
+                    self._raise_for_transient(resp)
+                    return resp
+                finally:
+                    slot.close()
+                    slot = None
+
+            try:
+                return get_resilience(f"deepseek_ocr:{endpoint}").call(_send)
+            except (TransientError, CircuitOpenError, requests.RequestException) as e:
+                last_error = e
+                if len(tried) < len(self.endpoints):
+                    logger.warning(f"⚠️ OCR 端点失败，转移到其他端点: {endpoint} ({e})")
+            finally:
+                # 熔断器拒绝时 _send 未执行，释放首次获取的槽位
+                if slot is not None:
+                    slot.close()
+
+        raise last_error
+
+    def _encode_image(self, image: Union[str, Path, np.ndarray, Image.Image]) -> Tuple[str, bytes]:
+        """将图片转换为 (文件名, PNG 字节)"""
+        if isinstance(image, (str, Path)):
+            return Path(image).name, Path(image).read_bytes()
+        elif isinstance(image, np.ndarray):
+            _, buffer = cv2.imencode('.png', image)
+            return "image.png", buffer.tobytes()
+        elif isinstance(image, Image.Image):
+            buffer = io.BytesIO()
+            image.save(buffer, format='PNG')
+            return "image.png", buffer.getvalue()
+        else:
+            raise ValueError(f"不支持的图片类型: {type(image)}")
+
+    @staticmethod
+    def _raise_for_transient(response: requests.Response):
+        """遇到可重试的 HTTP 状态码时抛出 TransientError，交给 resilience 层重试"""
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            raise TransientError(
+                f"HTTP {response.status_code}: {response.text[:200]}",
+                status_code=response.status_code,
+                retry_after=parse_retry_after(response.headers.get("Retry-After"))
+            )
 
-            if response.status_code == 200:
-                health = response.json()
-                logger.info(f"✅ DeepSeek OCR 服务正常: {health}")
-                return True
-            else:
-                logger.warning(f"⚠️ DeepSeek OCR 服务异常: {response.status_code}")
-                return False
-        except Exception as e:
-            logger.warning(f"⚠️ 无法连接到 DeepSeek OCR 服务: {e}")
-            logger.warning(f"⚠️ OCR 服务将不可用: {self.endpoint}")
-            return False
-    
     def ocr_image(
         self,
         image: Union[str, Path, np.ndarray, Image.Image],
@@ -117,7 +259,7 @@ class DeepSeekOCRClient:
         Args:
             image: 图片路径、numpy 数组或 PIL Image
             prompt: OCR 提示词
-            **kwargs: 其他参数 (base_size, image_size, crop_mode)
+            **kwargs: 其他参数 (base_size, image_size, crop_mode, priority)
 
         Returns:
             {
@@ -133,76 +275,22 @@ class DeepSeekOCRClient:
         try:
             prompt = prompt or self.default_prompt
 
-            # 禁用代理
-            proxies = {
-                'http': None,
-                'https': None,
-            }
-
             logger.debug(f"📡 开始 OCR 请求: 图片类型={type(image).__name__}")
 
-            # 转换图片为文件对象
-            if isinstance(image, (str, Path)):
-                # 文件路径
-                with open(image, "rb") as f:
-                    files = {"file": (Path(image).name, f, "image/png")}
-                    data = {
-                        "prompt": prompt,
-                        "base_size": str(kwargs.get("base_size", CONFIG["ocr"]["base_size"])),
-                        "image_size": str(kwargs.get("image_size", CONFIG["ocr"]["image_size"])),
-                        "crop_mode": "true" if kwargs.get("crop_mode", CONFIG["ocr"]["crop_mode"]) else "false",
-                    }
-                    logger.debug(f"   发送 OCR 请求到: {self.endpoint}/ocr/image")
-                    response = requests.post(
-                        f"{self.endpoint}/ocr/image",
-                        files=files,
-                        data=data,
-                        proxies=proxies,
-                        timeout=300
-                    )
-                    logger.debug(f"   收到响应: {response.status_code}")
-            elif isinstance(image, np.ndarray):
-                # OpenCV 图片
-                _, buffer = cv2.imencode('.png', image)
-                files = {"file": ("image.png", io.BytesIO(buffer), "image/png")}
-                data = {
-                    "prompt": prompt,
-                    "base_size": str(kwargs.get("base_size", CONFIG["ocr"]["base_size"])),
-                    "image_size": str(kwargs.get("image_size", CONFIG["ocr"]["image_size"])),
-                    "crop_mode": "true" if kwargs.get("crop_mode", CONFIG["ocr"]["crop_mode"]) else "false",
-                }
-                logger.debug(f"   发送 OCR 请求到: {self.endpoint}/ocr/image")
-                response = requests.post(
-                    f"{self.endpoint}/ocr/image",
-                    files=files,
-                    data=data,
-                    proxies=proxies,
-                    timeout=300
-                )
-                logger.debug(f"   收到响应: {response.status_code}")
-            elif isinstance(image, Image.Image):
-                # PIL Image
-                buffer = io.BytesIO()
-                image.save(buffer, format='PNG')
-                buffer.seek(0)
-                files = {"file": ("image.png", buffer, "image/png")}
-                data = {
-                    "prompt": prompt,
-                    "base_size": str(kwargs.get("base_size", CONFIG["ocr"]["base_size"])),
-                    "image_size": str(kwargs.get("image_size", CONFIG["ocr"]["image_size"])),
-                    "crop_mode": "true" if kwargs.get("crop_mode", CONFIG["ocr"]["crop_mode"]) else "false",
-                }
-                logger.debug(f"   发送 OCR 请求到: {self.endpoint}/ocr/image")
-                response = requests.post(
-                    f"{self.endpoint}/ocr/image",
-                    files=files,
-                    data=data,
-                    proxies=proxies,
-                    timeout=300
-                )
-                logger.debug(f"   收到响应: {response.status_code}")
-            else:
-                raise ValueError(f"不支持的图片类型: {type(image)}")
+            # 转换图片为 PNG 字节（只编码一次，重试时复用）
+            filename, image_bytes = self._encode_image(image)
+            data = {
+                "prompt": prompt,
+                "base_size": str(kwargs.get("base_size", CONFIG["ocr"]["base_size"])),
+                "image_size": str(kwargs.get("image_size", CONFIG["ocr"]["image_size"])),
+                "crop_mode": "true" if kwargs.get("crop_mode", CONFIG["ocr"]["crop_mode"]) else "false",
+            }
+
+            response = self._post(
+                "/ocr/image",
+                lambda: {"files": {"file": (filename, io.BytesIO(image_bytes), "image/png")}, "data": data},
+                priority=kwargs.get("priority")
+            )
 
             # 解析响应
             elapsed_time = time.time() - start_time
@@ -222,6 +310,15 @@ class DeepSeekOCRClient:
                     "error": f"HTTP {response.status_code}: {response.text}"
                 }
 
+        except (TransientError, CircuitOpenError, requests.RequestException) as e:
+            elapsed_time = time.time() - start_time
+            logger.error(f"❌ OCR 服务暂不可用: {e}")
+            return {
+                "success": False,
+                "text": None,
+                "processing_time": elapsed_time,
+                "error": f"OCR 服务暂不可用: {str(e)}"
+            }
         except Exception as e:
             elapsed_time = time.time() - start_time
             logger.error(f"❌ OCR 异常: {e}", exc_info=True)
@@ -278,13 +375,27 @@ class DeepSeekOCRClient:
             "crop_mode": kwargs.get("crop_mode", CONFIG["ocr"]["crop_mode"]),
         }
         
+        def _make_request():
+            # 重试时需要把文件指针复位
+            for buf in temp_buffers:
+                buf.seek(0)
+            return {"files": files, "data": data}
+
         try:
-            response = requests.post(
-                f"{self.endpoint}/ocr/batch",
-                files=files,
-                data=data
-            )
-            
+            try:
+                response = self._post("/ocr/batch", _make_request, priority=kwargs.get("priority"))
+            except (TransientError, CircuitOpenError, requests.RequestException) as e:
+                logger.error(f"批量 OCR 服务暂不可用: {e}")
+                return [
+                    {
+                        "success": False,
+                        "text": None,
+                        "processing_time": None,
+                        "error": f"OCR 服务暂不可用: {str(e)}"
+                    }
+                    for _ in images
+                ]
+
             if response.status_code == 200:
                 return response.json()
             else:
@@ -331,11 +442,17 @@ class DeepSeekOCRClient:
             "crop_mode": kwargs.get("crop_mode", CONFIG["ocr"]["crop_mode"]),
         }
         
-        response = requests.post(
-            f"{self.endpoint}/ocr/base64",
-            json=payload
-        )
-        
+        try:
+            response = self._post("/ocr/base64", lambda: {"json": payload}, priority=kwargs.get("priority"))
+        except (TransientError, CircuitOpenError, requests.RequestException) as e:
+            logger.error(f"Base64 OCR 服务暂不可用: {e}")
+            return {
+                "success": False,
+                "text": None,
+                "processing_time": None,
+                "error": f"OCR 服务暂不可用: {str(e)}"
+            }
+
         if response.status_code == 200:
             return response.json()
         else:
@@ -0,0 +1,222 @@
+"""
+OCR Endpoint Pool
+
+多 OCR 服务端点的负载均衡：
+- 最少在途请求（least outstanding requests）选择端点
+- 后台健康检查维护可用成员
+- 优先级通道：交互式查询（interactive）优先于批量入库（bulk）
+"""
+
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Set
+import logging
+
+import requests
+
+from .resilience import CircuitBreaker, get_resilience
+
+logger = logging.getLogger(__name__)
+
+
+# 优先级通道（数值越小越优先）
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BULK = "bulk"
+PRIORITY_BACKGROUND = "background"
+PRIORITY_LEVELS = {
+    PRIORITY_INTERACTIVE: 0,
+    PRIORITY_BULK: 1,
+    PRIORITY_BACKGROUND: 2,
+}
+
+
+def parse_endpoints(endpoint) -> List[str]:
+    """
+    解析端点配置
+
+    支持单个 URL、逗号分隔的字符串或 URL 列表
+    """
+    if not endpoint:
+        return []
+    if isinstance(endpoint, str):
+        endpoint = endpoint.split(",")
+    return [e.strip().rstrip("/") for e in endpoint if e and e.strip()]
+
+
+class EndpointPool:
+    """
+    OCR 端点池
+
+    每个端点最多同时处理 max_concurrency 个请求；端点全部占满时，
+    等待者按优先级（再按到达顺序）排队获取下一个空闲槽位。
+    """
+
+    def __init__(
+        self,
+        endpoints: List[str],
+        max_concurrency: int = 2,
+        health_check_interval: float = 30.0,
+        health_check_timeout: float = 5.0
+    ):
+        if not endpoints:
+            raise ValueError("至少需要一个 OCR 端点")
+
+        self.endpoints = list(endpoints)
+        self.max_concurrency = max(1, max_concurrency)
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+
+        self._outstanding: Dict[str, int] = {e: 0 for e in self.endpoints}
+        self._healthy: Dict[str, bool] = {e: True for e in self.endpoints}
+        self._last_check: Dict[str, Optional[float]] = {e: None for e in self.endpoints}
+
+        self._cond = threading.Condition()
+        self._waiters: Dict[tuple, Set[str]] = {}  # (priority_level, seq) -> exclude
+        self._seq = itertools.count()
+
+        self._health_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    # ==================== 健康检查 ====================
+
+    def check_endpoint(self, endpoint: str) -> bool:
+        """对单个端点执行健康检查"""
+        try:
+            response = requests.get(
+                f"{endpoint}/health",
+                timeout=self.health_check_timeout,
+                proxies={'http': None, 'https': None}
+            )
+            healthy = response.status_code == 200
+        except Exception as e:
+            logger.debug(f"   健康检查失败 {endpoint}: {e}")
+            healthy = False
+
+        with self._cond:
+            if healthy != self._healthy[endpoint]:
+                if healthy:
+                    logger.info(f"✅ OCR 端点恢复: {endpoint}")
+                else:
+                    logger.warning(f"⚠️ OCR 端点移出可用池: {endpoint}")
+            self._healthy[endpoint] = healthy
+            self._last_check[endpoint] = time.time()
+            self._cond.notify_all()
+        return healthy
+
+    def check_all(self) -> bool:
+        """检查所有端点，返回是否至少有一个可用"""
+        results = [self.check_endpoint(e) for e in self.endpoints]
+        return any(results)
+
+    def start_health_checks(self):
+        """启动后台健康检查线程（interval <= 0 时不启动）"""
+        if self.health_check_interval <= 0 or self._health_thread is not None:
+            return
+
+        def _loop():
+            while not self._stop_event.wait(self.health_check_interval):
+                self.check_all()
+
+        self._health_thread = threading.Thread(target=_loop, name="ocr-health-check", daemon=True)
+        self._health_thread.start()
+
+    def stop(self):
+        """停止后台健康检查"""
+        self._stop_event.set()
+
+    def _is_available(self, endpoint: str) -> bool:
+        """端点是否可参与调度（健康检查通过且未熔断）"""
+        if not self._healthy[endpoint]:
+            return False
+        return get_resilience(f"deepseek_ocr:{endpoint}").breaker.state != CircuitBreaker.OPEN
+
+    # ==================== 调度 ====================
+
+    def _pick(self, exclude: Set[str]) -> Optional[str]:
+        """选择在途请求最少的端点（调用方持有锁）"""
+        candidates = [e for e in self.endpoints if e not in exclude and self._is_available(e)]
+        if not candidates:
+            # 没有健康端点时退化为所有未排除端点，由熔断器决定是否快速失败
+            candidates = [e for e in self.endpoints if e not in exclude]
+        candidates = [e for e in candidates if self._outstanding[e] < self.max_concurrency]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda e: self._outstanding[e])
+
+    def _next_grant(self) -> tuple:
+        """按 (优先级, 到达顺序) 找出下一个能拿到槽位的等待者（调用方持有锁）"""
+        for waiter in sorted(self._waiters):
+            endpoint = self._pick(self._waiters[waiter])
+            if endpoint is not None:
+                return waiter, endpoint
+        return None, None
+
+    @contextmanager
+    def acquire(self, priority: str = PRIORITY_INTERACTIVE, exclude: Optional[Set[str]] = None) -> Iterator[str]:
+        """
+        获取一个端点槽位
+
+        Args:
+            priority: 优先级通道（interactive / bulk / background）
+            exclude: 本次请求不再尝试的端点（故障转移时使用）
+
+        Yields:
+            端点 URL
+        """
+        exclude = exclude or set()
+        if len(exclude) >= len(self.endpoints):
+            raise RuntimeError("没有可用的 OCR 端点")
+
+        waiter = (PRIORITY_LEVELS.get(priority, PRIORITY_LEVELS[PRIORITY_BULK]), next(self._seq))
+        with self._cond:
+            self._waiters[waiter] = exclude
+            try:
+                while True:
+                    granted, endpoint = self._next_grant()
+                    if granted == waiter:
+                        break
+                    self._cond.wait(timeout=1.0)
+            finally:
+                del self._waiters[waiter]
+                self._cond.notify_all()
+            self._outstanding[endpoint] += 1
+
+        try:
+            yield endpoint
+        finally:
+            with self._cond:
+                self._outstanding[endpoint] -= 1
+                self._cond.notify_all()
+
+    def get_stats(self) -> Dict:
+        """获取端点池状态"""
+        with self._cond:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "waiting": len(self._waiters),
+                "endpoints": [
+                    {
+                        "endpoint": e,
+                        "healthy": self._healthy[e],
+                        "outstanding": self._outstanding[e],
+                        "last_check": self._last_check[e],
+                    }
+                    for e in self.endpoints
+                ],
+            }
+
+
+# 全局端点池注册表（同一组端点的所有客户端共享在途计数和优先级队列）
+_pools: Dict[tuple, EndpointPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_endpoint_pool(endpoints: List[str], **kwargs) -> EndpointPool:
+    """获取（或创建）指定端点集合的共享端点池"""
+    key = tuple(endpoints)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = EndpointPool(list(endpoints), **kwargs)
+        return _pools[key]
@@ -0,0 +1,56 @@
+"""
+Page Lookup
+
+索引的页面查找表：
+- frame_num → 页面元数据（字典，O(1)）
+- page_num → 章节（把目录展开为互不重叠的页码区间，二分查找 O(log C)）
+
+查找表由 metadata 派生，不写入索引文件，加载时重建
+"""
+
+from bisect import bisect_right
+from typing import Dict, List
+
+
+class ChapterLookup:
+    """
+    章节区间查找
+
+    每个章节覆盖 [最小页码, 最大页码]；区间重叠时按目录顺序取第一个章节，
+    与逐章扫描的结果一致
+    """
+
+    def __init__(self, toc: Dict[str, List[int]]):
+        """
+        Args:
+            toc: {章节名: [页码列表]}（按目录顺序）
+        """
+        ranges = [
+            (min(pages), max(pages), chapter)
+            for chapter, pages in toc.items()
+            if pages
+        ]
+
+        # 区间端点把页码轴切成若干基本区间，每个基本区间内的归属章节相同
+        boundaries = sorted({start for start, _, _ in ranges} | {end + 1 for _, end, _ in ranges})
+        self._starts: List[int] = []
+        self._chapters: List[str] = []
+        for start in boundaries:
+            chapter = next((c for lo, hi, c in ranges if lo <= start <= hi), "")
+            if self._chapters and self._chapters[-1] == chapter:
+                continue
+            self._starts.append(start)
+            self._chapters.append(chapter)
+
+    def find(self, page_num: int) -> str:
+        """查找页面所属章节（不属于任何章节时返回空字符串）"""
+        pos = bisect_right(self._starts, page_num) - 1
+        return self._chapters[pos] if pos >= 0 else ""
+
+
+def build_frame_lookup(pages: List[Dict]) -> Dict[int, Dict]:
+    """构建 frame_num → 页面元数据（帧号重复时保留第一个，与线性查找一致）"""
+    lookup: Dict[int, Dict] = {}
+    for page in pages:
+        lookup.setdefault(page["frame_num"], page)
+    return lookup
@@ -113,7 +113,7 @@ class VisualMemvidEncoder:
             text_preview = page.get_text()[:500]  # 仅前 500 字符用于关键词提取
 
             # 查找所属章节
-            chapter = self._find_chapter(page_num + 1, toc)
+            chapter = self.index.get_chapter(page_num + 1)
 
             # 添加到索引（移除了 has_table/has_formula/has_image，依赖 OCR Summary）
             self.index.add_page(
@@ -162,17 +162,10 @@ class VisualMemvidEncoder:
                 toc_dict[current_chapter].append(page)
         
         # 更新索引的目录
-        self.index.metadata["toc"] = toc_dict
+        self.index.set_toc(toc_dict)
         
         return toc_dict
     
-    def _find_chapter(self, page_num: int, toc: Dict[str, List[int]]) -> str:
-        """查找页面所属章节"""
-        for chapter, pages in toc.items():
-            if page_num in pages or (pages and min(pages) <= page_num <= max(pages)):
-                return chapter
-        return ""
-    
     # 移除了 _detect_table, _detect_formula, _detect_image 方法
     # 这些检测会严重拖慢上传速度，且与 OCR Summary 重复
     # 如需判断页面内容，应该在检索时使用 OCR Summary
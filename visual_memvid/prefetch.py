@@ -0,0 +1,187 @@
+"""
+Page Prefetcher
+
+推测式预取：前台 OCR 完成后，在后台以最低优先级 OCR 相邻页面并写入 OCRCache，
+Agent 的下一次翻页请求即可直接命中缓存。
+
+- 预取只在 prefetch_session() 范围内进行（一次 Agent 请求一个会话）
+- 每个会话有页数预算，会话结束时取消尚未开始的预取任务
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+import logging
+
+from .config import CONFIG
+from .ocr_pool import PRIORITY_BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+
+class PrefetchSession:
+    """
+    预取会话
+
+    记录本次请求已调度的页面、剩余预算和尚未完成的任务
+    """
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.scheduled: Set[Tuple[str, int]] = set()
+        self.futures: List[Future] = []
+        self.completed = 0
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def reserve(self, key: Tuple[str, int]) -> bool:
+        """占用一个预算名额（同一页只预取一次）"""
+        with self._lock:
+            if self.cancelled.is_set() or key in self.scheduled or len(self.scheduled) >= self.budget:
+                return False
+            self.scheduled.add(key)
+            return True
+
+    def cancel(self):
+        """取消尚未开始的预取任务（已发出的 OCR 请求会正常完成并写入缓存）"""
+        self.cancelled.set()
+        with self._lock:
+            cancelled = sum(1 for f in self.futures if f.cancel())
+        if self.scheduled:
+            logger.info(
+                f"🛑 预取会话结束: 调度 {len(self.scheduled)} 页，完成 {self.completed} 页，取消 {cancelled} 页"
+            )
+
+
+_current_session: ContextVar[Optional[PrefetchSession]] = ContextVar("prefetch_session", default=None)
+
+
+class PagePrefetcher:
+    """
+    相邻页面预取器
+
+    使用少量后台线程执行预取，OCR 请求走 background 优先级通道，不与交互式查询争抢端点
+    """
+
+    def __init__(
+        self,
+        pages_ahead: int = 2,
+        pages_behind: int = 1,
+        max_workers: int = 2
+    ):
+        self.pages_ahead = pages_ahead
+        self.pages_behind = pages_behind
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ocr-prefetch")
+
+    def neighbours(self, frame_nums: Iterable[int], total_pages: int) -> List[int]:
+        """
+        计算待预取的相邻帧（先向后翻页，再向前翻页，由近及远）
+
+        Args:
+            frame_nums: 刚刚 OCR 过的帧号
+            total_pages: 文档总页数
+
+        Returns:
+            帧号列表（不包含 frame_nums 本身）
+        """
+        requested = set(frame_nums)
+        candidates: List[int] = []
+        for distance in range(1, max(self.pages_ahead, self.pages_behind) + 1):
+            if distance <= self.pages_ahead:
+                candidates.extend(f + distance for f in sorted(requested))
+            if distance <= self.pages_behind:
+                candidates.extend(f - distance for f in sorted(requested))
+
+        neighbours: List[int] = []
+        for frame_num in candidates:
+            if 0 <= frame_num < total_pages and frame_num not in requested and frame_num not in neighbours:
+                neighbours.append(frame_num)
+        return neighbours
+
+    def schedule(self, retriever, frame_nums: Iterable[int]) -> int:
+        """
+        为当前会话调度相邻页面预取
+
+        Args:
+            retriever: VisualMemvidRetriever（提供 ocr_frame 和 frame_count）
+            frame_nums: 刚刚 OCR 过的帧号
+
+        Returns:
+            本次调度的页数（没有活动会话或预算用尽时为 0）
+        """
+        session = _current_session.get()
+        if session is None or session.cancelled.is_set():
+            return 0
+
+        video_key = str(retriever.video_path)
+        scheduled = 0
+        # 用视频帧数限定范围，不为预取加载检索索引
+        for frame_num in self.neighbours(frame_nums, retriever.frame_count):
+            if not session.reserve((video_key, frame_num)):
+                continue
+            future = self._executor.submit(self._prefetch, session, retriever, frame_num)
+            with session._lock:
+                session.futures.append(future)
+            scheduled += 1
+
+        if scheduled:
+            logger.debug(f"📥 已调度预取 {scheduled} 页 (剩余预算 {session.budget - len(session.scheduled)})")
+        return scheduled
+
+    @staticmethod
+    def _prefetch(session: PrefetchSession, retriever, frame_num: int):
+        if session.cancelled.is_set():
+            return
+        try:
+            result = retriever.ocr_frame(frame_num, priority=PRIORITY_BACKGROUND)
+            if result.get("success"):
+                session.completed += 1
+                if not result.get("from_cache"):
+                    logger.debug(f"📥 预取完成: 第 {frame_num + 1} 页")
+        except Exception as e:
+            logger.debug(f"预取失败: 第 {frame_num + 1} 页: {e}")
+
+
+_prefetcher: Optional[PagePrefetcher] = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher() -> Optional[PagePrefetcher]:
+    """获取全局预取器（配置中禁用时返回 None）"""
+    global _prefetcher
+    prefetch_config = CONFIG.get("prefetch", {})
+    if not prefetch_config.get("enabled", False):
+        return None
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = PagePrefetcher(
+                pages_ahead=prefetch_config.get("pages_ahead", 2),
+                pages_behind=prefetch_config.get("pages_behind", 1),
+                max_workers=prefetch_config.get("max_workers", 2)
+            )
+        return _prefetcher
+
+
+@contextmanager
+def prefetch_session(budget: Optional[int] = None) -> Iterator[PrefetchSession]:
+    """
+    预取会话（通常包住一次完整的 Agent 请求）
+
+    Args:
+        budget: 本次请求最多预取的页数，默认从配置读取
+
+    用法：
+        with prefetch_session():
+            result = await agent.ainvoke(...)
+    """
+    if budget is None:
+        budget = CONFIG.get("prefetch", {}).get("budget_per_query", 6)
+    session = PrefetchSession(budget)
+    token = _current_session.set(session)
+    try:
+        yield session
+    finally:
+        _current_session.reset(token)
+        session.cancel()
@@ -0,0 +1,310 @@
+"""
+OCR Prewarm Scheduler
+
+入库预热：对预计会被频繁查询的文档，在夜间低峰时段对每一页执行全页 Markdown OCR，
+结果写入 OCRCache，查询时第三层 OCR 直接命中缓存。
+
+- 只在配置的时间窗口内运行（如 01:00-06:00），窗口关闭时暂停，下次窗口继续
+- OCR 并发上限可配置，请求走 background 优先级通道
+- 任务队列持久化到缓存目录，服务重启后继续
+"""
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+import logging
+
+import cv2
+
+from .config import CONFIG
+from .ocr_cache import OCRCache
+from .ocr_pool import PRIORITY_BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+
+def parse_window(window: str) -> Optional[tuple]:
+    """
+    解析时间窗口 "HH:MM-HH:MM"
+
+    Returns:
+        (开始分钟数, 结束分钟数)，空字符串返回 None（表示随时可运行）
+    """
+    if not window or not window.strip():
+        return None
+    start, end = window.split("-")
+    to_minutes = lambda s: int(s.split(":")[0]) * 60 + int(s.split(":")[1])
+    return to_minutes(start.strip()), to_minutes(end.strip())
+
+
+def in_window(window: Optional[tuple], now: Optional[datetime] = None) -> bool:
+    """当前时间是否在窗口内（支持跨午夜，如 22:00-06:00）"""
+    if window is None:
+        return True
+    now = now or datetime.now()
+    minutes = now.hour * 60 + now.minute
+    start, end = window
+    if start <= end:
+        return start <= minutes < end
+    return minutes >= start or minutes < end
+
+
+class PrewarmScheduler:
+    """
+    OCR 预热调度器
+
+    后台线程按入队顺序处理文档；每个文档逐页解码视频帧，跳过已缓存的页面，
+    其余页面以不超过 max_concurrency 的并发提交 OCR
+    """
+
+    STATE_FILE = "prewarm_jobs.json"
+
+    def __init__(
+        self,
+        ocr_client=None,
+        ocr_endpoint: Optional[str] = None,
+        window: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        cache: Optional[OCRCache] = None
+    ):
+        """
+        初始化调度器
+
+        Args:
+            ocr_client: OCR 客户端（默认在首次运行时创建 background 通道的 DeepSeekOCRClient）
+            ocr_endpoint: 延迟创建 OCR 客户端时使用的服务地址，默认从配置读取
+            window: 运行时间窗口 "HH:MM-HH:MM"，默认从配置读取
+            max_concurrency: OCR 并发上限，默认从配置读取
+            poll_interval: 窗口外 / 队列为空时的检查间隔（秒）
+            cache: OCR 缓存，默认创建
+        """
+        prewarm_config = CONFIG.get("prewarm", {})
+        self.window = parse_window(prewarm_config.get("window", "") if window is None else window)
+        self.max_concurrency = max(1, max_concurrency or prewarm_config.get("max_concurrency", 1))
+        self.poll_interval = poll_interval or prewarm_config.get("poll_interval", 60)
+
+        self.cache = cache or OCRCache()
+        self._ocr_client = ocr_client
+        self._ocr_endpoint = ocr_endpoint
+        self.state_path = self.cache.cache_dir / self.STATE_FILE
+
+        self.jobs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._load_state()
+
+    # ==================== 任务队列 ====================
+
+    def _load_state(self):
+        if not self.state_path.exists():
+            return
+        try:
+            with self.state_path.open('r', encoding='utf-8') as f:
+                jobs = json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ 读取预热任务失败: {e}")
+            return
+        for job in jobs:
+            # 上次运行中断的任务重新排队（已完成的页面会命中缓存）
+            if job["status"] == "running":
+                job["status"] = "pending"
+            self.jobs[job["doc_id"]] = job
+
+    def _save_state(self):
+        """保存任务队列（调用方持有锁）"""
+        tmp_path = self.state_path.with_suffix(".tmp")
+        with tmp_path.open('w', encoding='utf-8') as f:
+            json.dump(list(self.jobs.values()), f, ensure_ascii=False, indent=2)
+        tmp_path.replace(self.state_path)
+
+    def enqueue(self, doc_id: str, video_path: str, reason: str = "upload") -> Dict:
+        """
+        加入预热队列（同一文档重复入队会重新排队；任务正在运行时返回当前任务，不重复入队）
+
+        Args:
+            doc_id: 文档 ID
+            video_path: 视频文件路径
+            reason: 入队原因（upload / category / manual）
+
+        Returns:
+            任务信息
+        """
+        with self._lock:
+            running = self.jobs.get(doc_id)
+            if running is not None and running["status"] == "running":
+                # 工作线程持有并更新这个任务对象，替换后状态查询会读到过期数据
+                logger.info(f"🔥 文档正在预热，忽略重复入队: {doc_id}")
+                return dict(running)
+
+            job = {
+                "doc_id": doc_id,
+                "video_path": str(video_path),
+                "reason": reason,
+                "status": "pending",
+                "total_pages": None,
+                "cached_pages": 0,
+                "ocr_pages": 0,
+                "failed_pages": 0,
+                "enqueued_at": datetime.now().isoformat(),
+                "finished_at": None,
+            }
+            self.jobs[doc_id] = job
+            self._save_state()
+
+        logger.info(f"🔥 已加入 OCR 预热队列: {doc_id} ({reason})")
+        self._wakeup.set()
+        return dict(job)
+
+    def get_status(self) -> Dict:
+        """获取调度器状态和任务列表"""
+        with self._lock:
+            jobs = [dict(job) for job in self.jobs.values()]
+        return {
+            "window": CONFIG.get("prewarm", {}).get("window", ""),
+            "in_window": in_window(self.window),
+            "max_concurrency": self.max_concurrency,
+            "pending": sum(1 for j in jobs if j["status"] == "pending"),
+            "jobs": jobs,
+        }
+
+    def _next_job(self) -> Optional[Dict]:
+        with self._lock:
+            for job in self.jobs.values():
+                if job["status"] == "pending":
+                    job["status"] = "running"
+                    self._save_state()
+                    return job
+        return None
+
+    # ==================== 执行 ====================
+
+    @property
+    def ocr_client(self):
+        if self._ocr_client is None:
+            from .ocr_client import DeepSeekOCRClient
+            self._ocr_client = DeepSeekOCRClient(
+                endpoint=self._ocr_endpoint,
+                default_priority=PRIORITY_BACKGROUND
+            )
+        return self._ocr_client
+
+    def start(self):
+        """启动后台调度线程"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="ocr-prewarm", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止调度（正在处理的页面完成后退出）"""
+        self._stop_event.set()
+        self._wakeup.set()
+
+    def _loop(self):
+        while not self._stop_event.is_set():
+            job = self._next_job() if in_window(self.window) else None
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            try:
+                self._run_job(job)
+            except Exception as e:
+                logger.error(f"❌ OCR 预热失败: {job['doc_id']}: {e}")
+                with self._lock:
+                    job["status"] = "failed"
+                    job["finished_at"] = datetime.now().isoformat()
+                    self._save_state()
+
+    def _run_job(self, job: Dict):
+        video_path = Path(job["video_path"])
+        if not video_path.exists():
+            raise FileNotFoundError(f"视频文件不存在: {video_path}")
+
+        fingerprint = self.ocr_client.cache_fingerprint()
+        cap = cv2.VideoCapture(str(video_path))
+        total_pages = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cached = self.cache.get_many(str(video_path), range(total_pages), fingerprint)
+
+        with self._lock:
+            job["total_pages"] = total_pages
+            job["cached_pages"] = len(cached)
+            self._save_state()
+
+        logger.info(
+            f"🔥 开始 OCR 预热: {job['doc_id']}，共 {total_pages} 页，"
+            f"已缓存 {len(cached)} 页，并发 {self.max_concurrency}"
+        )
+
+        # 限制已解码但未完成 OCR 的帧数，避免占用过多内存
+        slots = threading.BoundedSemaphore(self.max_concurrency * 2)
+        paused = False
+
+        def ocr_page(frame_num: int, frame):
+            try:
+                result = self.ocr_client.ocr_image(frame, priority=PRIORITY_BACKGROUND)
+                success = result.get("success", False)
+                if success:
+                    self.cache.set(str(video_path), frame_num, result.get("text", ""), fingerprint)
+                with self._lock:
+                    job["ocr_pages" if success else "failed_pages"] += 1
+            finally:
+                slots.release()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="ocr-prewarm-worker") as executor:
+                for frame_num in range(total_pages):
+                    if frame_num in cached:
+                        cap.grab()
+                        continue
+                    if self._stop_event.is_set() or not in_window(self.window):
+                        paused = True
+                        break
+                    ret, frame = cap.read()
+                    if not ret:
+                        with self._lock:
+                            job["failed_pages"] += 1
+                        continue
+                    slots.acquire()
+                    executor.submit(ocr_page, frame_num, frame)
+        finally:
+            cap.release()
+
+        with self._lock:
+            if paused:
+                job["status"] = "pending"
+                logger.info(f"⏸️ OCR 预热暂停（不在时间窗口内）: {job['doc_id']}，已完成 {job['ocr_pages']} 页")
+            else:
+                job["status"] = "done"
+                job["finished_at"] = datetime.now().isoformat()
+                logger.info(
+                    f"✅ OCR 预热完成: {job['doc_id']}，OCR {job['ocr_pages']} 页，"
+                    f"失败 {job['failed_pages']} 页"
+                )
+            self._save_state()
+
+
+_scheduler: Optional[PrewarmScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_prewarm_scheduler(ocr_client=None, ocr_endpoint: Optional[str] = None) -> PrewarmScheduler:
+    """获取（并启动）全局预热调度器（参数只在首次创建时生效）"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = PrewarmScheduler(ocr_client=ocr_client, ocr_endpoint=ocr_endpoint)
+            _scheduler.start()
+        return _scheduler
+
+
+def should_prewarm(category: Optional[str]) -> bool:
+    """该分类是否配置为入库时自动预热"""
+    return bool(category) and category in CONFIG.get("prewarm", {}).get("categories", [])
@@ -0,0 +1,80 @@
+"""
+Query Result Cache
+
+检索结果缓存：Agent 循环和前端经常重复发出几乎相同的查询，
+以 (索引版本, 归一化后的查询词多重集合, top_k, ...) 为键缓存检索结果。
+
+- 索引重建 / 增量更新后版本号变化，旧结果自然失效
+- LRU 淘汰，条目数有上限
+- 记录命中率，判断缓存是否值得
+"""
+
+import copy
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from .config import CONFIG
+
+
+class QueryResultCache:
+    """有界 LRU 检索结果缓存（线程安全）"""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        """
+        Args:
+            max_entries: 最多缓存的查询数，默认从配置读取
+        """
+        self.max_entries = max_entries or CONFIG.get("query_cache", {}).get("max_entries", 256)
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """读取缓存（返回副本，调用方可以自由修改）"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(value)
+
+    def set(self, key: Hashable, value: Any):
+        """写入缓存（保存副本）"""
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """清空缓存（保留统计数据）"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """命中率统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+def create_query_cache() -> Optional[QueryResultCache]:
+    """按配置创建检索结果缓存（禁用时返回 None）"""
+    cache_config = CONFIG.get("query_cache", {})
+    if not cache_config.get("enabled", True):
+        return None
+    return QueryResultCache(cache_config.get("max_entries", 256))
@@ -0,0 +1,363 @@
+"""
+Provider Resilience
+
+OCR / VLM 服务调用的统一容错层：
+- 令牌桶限流（每个 provider 独立）
+- 指数退避 + 随机抖动重试（优先遵循 Retry-After）
+- 熔断器（连续失败后快速失败，半开探测恢复）
+- 每个 provider 的健康指标
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+import logging
+
+import requests
+
+from .config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+# 可重试的 HTTP 状态码
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class TransientError(Exception):
+    """可重试的瞬时错误（例如 HTTP 429 / 502）"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求被直接拒绝"""
+
+    def __init__(self, provider: str, retry_in: float):
+        super().__init__(f"{provider} 熔断中，{retry_in:.1f} 秒后重试")
+        self.provider = provider
+        self.retry_in = retry_in
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    解析 Retry-After 头
+
+    支持秒数（"120"）和 HTTP 日期两种格式
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_after_from_exception(exc: Exception) -> Optional[float]:
+    """从异常中提取 Retry-After（兼容 TransientError 和 openai 的 APIStatusError）"""
+    retry_after = getattr(exc, "retry_after", None)
+    if retry_after is not None:
+        return retry_after
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        return parse_retry_after(headers.get("retry-after") or headers.get("Retry-After"))
+    return None
+
+
+def is_retryable(exc: Exception) -> bool:
+    """判断异常是否可重试"""
+    if isinstance(exc, TransientError):
+        return True
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)):
+        return True
+    # openai 异常（避免在此处强依赖 openai）
+    if type(exc).__name__ in ("APIConnectionError", "APITimeoutError"):
+        return True
+    status_code = getattr(exc, "status_code", None)
+    return status_code in RETRYABLE_STATUS_CODES
+
+
+class TokenBucket:
+    """
+    令牌桶限流器
+
+    rate 为每秒补充的令牌数，capacity 为突发容量；rate <= 0 表示不限流
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        获取令牌（阻塞直到可用）
+
+        Returns:
+            因限流而等待的秒数
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait_time = (tokens - self._tokens) / self.rate
+            time.sleep(wait_time)
+            waited += wait_time
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    状态：
+    - closed: 正常放行
+    - open: 连续失败达到阈值，直接拒绝，recovery_timeout 秒后进入 half_open
+    - half_open: 放行少量探测请求，成功则关闭，失败则重新打开
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1
+    ):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """是否放行请求"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._half_open_in_flight = 0
+                logger.info("🟡 熔断器进入半开状态，开始探测")
+
+            if self.state == self.HALF_OPEN:
+                if self._half_open_in_flight >= self.half_open_max_calls:
+                    return False
+                self._half_open_in_flight += 1
+
+            return True
+
+    def retry_in(self) -> float:
+        """距离下一次允许探测的秒数"""
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                logger.info("🟢 探测成功，熔断器关闭")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._half_open_in_flight = 0
+
+    def record_ignored(self):
+        """结果不反映服务健康状况（如 400 等客户端错误）：不改变状态，只释放半开探测名额"""
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._half_open_in_flight > 0:
+                self._half_open_in_flight -= 1
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"🔴 熔断器打开: 连续失败 {self.consecutive_failures} 次")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._half_open_in_flight = 0
+
+
+class ProviderResilience:
+    """
+    单个 provider 的容错策略（限流 + 重试 + 熔断 + 指标）
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_retries: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        rate_limit: float = 0.0,
+        burst: Optional[float] = None,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1
+    ):
+        self.name = name
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.rate_limiter = TokenBucket(rate_limit, burst)
+        self.breaker = CircuitBreaker(failure_threshold, recovery_timeout, half_open_max_calls)
+
+        self._metrics_lock = threading.Lock()
+        self.metrics = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "rejected": 0,
+            "throttled_seconds": 0.0,
+            "total_latency": 0.0,
+            "last_error": None,
+            "last_failure_at": None,
+            "last_success_at": None,
+        }
+
+    def _incr(self, key: str, value: float = 1):
+        with self._metrics_lock:
+            self.metrics[key] += value
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[float]) -> float:
+        """计算第 attempt 次重试前的等待时间（full jitter，Retry-After 优先）"""
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        exp_delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(0, exp_delay)
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        在容错策略下调用 func
+
+        Raises:
+            CircuitOpenError: 熔断器打开
+            Exception: 不可重试的错误，或重试耗尽后的最后一个错误
+        """
+        attempt = 0
+        while True:
+            if not self.breaker.allow_request():
+                self._incr("rejected")
+                raise CircuitOpenError(self.name, self.breaker.retry_in())
+
+            throttled = self.rate_limiter.acquire()
+            if throttled:
+                self._incr("throttled_seconds", throttled)
+
+            self._incr("calls")
+            start_time = time.monotonic()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self._incr("total_latency", time.monotonic() - start_time)
+                retryable = is_retryable(e)
+                with self._metrics_lock:
+                    self.metrics["failures"] += 1
+                    self.metrics["last_error"] = str(e)[:200]
+                    self.metrics["last_failure_at"] = time.time()
+
+                if not retryable:
+                    # 非瞬时错误（如 400）不说明服务是否正常，不改变熔断状态
+                    self.breaker.record_ignored()
+                    raise
+
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+
+                delay = self._backoff_delay(attempt, _retry_after_from_exception(e))
+                attempt += 1
+                self._incr("retries")
+                logger.warning(
+                    f"⚠️ {self.name} 瞬时错误，{delay:.1f} 秒后重试 "
+                    f"({attempt}/{self.max_retries}): {e}"
+                )
+                time.sleep(delay)
+                continue
+
+            self._incr("total_latency", time.monotonic() - start_time)
+            with self._metrics_lock:
+                self.metrics["successes"] += 1
+                self.metrics["last_success_at"] = time.time()
+            self.breaker.record_success()
+            return result
+
+    def get_health(self) -> Dict[str, Any]:
+        """获取健康指标"""
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        calls = metrics.pop("calls")
+        total_latency = metrics.pop("total_latency")
+        return {
+            "provider": self.name,
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "retry_in": self.breaker.retry_in(),
+            "calls": calls,
+            "success_rate": metrics["successes"] / calls if calls else None,
+            "avg_latency": total_latency / calls if calls else None,
+            **metrics,
+        }
+
+
+# 全局 provider 注册表
+_registry: Dict[str, ProviderResilience] = {}
+_registry_lock = threading.Lock()
+
+
+def _provider_settings(name: str) -> Dict[str, Any]:
+    """合并默认配置和 provider 专属配置（按完整名称或 ':' 前缀匹配）"""
+    resilience_config = CONFIG.get("resilience", {})
+    settings = {k: v for k, v in resilience_config.items() if k != "providers"}
+    overrides = resilience_config.get("providers", {})
+    prefix = name.split(":", 1)[0]
+    settings.update(overrides.get(prefix, {}))
+    settings.update(overrides.get(name, {}))
+    return settings
+
+
+def get_resilience(name: str) -> ProviderResilience:
+    """获取（或创建）指定 provider 的容错策略"""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = ProviderResilience(name, **_provider_settings(name))
+        return _registry[name]
+
+
+def get_providers_health() -> Dict[str, Dict[str, Any]]:
+    """获取所有 provider 的健康指标"""
+    with _registry_lock:
+        providers = list(_registry.values())
+    return {p.name: p.get_health() for p in providers}
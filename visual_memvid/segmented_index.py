@@ -0,0 +1,442 @@
+"""
+Segmented BM25S Index
+
+增量维护的全库索引：
+- 新文档写入新的小段（每段是一个独立的 GlobalBM25SIndex），不重新索引已有文档
+- 删除文档只记录墓碑（按段记录 doc_id），查询时通过 weight_mask 过滤
+- 后台合并把多个段和墓碑压缩成一个新段
+- 每次变更生成新的不可变快照并原子替换，查询全程使用开始时取到的快照，
+  合并进行中的查询不受影响
+
+注意：BM25 的 IDF / 平均文档长度按段统计，各段得分只是近似可比；
+合并为单段后与全量重建的得分一致。
+"""
+
+import json
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+import logging
+
+from .config import CONFIG
+from .global_index import GlobalBM25SIndex, build_global_index, rank_results
+from .query_cache import create_query_cache
+
+logger = logging.getLogger(__name__)
+
+
+class IndexSnapshot:
+    """
+    索引快照（不可变）
+
+    segments: ((段名, 段索引), ...)
+    tombstones: {段名: 该段中已删除的 doc_id}
+    """
+
+    __slots__ = ("generation", "segments", "tombstones")
+
+    def __init__(
+        self,
+        generation: int,
+        segments: Tuple[Tuple[str, GlobalBM25SIndex], ...],
+        tombstones: Dict[str, FrozenSet[str]]
+    ):
+        self.generation = generation
+        self.segments = segments
+        self.tombstones = tombstones
+
+    def live_document_ids(self) -> List[str]:
+        """未删除的文档 ID"""
+        doc_ids = set()
+        for name, segment in self.segments:
+            doc_ids.update(set(segment.get_document_ids()) - self.tombstones.get(name, frozenset()))
+        return sorted(doc_ids)
+
+    def page_counts(self) -> Tuple[int, int]:
+        """(总页数, 已删除页数)"""
+        total = deleted = 0
+        for name, segment in self.segments:
+            dead = self.tombstones.get(name, frozenset())
+            for page in segment.metadata["pages"]:
+                total += 1
+                if page.get("doc_id") in dead:
+                    deleted += 1
+        return total, deleted
+
+
+class SegmentedBM25SIndex:
+    """
+    分段 BM25S 索引
+
+    目录结构：
+        index_dir/manifest.json        当前段列表和墓碑
+        index_dir/segments/seg_000001  各段（GlobalBM25SIndex.save 的输出）
+    """
+
+    MANIFEST_FILE = "manifest.json"
+    SEGMENTS_DIR = "segments"
+
+    def __init__(
+        self,
+        index_dir: str,
+        max_segments: Optional[int] = None,
+        merge_deleted_ratio: Optional[float] = None
+    ):
+        """
+        打开（或创建）分段索引
+
+        Args:
+            index_dir: 索引目录
+            max_segments: 段数超过该值时需要合并，默认从配置读取
+            merge_deleted_ratio: 已删除页面占比超过该值时需要合并，默认从配置读取
+        """
+        index_config = CONFIG.get("global_index", {})
+        self.index_dir = Path(index_dir)
+        self.segments_dir = self.index_dir / self.SEGMENTS_DIR
+        self.max_segments = max_segments or index_config.get("max_segments", 8)
+        self.merge_deleted_ratio = merge_deleted_ratio or index_config.get("merge_deleted_ratio", 0.2)
+
+        # 写操作（新增段 / 删除 / 发布合并结果）串行执行；合并本身的构建过程不持有该锁
+        self._write_lock = threading.Lock()
+        self._merge_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._merge_thread: Optional[threading.Thread] = None
+        # 全量重建期间删除的 doc_id（不在重建时为 None）
+        self._rebuild_deletes: Optional[set] = None
+
+        # 检索结果缓存（键包含快照代数，任何写入 / 合并后自动失效）
+        self.query_cache = create_query_cache()
+
+        self._snapshot = IndexSnapshot(0, (), {})
+        self._load()
+
+    # ==================== 持久化 ====================
+
+    def exists(self) -> bool:
+        """磁盘上是否已有清单文件"""
+        return (self.index_dir / self.MANIFEST_FILE).exists()
+
+    def _load(self):
+        manifest_path = self.index_dir / self.MANIFEST_FILE
+        if not manifest_path.exists():
+            return
+
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        segments = []
+        for name in manifest.get("segments", []):
+            segment_dir = self.segments_dir / name
+            try:
+                segments.append((name, GlobalBM25SIndex.load(str(segment_dir), mmap=True)))
+            except Exception as e:
+                logger.error(f"❌ 加载索引段失败 {segment_dir}: {e}")
+                raise
+
+        self._snapshot = IndexSnapshot(
+            manifest.get("generation", 0),
+            tuple(segments),
+            {name: frozenset(doc_ids) for name, doc_ids in manifest.get("tombstones", {}).items()}
+        )
+        self._remove_orphan_segments()
+        logger.info(f"✅ 分段索引已加载: {self.index_dir} ({len(segments)} 段)")
+
+    def _write_manifest(self, snapshot: IndexSnapshot):
+        """原子写入清单（先写临时文件再替换）"""
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        manifest = {
+            "generation": snapshot.generation,
+            "segments": [name for name, _ in snapshot.segments],
+            "tombstones": {
+                name: sorted(doc_ids) for name, doc_ids in snapshot.tombstones.items() if doc_ids
+            },
+        }
+        manifest_path = self.index_dir / self.MANIFEST_FILE
+        tmp_path = manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        tmp_path.replace(manifest_path)
+
+    def _remove_orphan_segments(self):
+        """删除清单中不再引用的段目录（合并或重建后遗留）"""
+        if not self.segments_dir.exists():
+            return
+        live = {name for name, _ in self._snapshot.segments}
+        for segment_dir in self.segments_dir.iterdir():
+            if segment_dir.is_dir() and segment_dir.name not in live:
+                shutil.rmtree(segment_dir, ignore_errors=True)
+
+    def _publish(self, snapshot: IndexSnapshot):
+        """持久化并发布新快照（调用方持有写锁）"""
+        self._write_manifest(snapshot)
+        self._snapshot = snapshot
+
+    def _write_segment(self, index: GlobalBM25SIndex, generation: int) -> Tuple[str, GlobalBM25SIndex]:
+        """保存新段并以 mmap 方式重新加载"""
+        name = f"seg_{generation:06d}"
+        segment_dir = self.segments_dir / name
+        index.save(str(segment_dir))
+        return name, GlobalBM25SIndex.load(str(segment_dir), mmap=True)
+
+    # ==================== 增量更新 ====================
+
+    def add_documents(self, documents: Iterable[Dict]) -> int:
+        """
+        把文档写入一个新段（已存在的同 doc_id 文档会被标记删除）
+
+        Args:
+            documents: [{"doc_id", "title", "category", "summaries", "pdf_path"(可选)}, ...]
+
+        Returns:
+            新段的页面数
+        """
+        documents = list(documents)
+        if not documents:
+            return 0
+
+        # 分词和建索引在锁外进行，不阻塞查询和其他写操作
+        index = build_global_index(documents)
+        if index.retriever is None:
+            return 0
+        doc_ids = set(index.get_document_ids())
+
+        with self._write_lock:
+            current = self._snapshot
+            generation = current.generation + 1
+            segment = self._write_segment(index, generation)
+
+            tombstones = dict(current.tombstones)
+            for name, existing in current.segments:
+                stale = doc_ids & set(existing.get_document_ids())
+                if stale:
+                    tombstones[name] = tombstones.get(name, frozenset()) | stale
+
+            self._publish(IndexSnapshot(generation, current.segments + (segment,), tombstones))
+
+        logger.info(f"➕ 新增索引段 {segment[0]}: {len(doc_ids)} 个文档, {segment[1].metadata['total_pages']} 页")
+        return segment[1].metadata["total_pages"]
+
+    def delete_document(self, doc_id: str) -> bool:
+        """
+        删除文档（记录墓碑，合并时物理删除）
+
+        Returns:
+            索引中是否存在该文档
+        """
+        with self._write_lock:
+            current = self._snapshot
+            tombstones = dict(current.tombstones)
+            found = False
+            for name, segment in current.segments:
+                dead = tombstones.get(name, frozenset())
+                if doc_id not in dead and doc_id in segment.get_document_ids():
+                    tombstones[name] = dead | {doc_id}
+                    found = True
+            if found:
+                self._publish(IndexSnapshot(current.generation + 1, current.segments, tombstones))
+            if self._rebuild_deletes is not None:
+                # 重建读取文档列表时该文档可能还在，发布重建结果时再删除一次
+                self._rebuild_deletes.add(doc_id)
+
+        if found:
+            logger.info(f"🪦 已标记删除: {doc_id}")
+        return found
+
+    def rebuild(self, documents: Iterable[Dict]) -> int:
+        """
+        全量重建为单个段（替换重建开始时的所有段和墓碑）
+
+        重建期间持有合并锁，新段在写锁外构建；发布时，重建期间新增的段原样保留，
+        重建期间删除的文档和被新增段覆盖的文档在重建段上标记删除
+
+        Returns:
+            页面数
+        """
+        with self._merge_lock:
+            with self._write_lock:
+                base = self._snapshot
+                self._rebuild_deletes = set()
+            try:
+                index = build_global_index(documents)
+
+                with self._write_lock:
+                    current = self._snapshot
+                    generation = current.generation + 1
+                    base_names = {name for name, _ in base.segments}
+                    late_segments = tuple(seg for seg in current.segments if seg[0] not in base_names)
+                    tombstones = {
+                        name: doc_ids for name, doc_ids in current.tombstones.items() if name not in base_names
+                    }
+
+                    dead = set(self._rebuild_deletes)
+                    for _, segment in late_segments:
+                        dead.update(segment.get_document_ids())
+
+                    segments = late_segments
+                    if index.retriever is not None:
+                        rebuilt = self._write_segment(index, generation)
+                        segments = (rebuilt,) + late_segments
+                        dead &= set(index.get_document_ids())
+                        if dead:
+                            tombstones[rebuilt[0]] = frozenset(dead)
+                    self._publish(IndexSnapshot(generation, segments, tombstones))
+                    self._remove_orphan_segments()
+            finally:
+                with self._write_lock:
+                    self._rebuild_deletes = None
+
+        return index.metadata["total_pages"]
+
+    # ==================== 合并 ====================
+
+    def needs_merge(self) -> bool:
+        """段数或已删除页面占比超过阈值"""
+        snapshot = self._snapshot
+        if len(snapshot.segments) > self.max_segments:
+            return True
+        total, deleted = snapshot.page_counts()
+        return total > 0 and deleted / total > self.merge_deleted_ratio
+
+    def merge(self) -> bool:
+        """
+        把当前所有段合并为一个段，并物理删除已标记删除的文档
+
+        合并基于开始时的快照在锁外构建；发布时，合并期间新增的段原样保留，
+        合并期间对旧段新增的墓碑转移到合并后的段上
+
+        Returns:
+            是否执行了合并
+        """
+        with self._merge_lock:
+            base = self._snapshot
+            if len(base.segments) <= 1 and not any(base.tombstones.values()):
+                return False
+
+            merged = GlobalBM25SIndex()
+            for name, segment in base.segments:
+                dead = base.tombstones.get(name, frozenset())
+                for record in segment.iter_records(str(self.segments_dir / name)):
+                    if record.get("doc_id") not in dead:
+                        merged.add_record(record)
+            if merged.metadata["pages"]:
+                merged.build_index()
+
+            with self._write_lock:
+                current = self._snapshot
+                generation = current.generation + 1
+                merged_names = {name for name, _ in base.segments}
+
+                # 合并期间对旧段新增的删除
+                late_deletes = set()
+                for name in merged_names:
+                    late_deletes |= current.tombstones.get(name, frozenset()) - base.tombstones.get(name, frozenset())
+
+                tombstones = {
+                    name: doc_ids for name, doc_ids in current.tombstones.items() if name not in merged_names
+                }
+                segments = tuple(seg for seg in current.segments if seg[0] not in merged_names)
+                if merged.retriever is not None:
+                    merged_segment = self._write_segment(merged, generation)
+                    segments = (merged_segment,) + segments
+                    if late_deletes:
+                        tombstones[merged_segment[0]] = frozenset(late_deletes)
+
+                self._publish(IndexSnapshot(generation, segments, tombstones))
+                self._remove_orphan_segments()
+
+        logger.info(f"🧹 索引段合并完成: {len(base.segments)} 段 → {len(segments)} 段")
+        return True
+
+    def start_background_merge(self, interval: Optional[float] = None):
+        """启动后台合并线程，定期检查并在需要时合并"""
+        if self._merge_thread is not None:
+            return
+        interval = interval or CONFIG.get("global_index", {}).get("merge_interval", 60)
+
+        def _loop():
+            while not self._stop_event.wait(interval):
+                try:
+                    if self.needs_merge():
+                        self.merge()
+                except Exception as e:
+                    logger.error(f"❌ 索引段合并失败: {e}", exc_info=True)
+
+        self._merge_thread = threading.Thread(target=_loop, name="global-index-merge", daemon=True)
+        self._merge_thread.start()
+
+    def stop(self):
+        """停止后台合并线程"""
+        self._stop_event.set()
+
+    # ==================== 查询 ====================
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        category: Optional[str] = None,
+        doc_ids: Optional[Iterable[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        在当前快照上检索（各段取 top_k 后按得分合并）
+
+        Args:
+            query: 查询文本
+            top_k: 返回页面数
+            category: 只检索该分类（可选）
+            doc_ids: 只检索这些文档（可选）
+
+        Returns:
+            与 GlobalBM25SIndex.search 相同格式的页面列表
+        """
+        snapshot = self._snapshot
+        doc_ids = list(doc_ids) if doc_ids else None
+        if not snapshot.segments:
+            return []
+
+        cache_key = None
+        if self.query_cache is not None:
+            cache_key = (
+                snapshot.generation,
+                snapshot.segments[0][1].normalize_query(query),
+                top_k,
+                category,
+                tuple(sorted(doc_ids)) if doc_ids else None,
+            )
+            cached = self.query_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        results: List[Dict[str, Any]] = []
+        for name, segment in snapshot.segments:
+            results.extend(segment.search(
+                query,
+                top_k=top_k,
+                category=category,
+                doc_ids=doc_ids,
+                exclude_doc_ids=snapshot.tombstones.get(name)
+            ))
+
+        results = rank_results(results)[:top_k]
+        if cache_key is not None:
+            self.query_cache.set(cache_key, results)
+        return results
+
+    def get_document_ids(self) -> List[str]:
+        """索引中未删除的文档 ID"""
+        return self._snapshot.live_document_ids()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """索引状态（段数、页数、已删除页数）"""
+        snapshot = self._snapshot
+        total, deleted = snapshot.page_counts()
+        return {
+            "generation": snapshot.generation,
+            "segments": len(snapshot.segments),
+            "documents": len(snapshot.live_document_ids()),
+            "pages": total - deleted,
+            "deleted_pages": deleted,
+            "needs_merge": self.needs_merge(),
+            "query_cache": self.query_cache.get_stats() if self.query_cache is not None else None,
+        }
@@ -0,0 +1,232 @@
+"""
+Summary Binary File
+
+summaries.json 是带缩进的完整 JSON，读取一页也要解析整个文件。
+summaries.bin 按页存储压缩记录，并在文件头保存页码 → 偏移量索引，通过 mmap 按需读取单页。
+
+文件布局（小端）：
+    header   : magic(8s) | page_count(u32) | toc_length(u32)
+    index    : page_count × [page_num(i32) | offset(u64) | length(u32)]
+    toc      : zlib(JSON [[page_num, page_summary], ...])     目录列（不解压页面记录即可列出目录）
+    records  : zlib(JSON 页面记录) × page_count                  按原顺序排列
+
+命令行：
+    python -m visual_memvid.summary_file convert data/summaries        # 转换目录下所有 summaries.json
+    python -m visual_memvid.summary_file export summaries.bin out.json  # 导出为 JSON
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+MAGIC = b"DKRSUM\x00\x01"
+HEADER = struct.Struct("<8sII")
+INDEX_ENTRY = struct.Struct("<iQI")
+BINARY_SUFFIX = ".bin"
+
+
+def _compress(obj: Any) -> bytes:
+    return zlib.compress(json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def _decompress(data: bytes) -> Any:
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+def write_summary_file(pages: List[Dict[str, Any]], path: Union[str, Path]) -> Path:
+    """
+    写入二进制 Summary 文件（先写临时文件再原子替换）
+
+    Args:
+        pages: 页面记录列表（与 summaries.json 内容相同）
+        path: 输出路径
+
+    Returns:
+        输出路径
+    """
+    path = Path(path)
+    records = [_compress(page) for page in pages]
+    toc = _compress([[page.get("page_num"), page.get("page_summary")] for page in pages])
+
+    offset = HEADER.size + INDEX_ENTRY.size * len(pages) + len(toc)
+    index = bytearray()
+    for page, record in zip(pages, records):
+        page_num = page.get("page_num")
+        # 页码缺失或不是整数的页面只能通过顺序遍历读取
+        index += INDEX_ENTRY.pack(page_num if isinstance(page_num, int) else -1, offset, len(record))
+        offset += len(record)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(pages), len(toc)))
+            f.write(index)
+            f.write(toc)
+            for record in records:
+                f.write(record)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return path
+
+
+class SummaryFile:
+    """
+    二进制 Summary 文件读取器（mmap，按页惰性解压）
+
+    打开时只解析文件头和页码索引；get_page 只解压对应页面的记录
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            magic, page_count, toc_length = HEADER.unpack_from(self._mmap, 0)
+            if magic != MAGIC:
+                raise ValueError(f"不是 Summary 二进制文件: {self.path}")
+
+            index_end = HEADER.size + INDEX_ENTRY.size * page_count
+            self._entries: List[Tuple[int, int, int]] = list(
+                INDEX_ENTRY.iter_unpack(self._mmap[HEADER.size:index_end])
+            )
+            self._toc_span = (index_end, index_end + toc_length)
+
+            # 页码重复时保留第一个，与线性查找一致
+            self._offsets: Dict[int, Tuple[int, int]] = {}
+            for page_num, offset, length in self._entries:
+                if page_num >= 0:
+                    self._offsets.setdefault(page_num, (offset, length))
+        except Exception:
+            self._mmap.close()
+            raise
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def page_nums(self) -> List[int]:
+        return [page_num for page_num, _, _ in self._entries]
+
+    @property
+    def memory_bytes(self) -> int:
+        """常驻内存的大致字节数（页码索引；页面数据在 mmap 中，由操作系统按需换入）"""
+        return INDEX_ENTRY.size * len(self._entries)
+
+    def get_page(self, page_num: int) -> Optional[Dict[str, Any]]:
+        """读取单页记录（页码不存在时返回 None）"""
+        span = self._offsets.get(page_num)
+        if span is None:
+            return None
+        offset, length = span
+        return _decompress(self._mmap[offset:offset + length])
+
+    def iter_pages(self) -> Iterator[Dict[str, Any]]:
+        """按原顺序读取所有页面记录"""
+        for _, offset, length in self._entries:
+            yield _decompress(self._mmap[offset:offset + length])
+
+    def toc(self) -> List[Tuple[Any, Optional[str]]]:
+        """目录列：[(page_num, page_summary)]（不解压页面记录；字段缺失时为 None）"""
+        start, end = self._toc_span
+        return [tuple(item) for item in _decompress(self._mmap[start:end])]
+
+    def close(self):
+        if not self._mmap.closed:
+            self._mmap.close()
+
+
+def convert_summaries(json_path: Union[str, Path], bin_path: Optional[Union[str, Path]] = None) -> Path:
+    """
+    把 summaries.json 转换为二进制格式
+
+    Args:
+        json_path: summaries.json 路径
+        bin_path: 输出路径（默认与 JSON 同目录、同名的 .bin 文件）
+
+    Returns:
+        输出路径
+    """
+    json_path = Path(json_path)
+    with open(json_path, "r", encoding="utf-8") as f:
+        pages = json.load(f)
+    if not isinstance(pages, list):
+        raise ValueError(f"Summary 文件格式不正确: {json_path}")
+    return write_summary_file(pages, bin_path or json_path.with_suffix(BINARY_SUFFIX))
+
+
+def export_json(bin_path: Union[str, Path], json_path: Optional[Union[str, Path]] = None) -> Path:
+    """
+    把二进制 Summary 导出为 JSON（与 summaries.json 格式相同）
+
+    Args:
+        bin_path: summaries.bin 路径
+        json_path: 输出路径（默认同目录、同名的 .json 文件）
+
+    Returns:
+        输出路径
+    """
+    bin_path = Path(bin_path)
+    json_path = Path(json_path) if json_path else bin_path.with_suffix(".json")
+    with SummaryFile(bin_path) as summary_file:
+        pages = list(summary_file.iter_pages())
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(pages, f, ensure_ascii=False, indent=2)
+    return json_path
+
+
+def _convert_tree(root: Path, force: bool = False) -> int:
+    """转换目录下所有 summaries.json（已有更新的 .bin 时跳过）"""
+    json_paths = [root] if root.is_file() else sorted(root.rglob("summaries.json"))
+    converted = 0
+    for json_path in json_paths:
+        bin_path = json_path.with_suffix(BINARY_SUFFIX)
+        if not force and bin_path.exists() and bin_path.stat().st_mtime >= json_path.stat().st_mtime:
+            continue
+        try:
+            convert_summaries(json_path, bin_path)
+            converted += 1
+            print(f"✅ {json_path} → {bin_path.name} ({json_path.stat().st_size} → {bin_path.stat().st_size} bytes)")
+        except Exception as e:
+            print(f"❌ {json_path}: {e}")
+    return converted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summary 二进制格式工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = subparsers.add_parser("convert", help="把 summaries.json 转换为 summaries.bin")
+    convert_parser.add_argument("paths", nargs="+", help="summaries.json 文件或包含它们的目录")
+    convert_parser.add_argument("--force", action="store_true", help="重新转换已是最新的文件")
+
+    export_parser = subparsers.add_parser("export", help="把 summaries.bin 导出为 JSON")
+    export_parser.add_argument("bin_path")
+    export_parser.add_argument("json_path", nargs="?")
+
+    args = parser.parse_args()
+    if args.command == "convert":
+        total = sum(_convert_tree(Path(p), force=args.force) for p in args.paths)
+        print(f"共转换 {total} 个文件")
+    else:
+        print(f"✅ 已导出: {export_json(args.bin_path, args.json_path)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,9 @@ Visual Retriever
 视觉检索器：支持自动查看前后页的类人检索
 """
 
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
 import numpy as np
 from typing import List, Dict, Optional, Tuple
@@ -13,6 +16,7 @@ import logging
 from .bm25s_index import BM25SIndex  # 使用新的高性能索引
 from .ocr_client import DeepSeekOCRClient
 from .ocr_cache import OCRCache
+from .prefetch import get_prefetcher
 from .config import CONFIG
 
 logger = logging.getLogger(__name__)
@@ -27,6 +31,7 @@ class VisualMemvidRetriever:
     2. 自动查看前后页（类人阅读行为）
     3. DeepSeek OCR 实时理解
     4. 批量 OCR 优化
+    5. 推测式预取相邻页面（需在 prefetch_session 内）
     """
     
     def __init__(
@@ -34,7 +39,8 @@ class VisualMemvidRetriever:
         video_path: str,
         index_path: str,
         ocr_client: Optional[DeepSeekOCRClient] = None,
-        enable_cache: bool = True
+        enable_cache: bool = True,
+        lazy_index: bool = False
     ):
         """
         初始化检索器
@@ -44,6 +50,7 @@ class VisualMemvidRetriever:
             index_path: 索引文件路径
             ocr_client: OCR 客户端（可选，默认自动创建）
             enable_cache: 是否启用 OCR 缓存（默认启用）
+            lazy_index: 首次检索时才加载索引（只做 OCR 时无需加载）
         """
         self.video_path = Path(video_path)
         self.index_path = Path(index_path)
@@ -53,9 +60,11 @@ class VisualMemvidRetriever:
         if not self.index_path.exists():
             raise FileNotFoundError(f"索引文件不存在: {index_path}")
 
-        # 加载索引（使用 mmap 节省内存）
-        self.index = BM25SIndex.load(str(index_path), mmap=True)
-        self.total_pages = self.index.metadata["total_pages"]
+        self._index: Optional[BM25SIndex] = None
+        self._index_lock = threading.Lock()
+        self._frame_count: Optional[int] = None
+        if not lazy_index:
+            self._load_index()
 
         # 初始化 OCR 客户端
         self.ocr_client = ocr_client or DeepSeekOCRClient()
@@ -68,7 +77,39 @@ class VisualMemvidRetriever:
         else:
             self.ocr_cache = None
 
-        logger.info(f"✅ 检索器初始化完成: {self.total_pages} 页")
+        if lazy_index:
+            logger.info(f"✅ 检索器初始化完成（索引延迟加载）: {self.video_path.name}")
+        else:
+            logger.info(f"✅ 检索器初始化完成: {self.total_pages} 页")
+
+    def _load_index(self) -> BM25SIndex:
+        """加载索引（使用 mmap 节省内存，只加载一次）"""
+        if self._index is None:
+            with self._index_lock:
+                if self._index is None:
+                    self._index = BM25SIndex.load(str(self.index_path), mmap=True)
+        return self._index
+
+    @property
+    def index(self) -> BM25SIndex:
+        return self._load_index()
+
+    @property
+    def total_pages(self) -> int:
+        return self._load_index().metadata["total_pages"]
+
+    @property
+    def frame_count(self) -> int:
+        """视频帧数（即页数；索引未加载时从视频头读取，不触发索引加载）"""
+        if self._index is not None:
+            return self._index.metadata["total_pages"]
+        if self._frame_count is None:
+            cap = cv2.VideoCapture(str(self.video_path))
+            try:
+                self._frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            finally:
+                cap.release()
+        return self._frame_count
     
     def search(
         self,
@@ -109,7 +150,8 @@ class VisualMemvidRetriever:
             results = self._batch_ocr(extended_frames, core_frames)
         else:
             results = self._sequential_ocr(extended_frames, core_frames)
-        
+
+        self.prefetch_neighbours([f for f, _ in extended_frames])
         return results
     
     def _extend_with_context(
@@ -165,6 +207,136 @@ class VisualMemvidRetriever:
         
         return unique_extended
     
+    def ocr_frame(self, frame_num: int, priority: Optional[str] = None) -> Dict:
+        """
+        OCR 单页（优先读取缓存，OCR 成功后写入缓存）
+
+        Args:
+            frame_num: 帧号
+            priority: OCR 优先级通道（默认使用客户端的默认通道）
+
+        Returns:
+            {"success", "text", "processing_time", "error", "from_cache"}
+        """
+        fingerprint = None
+        if self.enable_cache:
+            fingerprint = self.ocr_client.cache_fingerprint()
+            cached_content = self.ocr_cache.get(str(self.video_path), frame_num, fingerprint)
+            if cached_content:
+                return {
+                    "success": True,
+                    "text": cached_content,
+                    "processing_time": 0,
+                    "error": None,
+                    "from_cache": True
+                }
+
+        frame_img = self._extract_frame(frame_num)
+        if frame_img is None:
+            return {
+                "success": False,
+                "text": "",
+                "processing_time": 0,
+                "error": "帧提取失败",
+                "from_cache": False
+            }
+
+        ocr_result = self.ocr_client.ocr_image(frame_img, priority=priority)
+        if self.enable_cache and ocr_result.get("success"):
+            self.ocr_cache.set(str(self.video_path), frame_num, ocr_result.get("text", ""), fingerprint)
+
+        ocr_result["from_cache"] = False
+        return ocr_result
+
+    def ocr_frames(self, frame_nums: List[int], priority: Optional[str] = None) -> List[Dict]:
+        """
+        并发 OCR 多页（结果顺序与 frame_nums 一致）
+
+        1. 一次批量查询缓存
+        2. 未命中的帧在一次视频遍历中提取
+        3. 线程池并发 OCR，同时处理的页数不超过 max_parallel_pages（端点池另有每端点在途上限）
+        4. 成功的结果一次写入缓存
+
+        Args:
+            frame_nums: 帧号列表
+            priority: OCR 优先级通道（默认使用客户端的默认通道）
+
+        Returns:
+            每页一个 {"success", "text", "processing_time", "error", "from_cache"}
+        """
+        unique_frames = list(dict.fromkeys(frame_nums))
+        results: Dict[int, Dict] = {}
+
+        fingerprint = None
+        if self.enable_cache:
+            fingerprint = self.ocr_client.cache_fingerprint()
+            cached_contents = self.ocr_cache.get_many(str(self.video_path), unique_frames, fingerprint)
+            for frame_num, content in cached_contents.items():
+                if content:
+                    results[frame_num] = {
+                        "success": True,
+                        "text": content,
+                        "processing_time": 0,
+                        "error": None,
+                        "from_cache": True
+                    }
+
+        pending = [frame_num for frame_num in unique_frames if frame_num not in results]
+        if pending:
+            images = self._extract_frames(pending)
+            to_ocr = []
+            for frame_num in pending:
+                if frame_num in images:
+                    to_ocr.append(frame_num)
+                else:
+                    results[frame_num] = {
+                        "success": False,
+                        "text": "",
+                        "processing_time": 0,
+                        "error": "帧提取失败",
+                        "from_cache": False
+                    }
+
+            def _ocr(frame_num: int) -> Dict:
+                try:
+                    ocr_result = self.ocr_client.ocr_image(images[frame_num], priority=priority)
+                except Exception as e:
+                    logger.error(f"❌ 第 {frame_num + 1} 页 OCR 出错: {e}")
+                    ocr_result = {"success": False, "text": "", "processing_time": 0, "error": str(e)}
+                ocr_result["from_cache"] = False
+                return ocr_result
+
+            workers = min(len(to_ocr), CONFIG["ocr"].get("max_parallel_pages", 4))
+            if workers > 1:
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="page-ocr") as pool:
+                    results.update(zip(to_ocr, pool.map(_ocr, to_ocr)))
+            else:
+                results.update((frame_num, _ocr(frame_num)) for frame_num in to_ocr)
+
+            new_contents = {
+                frame_num: results[frame_num].get("text", "")
+                for frame_num in to_ocr if results[frame_num].get("success")
+            }
+            if self.enable_cache and new_contents:
+                self.ocr_cache.set_many(str(self.video_path), new_contents, fingerprint)
+
+        return [results[frame_num] for frame_num in frame_nums]
+
+    def prefetch_neighbours(self, frame_nums: List[int]) -> int:
+        """
+        后台预取相邻页面到 OCR 缓存（只在 prefetch_session 内生效）
+
+        Args:
+            frame_nums: 刚刚 OCR 过的帧号
+
+        Returns:
+            调度的预取页数
+        """
+        prefetcher = get_prefetcher()
+        if prefetcher is None or not self.enable_cache:
+            return 0
+        return prefetcher.schedule(self, frame_nums)
+
     def _extract_frame(self, frame_num: int) -> Optional[np.ndarray]:
         """
         从视频中提取单帧
@@ -187,6 +359,34 @@ class VisualMemvidRetriever:
         finally:
             cap.release()
     
+    def _extract_frames(self, frame_nums: List[int]) -> Dict[int, np.ndarray]:
+        """
+        一次打开视频，按帧号顺序提取多帧（相邻帧直接顺序读取，不再重新定位）
+
+        Args:
+            frame_nums: 帧号列表
+
+        Returns:
+            {帧号: OpenCV 图片数组}（提取失败的帧不在结果中）
+        """
+        frames: Dict[int, np.ndarray] = {}
+        cap = cv2.VideoCapture(str(self.video_path))
+        try:
+            position = None
+            for frame_num in sorted(set(frame_nums)):
+                if position != frame_num:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num)
+                ret, frame = cap.read()
+                if ret:
+                    frames[frame_num] = frame
+                    position = frame_num + 1
+                else:
+                    logger.error(f"❌ 提取帧失败: frame_num={frame_num}")
+                    position = None
+        finally:
+            cap.release()
+        return frames
+
     def _batch_ocr(
         self,
         extended_frames: List[Tuple[int, str]],
@@ -203,10 +403,18 @@ class VisualMemvidRetriever:
         cached_results = []
         uncached_frames = []
 
+        # 一次性批量查询缓存（键包含提示词和 OCR 参数指纹，提示词修改后自动失效）
+        cached_contents = {}
+        if self.enable_cache:
+            fingerprint = self.ocr_client.cache_fingerprint()
+            cached_contents = self.ocr_cache.get_many(
+                str(self.video_path), [frame_num for frame_num, _ in extended_frames], fingerprint
+            )
+
         for frame_num, page_type in extended_frames:
             # 尝试从缓存获取
             if self.enable_cache:
-                cached_content = self.ocr_cache.get(str(self.video_path), frame_num)
+                cached_content = cached_contents.get(frame_num)
                 if cached_content:
                     page_info = self.index.get_page_info(frame_num)
                     cached_results.append({
@@ -242,13 +450,13 @@ class VisualMemvidRetriever:
             ocr_results = self.ocr_client.ocr_batch(images)
 
             # 组装结果并缓存
+            new_contents = {}
             for i, (frame_num, page_type, _) in enumerate(frames_data):
                 page_info = self.index.get_page_info(frame_num)
                 content = ocr_results[i].get("text", "")
 
-                # 保存到缓存
-                if self.enable_cache:
-                    self.ocr_cache.set(str(self.video_path), frame_num, content)
+                if ocr_results[i].get("success", False):
+                    new_contents[frame_num] = content
 
                 uncached_results.append({
                     "page_num": frame_num + 1,
@@ -262,6 +470,10 @@ class VisualMemvidRetriever:
                     "from_cache": False
                 })
 
+            # 批量保存到缓存（单个事务）
+            if self.enable_cache and new_contents:
+                self.ocr_cache.set_many(str(self.video_path), new_contents, fingerprint)
+
         # 3. 合并结果（保持原始顺序）
         results = cached_results + uncached_results
         results.sort(key=lambda x: x["frame_num"])